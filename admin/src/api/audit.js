@@ -6,6 +6,9 @@ import http from './http'
  * @param {Object} params
  * page,size, kw, level, status, method, action, resource_type, resource_id,
  * actor_id, http_status, ip, trace_id, start, end (ISO 或 YYYY-MM-DD HH:mm:ss)
+ * cursor: 上一页返回的 next_cursor（传入时忽略 page，且不再计数）
+ * count: capped（默认，最多数到 10000）/ exact / none
+ * 返回 { items, total, total_capped, next_cursor }；total_capped 为 true 时总数显示为 “total+”
  */
 export const listAuditLogs = (params) =>
   http.get('/api/admin/audit/logs', { params }).then(r => r.data)
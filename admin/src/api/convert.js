@@ -1,5 +1,6 @@
 // src/api/convert.js
 import http from './http'
+import { userStore } from '@/store/user'
 
 export const convert = {
   docx: (file, { inline = 1 } = {}) => {
@@ -8,18 +9,22 @@ export const convert = {
     fd.append('inline', String(inline))
     return http.post('/api/convert/docx', fd).then(r => r.data)
   },
-  pdf: (file, { inline = 1, dpi = 144 } = {}) => {
+  // lazy=1：立即返回清单（页数 + 每页地址），页面首次访问时才渲染
+  pdf: (file, { inline = 1, dpi = 144, lazy = 0 } = {}) => {
     const fd = new FormData()
     fd.append('file', file)
     fd.append('inline', String(inline))
     fd.append('dpi', String(dpi))
+    fd.append('lazy', String(lazy))
     return http.post('/api/convert/pdf', fd).then(r => r.data)
   },
-  pptx: (file, { inline = 1, dpi = 144 } = {}) => {
+  // lazy=1：立即返回清单（页数 + 每页地址），页面首次访问时才渲染
+  pptx: (file, { inline = 1, dpi = 144, lazy = 0 } = {}) => {
     const fd = new FormData()
     fd.append('file', file)
     fd.append('inline', String(inline))
     fd.append('dpi', String(dpi))
+    fd.append('lazy', String(lazy))
     return http.post('/api/convert/pptx', fd).then(r => r.data)
   },
   excel: (file, { mode = 'image', inline = 1, dpi = 144 } = {}) => {
@@ -30,6 +35,72 @@ export const convert = {
     fd.append('dpi', String(dpi)) // image 模式有效
     return http.post('/api/convert/excel', fd).then(r => r.data)
   },
-  
-}
 
+  /**
+   * PDF / PPTX 流式导入（stream=1，NDJSON 每行一页；inline=1 时大文档不会一次性占满内存）
+   * onPage(html, index)：按页码顺序回调；返回 { pages }
+   */
+  async stream(kind, file, onPage, { inline = 1, dpi = 144, signal } = {}) {
+    const fd = new FormData()
+    fd.append('file', file)
+    fd.append('inline', String(inline))
+    fd.append('dpi', String(dpi))
+    fd.append('stream', '1')
+    const res = await fetch(`${http.defaults.baseURL}/api/convert/${kind}`, {
+      method: 'POST',
+      headers: { Authorization: `Bearer ${userStore.token}` },
+      body: fd,
+      signal
+    })
+    if (!res.ok || !res.body) throw new Error(`导入失败（${res.status}）`)
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buf = ''
+    let pages = 0
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buf += value
+      let sep
+      while ((sep = buf.indexOf('\n')) >= 0) {
+        const line = buf.slice(0, sep).trim()
+        buf = buf.slice(sep + 1)
+        if (!line) continue
+        const msg = JSON.parse(line)
+        if (msg.type === 'page') onPage(msg.html, msg.index)
+        else if (msg.type === 'done') pages = msg.pages
+      }
+    }
+    return { pages }
+  },
+
+  /**
+   * 订阅懒转换的批量渲染进度（SSE；EventSource 无法携带 Authorization，改用 fetch 读流）
+   * onEvent(event, data)：start / page / done / error
+   */
+  async progress(url, onEvent, { signal } = {}) {
+    const res = await fetch(url, {
+      headers: { Authorization: `Bearer ${userStore.token}`, Accept: 'text/event-stream' },
+      signal
+    })
+    if (!res.ok || !res.body) throw new Error(`进度订阅失败（${res.status}）`)
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buf = ''
+    for (;;) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buf += value
+      let sep
+      while ((sep = buf.indexOf('\n\n')) >= 0) {
+        const block = buf.slice(0, sep)
+        buf = buf.slice(sep + 2)
+        let event = 'message'
+        let data = ''
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event:')) event = line.slice(6).trim()
+          else if (line.startsWith('data:')) data += line.slice(5).trim()
+        }
+        onEvent(event, data ? JSON.parse(data) : null)
+      }
+    }
+  }
+}
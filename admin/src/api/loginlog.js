@@ -1,6 +1,12 @@
 // src/api/loginlog.js
 import http from './http'
 
+/**
+ * 登录日志 - 列表查询
+ * cursor: 上一页返回的 next_cursor（传入时忽略 page，且不再计数）
+ * count: capped（默认，最多数到 10000）/ exact / none
+ * 返回 { items, total, total_capped, next_cursor }；total_capped 为 true 时总数显示为 “total+”
+ */
 export const listLoginLogs = (params) =>
   http.get('/api/admin/logs/login', { params }).then(r => r.data)
 
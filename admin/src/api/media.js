@@ -28,11 +28,42 @@ export const mediaFiles = {
   previewUrl: (sha256) => {
     const base = http.defaults.baseURL?.replace(/\/$/, '') || ''
     return `${base}/api/admin/media/preview/${sha256}`
+  },
+  // 缩略图（图片）/ 首帧封面（视频），宽度会向上取整到后台配置的档位
+  thumbUrl: (sha256, w = 160) => {
+    const base = http.defaults.baseURL?.replace(/\/$/, '') || ''
+    return `${base}/api/admin/media/preview/${sha256}?w=${w}`
   }
 }
 
+// 秒传握手：内容已存在时直接返回记录，无需上传；回收站中的文件仅在有 media:delete 权限时恢复（restored=true）
+export const mediaInstant = {
+  check: (item) => http.post('/api/admin/media/instant', item).then(r => r.data),
+  batch: (items) => http.post('/api/admin/media/instant/batch', { items }).then(r => r.data),
+}
+
+// 仅在安全上下文（https / localhost）可用；过大的文件不在浏览器内整体读取计算
+const INSTANT_MAX_BYTES = 256 * 1024 * 1024
+async function sha256Hex(file){
+  if (!globalThis.crypto?.subtle || file.size > INSTANT_MAX_BYTES) return null
+  const buf = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+  return Array.from(new Uint8Array(buf), b => b.toString(16).padStart(2, '0')).join('')
+}
+
 // 自定义上传（配合 el-upload）
 export async function uploadMedia({ file, data }){
+  try {
+    const sha256 = await sha256Hex(file)
+    if (sha256) {
+      const r = await mediaInstant.check({
+        sha256, size: file.size, filename: file.name,
+        dir_id: data?.dir_id ?? null, remark: data?.remark ?? null,
+      })
+      if (r?.hit) return { id: r.id, sha256: r.sha256, restored: !!r.restored }
+    }
+  } catch (e) {
+    // 握手失败不影响正常上传
+  }
   const fd = new FormData()
   fd.append('file', file)
   Object.entries(data || {}).forEach(([k,v]) => v!=null && fd.append(k, v))
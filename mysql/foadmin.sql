@@ -124,9 +124,15 @@ CREATE TABLE `foadmin_media_convert_cache` (
   `id` bigint NOT NULL,
   `kind` varchar(16) NOT NULL,
   `src_sha256` varchar(64) NOT NULL,
+  `params` varchar(64) NOT NULL DEFAULT '',
+  `page` int NOT NULL DEFAULT '0',
   `html` text,
   `file_ids` text,
   `pages` int DEFAULT NULL,
+  `created_by` bigint DEFAULT NULL,
+  `size` bigint NOT NULL DEFAULT '0',
+  `hit_count` int NOT NULL DEFAULT '0',
+  `last_access_at` datetime DEFAULT NULL,
   `created_at` datetime NOT NULL,
   `updated_at` datetime NOT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -198,6 +204,32 @@ CREATE TABLE `foadmin_media_tag` (
 
 -- --------------------------------------------------------
 
+--
+-- 表的结构 `foadmin_media_upload_session`
+--
+
+CREATE TABLE `foadmin_media_upload_session` (
+  `id` bigint NOT NULL,
+  `upload_id` varchar(32) NOT NULL,
+  `filename` varchar(255) NOT NULL,
+  `ext` varchar(20) DEFAULT NULL,
+  `mime` varchar(100) DEFAULT NULL,
+  `size` bigint NOT NULL,
+  `sha256` char(64) DEFAULT NULL,
+  `chunk_size` int NOT NULL,
+  `total_chunks` int NOT NULL,
+  `dir_id` bigint DEFAULT NULL,
+  `remark` varchar(255) DEFAULT NULL,
+  `tags` varchar(512) DEFAULT NULL,
+  `uploader_id` bigint NOT NULL,
+  `status` varchar(16) NOT NULL DEFAULT 'uploading',
+  `file_id` bigint DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- --------------------------------------------------------
+
 --
 -- 表的结构 `foadmin_rel_media_file_tag`
 --
@@ -416,7 +448,27 @@ INSERT INTO `foadmin_sys_config` (`id`, `category`, `key`, `value`, `value_type`
 (30, 'upload', 'enable_static_access', '', 'boolean', '启用静态文件直接访问', '是否允许通过URL直接访问上传文件（如/runtime/uploads/media/xxx.jpg）。关闭时只能通过API接口访问。', NULL, 'false', 0, 0, 11, '2025-10-21 02:09:03', 1),
 (31, 'upload', 'static_url_prefix', '/runtime/uploads', 'string', '静态文件URL前缀', '静态文件访问的URL路径前缀。例如：/runtime/uploads、/static、/files', NULL, '/runtime/uploads', 0, 0, 12, '2025-10-21 02:07:36', 1),
 (32, 'upload', 'static_access_auth', '', 'boolean', '静态文件需要认证', '是否要求认证后才能访问静态文件（未来功能）', NULL, 'false', 0, 0, 13, '2025-10-21 02:07:36', 1),
-(33, 'upload', 'static_allowed_types', 'jpg,jpeg,png,gif,webp,svg,pdf,mp4,mp3,zip,doc,docx,xls,xlsx', 'string', '静态访问允许的文件类型', '允许直接访问的文件扩展名，逗号分隔。留空表示允许所有类型。', NULL, '', 0, 0, 14, '2025-10-21 02:07:36', 1);
+(33, 'upload', 'static_allowed_types', 'jpg,jpeg,png,gif,webp,svg,pdf,mp4,mp3,zip,doc,docx,xls,xlsx', 'string', '静态访问允许的文件类型', '允许直接访问的文件扩展名，逗号分隔。留空表示允许所有类型。', NULL, '', 0, 0, 14, '2025-10-21 02:07:36', 1),
+(34, 'upload', 'media_thumb_sizes', '160,320,640', 'string', '缩略图宽度档位', '媒体预览 ?w= 缩略图的宽度档位（像素，逗号分隔），请求宽度向上取整到档位', NULL, '160,320,640', 0, 0, 15, NULL, NULL);
+
+-- --------------------------------------------------------
+
+--
+-- 表的结构 `foadmin_sys_config_version`
+--
+
+CREATE TABLE `foadmin_sys_config_version` (
+  `id` int NOT NULL COMMENT '固定为 1',
+  `version` bigint NOT NULL DEFAULT '0' COMMENT '配置版本号',
+  `updated_at` datetime DEFAULT NULL COMMENT '更新时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='系统配置版本号';
+
+--
+-- 转存表中的数据 `foadmin_sys_config_version`
+--
+
+INSERT INTO `foadmin_sys_config_version` (`id`, `version`, `updated_at`) VALUES
+(1, 0, NULL);
 
 -- --------------------------------------------------------
 
@@ -520,6 +572,10 @@ CREATE TABLE `foadmin_sys_job` (
   `cron_expression` varchar(128) DEFAULT NULL COMMENT 'cron表达式',
   `interval_seconds` int DEFAULT NULL COMMENT 'interval间隔秒数',
   `run_date` datetime DEFAULT NULL COMMENT 'date单次执行时间',
+  `executor` varchar(16) NOT NULL DEFAULT 'thread' COMMENT '执行器：thread-线程池，process-独立进程，asyncio-事件循环',
+  `max_instances` int NOT NULL DEFAULT '1' COMMENT '同一任务最多同时运行的实例数',
+  `coalesce` int NOT NULL DEFAULT '1' COMMENT '错过多次执行时：1-合并为一次，0-逐次补跑',
+  `misfire_grace_time` int DEFAULT NULL COMMENT '错过执行时间后仍允许执行的秒数，空为调度器默认值',
   `status` int DEFAULT '1' COMMENT '状态：1-启用，0-暂停',
   `description` varchar(512) DEFAULT NULL COMMENT '任务描述',
   `remark` text COMMENT '备注',
@@ -539,7 +595,35 @@ INSERT INTO `foadmin_sys_job` (`id`, `name`, `job_id`, `job_type`, `func_name`,
 (1, 'Hello任务', 'hello_task', 'interval', 'app.tasks.demo.hello_task', '[]', '{\"name\": \"Scheduler\"}', NULL, 60, NULL, 0, '每60秒执行一次的示例任务', NULL, '2025-10-22 01:20:19', NULL, 1, 0, '2025-10-22 00:53:35', '2025-10-22 01:20:19'),
 (2, '清理旧日志', 'cleanup_logs', 'cron', 'app.tasks.demo.cleanup_old_logs', '[]', '{}', '0 2 * * *', NULL, NULL, 0, '每天凌晨2点清理30天前的任务日志', NULL, NULL, NULL, 0, 0, '2025-10-22 00:53:35', '2025-10-22 00:53:35'),
 (3, '数据库备份', 'db_backup', 'cron', 'app.tasks.demo.database_backup', '[]', '{}', '0 3 * * 0', NULL, NULL, 0, '每周日凌晨3点执行数据库备份', NULL, NULL, NULL, 0, 0, '2025-10-22 00:53:35', '2025-10-22 00:53:35'),
-(4, '发送日报', 'daily_report', 'cron', 'app.tasks.demo.send_daily_report', '[]', '{}', '0 9 * * 1-5', NULL, NULL, 0, '工作日每天上午9点发送日报', NULL, '2025-10-22 01:20:00', NULL, 1, 0, '2025-10-22 00:53:35', '2025-10-22 01:20:00');
+(4, '发送日报', 'daily_report', 'cron', 'app.tasks.demo.send_daily_report', '[]', '{}', '0 9 * * 1-5', NULL, NULL, 0, '工作日每天上午9点发送日报', NULL, '2025-10-22 01:20:00', NULL, 1, 0, '2025-10-22 00:53:35', '2025-10-22 01:20:00'),
+(5, '清理分片上传', 'media_upload_gc', 'interval', 'app.tasks.media.cleanup_upload_sessions', '[]', '{\"ttl_hours\": 24}', NULL, 3600, NULL, 1, '每小时清理超过24小时未完成的分片上传会话', NULL, NULL, NULL, 0, 0, '2025-10-22 00:53:35', '2025-10-22 00:53:35'),
+(6, '转换缓存淘汰', 'convert_cache_evict', 'cron', 'app.tasks.convert.evict_convert_cache', '[]', '{\"max_mb\": 2048, \"max_age_days\": 30}', '30 4 * * *', NULL, NULL, 1, '每天凌晨4:30按总容量/闲置时间淘汰文档转换缓存，并清理孤立的转换文件', NULL, NULL, NULL, 0, 0, '2025-10-22 00:53:35', '2025-10-22 00:53:35');
+
+-- --------------------------------------------------------
+
+--
+-- 表的结构 `foadmin_sys_job_command`
+--
+
+CREATE TABLE `foadmin_sys_job_command` (
+  `id` bigint NOT NULL COMMENT '命令ID',
+  `job_id` varchar(128) NOT NULL COMMENT '任务唯一标识',
+  `command` varchar(16) NOT NULL COMMENT '命令：sync/remove/pause/resume',
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='定时任务调度命令（非主节点转交主节点执行）';
+
+-- --------------------------------------------------------
+
+--
+-- 表的结构 `foadmin_sys_job_lease`
+--
+
+CREATE TABLE `foadmin_sys_job_lease` (
+  `name` varchar(64) NOT NULL COMMENT '租约名称',
+  `owner` varchar(128) NOT NULL COMMENT '持有者：主机名:进程号:随机串',
+  `expires_at` bigint NOT NULL COMMENT '过期时间（毫秒时间戳）',
+  `renewed_at` datetime DEFAULT NULL COMMENT '最后续期时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='调度器主节点租约';
 
 -- --------------------------------------------------------
 
@@ -822,7 +906,9 @@ ALTER TABLE `foadmin_media_audit`
 -- 表的索引 `foadmin_media_convert_cache`
 --
 ALTER TABLE `foadmin_media_convert_cache`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uk_convert_key` (`kind`,`src_sha256`,`params`,`page`),
+  ADD KEY `idx_last_access` (`last_access_at`);
 
 --
 -- 表的索引 `foadmin_media_dir`
@@ -847,6 +933,14 @@ ALTER TABLE `foadmin_media_tag`
   ADD PRIMARY KEY (`id`),
   ADD UNIQUE KEY `name` (`name`);
 
+--
+-- 表的索引 `foadmin_media_upload_session`
+--
+ALTER TABLE `foadmin_media_upload_session`
+  ADD PRIMARY KEY (`id`),
+  ADD UNIQUE KEY `uk_upload_id` (`upload_id`),
+  ADD KEY `idx_status_updated` (`status`,`updated_at`);
+
 --
 -- 表的索引 `foadmin_rel_media_file_tag`
 --
@@ -873,6 +967,12 @@ ALTER TABLE `foadmin_sys_config`
   ADD UNIQUE KEY `uk_config_key` (`key`),
   ADD KEY `idx_category` (`category`);
 
+--
+-- 表的索引 `foadmin_sys_config_version`
+--
+ALTER TABLE `foadmin_sys_config_version`
+  ADD PRIMARY KEY (`id`);
+
 --
 -- 表的索引 `foadmin_sys_dept`
 --
@@ -906,6 +1006,18 @@ ALTER TABLE `foadmin_sys_job`
   ADD KEY `idx_status` (`status`),
   ADD KEY `idx_job_type` (`job_type`);
 
+--
+-- 表的索引 `foadmin_sys_job_command`
+--
+ALTER TABLE `foadmin_sys_job_command`
+  ADD PRIMARY KEY (`id`);
+
+--
+-- 表的索引 `foadmin_sys_job_lease`
+--
+ALTER TABLE `foadmin_sys_job_lease`
+  ADD PRIMARY KEY (`name`);
+
 --
 -- 表的索引 `foadmin_sys_job_log`
 --
@@ -986,6 +1098,12 @@ ALTER TABLE `foadmin_media_dir`
 ALTER TABLE `foadmin_media_file`
   MODIFY `id` bigint NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=8;
 
+--
+-- 使用表AUTO_INCREMENT `foadmin_media_upload_session`
+--
+ALTER TABLE `foadmin_media_upload_session`
+  MODIFY `id` bigint NOT NULL AUTO_INCREMENT;
+
 --
 -- 使用表AUTO_INCREMENT `foadmin_media_tag`
 --
@@ -996,7 +1114,7 @@ ALTER TABLE `foadmin_media_tag`
 -- 使用表AUTO_INCREMENT `foadmin_sys_config`
 --
 ALTER TABLE `foadmin_sys_config`
-  MODIFY `id` bigint NOT NULL AUTO_INCREMENT COMMENT '配置ID', AUTO_INCREMENT=34;
+  MODIFY `id` bigint NOT NULL AUTO_INCREMENT COMMENT '配置ID', AUTO_INCREMENT=35;
 
 --
 -- 使用表AUTO_INCREMENT `foadmin_sys_dept`
@@ -1020,7 +1138,13 @@ ALTER TABLE `foadmin_sys_dict_type`
 -- 使用表AUTO_INCREMENT `foadmin_sys_job`
 --
 ALTER TABLE `foadmin_sys_job`
-  MODIFY `id` bigint NOT NULL AUTO_INCREMENT COMMENT '任务ID', AUTO_INCREMENT=5;
+  MODIFY `id` bigint NOT NULL AUTO_INCREMENT COMMENT '任务ID', AUTO_INCREMENT=7;
+
+--
+-- 使用表AUTO_INCREMENT `foadmin_sys_job_command`
+--
+ALTER TABLE `foadmin_sys_job_command`
+  MODIFY `id` bigint NOT NULL AUTO_INCREMENT COMMENT '命令ID';
 
 --
 -- 使用表AUTO_INCREMENT `foadmin_sys_job_log`
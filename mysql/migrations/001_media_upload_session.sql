@@ -0,0 +1,30 @@
+-- mysql/migrations/001_media_upload_session.sql
+-- 分片上传会话表，以及清理过期会话的定时任务
+
+CREATE TABLE `foadmin_media_upload_session` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `upload_id` varchar(32) NOT NULL,
+  `filename` varchar(255) NOT NULL,
+  `ext` varchar(20) DEFAULT NULL,
+  `mime` varchar(100) DEFAULT NULL,
+  `size` bigint NOT NULL,
+  `sha256` char(64) DEFAULT NULL,
+  `chunk_size` int NOT NULL,
+  `total_chunks` int NOT NULL,
+  `dir_id` bigint DEFAULT NULL,
+  `remark` varchar(255) DEFAULT NULL,
+  `tags` varchar(512) DEFAULT NULL,
+  `uploader_id` bigint NOT NULL,
+  `status` varchar(16) NOT NULL DEFAULT 'uploading',
+  `file_id` bigint DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_upload_id` (`upload_id`),
+  KEY `idx_status_updated` (`status`,`updated_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT INTO `foadmin_sys_job` (`name`, `job_id`, `job_type`, `func_name`, `func_args`, `func_kwargs`,
+  `cron_expression`, `interval_seconds`, `run_date`, `status`, `description`)
+VALUES ('清理分片上传', 'media_upload_gc', 'interval', 'app.tasks.media.cleanup_upload_sessions', '[]',
+  '{"ttl_hours": 24}', NULL, 3600, NULL, 1, '每小时清理超过24小时未完成的分片上传会话');
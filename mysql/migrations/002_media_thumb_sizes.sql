@@ -0,0 +1,7 @@
+-- mysql/migrations/002_media_thumb_sizes.sql
+-- 媒体缩略图宽度档位配置
+
+INSERT INTO `foadmin_sys_config` (`category`, `key`, `value`, `value_type`, `name`, `description`, `options`,
+  `default_value`, `is_public`, `is_encrypted`, `sort`)
+VALUES ('upload', 'media_thumb_sizes', '160,320,640', 'string', '缩略图宽度档位',
+  '媒体预览 ?w= 缩略图的宽度档位（像素，逗号分隔），请求宽度向上取整到档位', NULL, '160,320,640', 0, 0, 15);
@@ -0,0 +1,7 @@
+-- mysql/migrations/003_convert_cache_pages.sql
+-- 文档转换缓存按页记录（延迟渲染）：page 为空表示整份文档
+
+ALTER TABLE `foadmin_media_convert_cache`
+  ADD COLUMN `page` int DEFAULT NULL AFTER `pages`,
+  ADD COLUMN `created_by` bigint DEFAULT NULL AFTER `page`,
+  ADD KEY `idx_kind_sha_page` (`kind`,`src_sha256`,`page`);
@@ -0,0 +1,64 @@
+-- mysql/migrations/004_convert_cache_lru.sql
+-- 文档转换缓存改为有界 LRU 缓存：唯一键 (kind, src_sha256, params, page)，记录大小与访问时间，定时淘汰
+-- 前置：003_convert_cache_pages.sql
+--
+-- 旧版本按 (kind, src_sha256) 查找缓存且没有唯一键，并发转换同一文件会留下重复行；
+-- 下面先回填 params、去重（保留最新一行），再加唯一键。
+
+-- 1) 新列；page 为空（整份文档）改为 0
+ALTER TABLE `foadmin_media_convert_cache`
+  ADD COLUMN `params` varchar(64) NOT NULL DEFAULT '' AFTER `src_sha256`,
+  ADD COLUMN `size` bigint NOT NULL DEFAULT '0' AFTER `created_by`,
+  ADD COLUMN `hit_count` int NOT NULL DEFAULT '0' AFTER `size`,
+  ADD COLUMN `last_access_at` datetime DEFAULT NULL AFTER `hit_count`;
+
+UPDATE `foadmin_media_convert_cache` SET `page` = 0 WHERE `page` IS NULL;
+
+ALTER TABLE `foadmin_media_convert_cache`
+  MODIFY `page` int NOT NULL DEFAULT '0' AFTER `params`;
+
+-- 2) 回填 params（与 app/services/convert_cache.py cache_params 一致）
+-- pdf / pptx：旧记录没有保存 dpi，后台编辑器导入时固定传 dpi=144
+UPDATE `foadmin_media_convert_cache` SET `params` = 'dpi=144' WHERE `kind` <> 'docx';
+
+-- docx 经 soffice 转换（图片入媒体库，file_ids 非空）：html 里的图片是 dataURL 时为 inline=1，否则为预览地址，即 inline=0
+UPDATE `foadmin_media_convert_cache`
+  SET `params` = IF(`html` LIKE '%src="data:%', 'inline=1', 'inline=0')
+  WHERE `kind` = 'docx' AND `file_ids` IS NOT NULL AND `file_ids` <> '';
+
+-- docx 经 mammoth 转换（没有图片）：内容与 inline 无关，先记为 inline=1，第 5 步再复制一份 inline=0
+UPDATE `foadmin_media_convert_cache`
+  SET `params` = 'inline=1'
+  WHERE `kind` = 'docx' AND (`file_ids` IS NULL OR `file_ids` = '');
+
+-- 3) 去重：同一 (kind, src_sha256, params, page) 只保留最新的一行（updated_at 最大，相同时取 id 最大）
+DELETE `old` FROM `foadmin_media_convert_cache` AS `old`
+  JOIN `foadmin_media_convert_cache` AS `new`
+    ON `new`.`kind` = `old`.`kind`
+   AND `new`.`src_sha256` = `old`.`src_sha256`
+   AND `new`.`params` = `old`.`params`
+   AND `new`.`page` = `old`.`page`
+   AND (`new`.`updated_at` > `old`.`updated_at`
+        OR (`new`.`updated_at` = `old`.`updated_at` AND `new`.`id` > `old`.`id`));
+
+-- 4) 索引；缓存大小按 html 字节数回填（图片页的大小未知，记 0，按闲置时间淘汰）
+ALTER TABLE `foadmin_media_convert_cache`
+  DROP KEY `idx_kind_sha_page`,
+  ADD UNIQUE KEY `uk_convert_key` (`kind`,`src_sha256`,`params`,`page`),
+  ADD KEY `idx_last_access` (`last_access_at`);
+
+UPDATE `foadmin_media_convert_cache` SET `size` = LENGTH(`html`) WHERE `html` IS NOT NULL;
+
+-- 5) mammoth 结果复制一份 inline=0，两种请求都能命中
+INSERT IGNORE INTO `foadmin_media_convert_cache`
+  (`kind`, `src_sha256`, `params`, `page`, `html`, `file_ids`, `pages`, `created_by`, `size`, `created_at`, `updated_at`)
+SELECT `kind`, `src_sha256`, 'inline=0', `page`, `html`, `file_ids`, `pages`, `created_by`, `size`, `created_at`, `updated_at`
+  FROM `foadmin_media_convert_cache`
+  WHERE `kind` = 'docx' AND `params` = 'inline=1' AND (`file_ids` IS NULL OR `file_ids` = '');
+
+-- 6) 缓存淘汰定时任务
+INSERT INTO `foadmin_sys_job` (`name`, `job_id`, `job_type`, `func_name`, `func_args`, `func_kwargs`,
+  `cron_expression`, `interval_seconds`, `run_date`, `status`, `description`)
+VALUES ('转换缓存淘汰', 'convert_cache_evict', 'cron', 'app.tasks.convert.evict_convert_cache', '[]',
+  '{"max_mb": 2048, "max_age_days": 30}', '30 4 * * *', NULL, NULL, 1,
+  '每天凌晨4:30按总容量/闲置时间淘汰文档转换缓存，并清理孤立的转换文件');
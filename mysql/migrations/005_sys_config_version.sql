@@ -0,0 +1,11 @@
+-- mysql/migrations/005_sys_config_version.sql
+-- 系统配置版本号：配置变更时递增，各 worker 轮询到新版本后重新加载配置快照
+
+CREATE TABLE `foadmin_sys_config_version` (
+  `id` int NOT NULL COMMENT '固定为 1',
+  `version` bigint NOT NULL DEFAULT '0' COMMENT '配置版本号',
+  `updated_at` datetime DEFAULT NULL COMMENT '更新时间',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='系统配置版本号';
+
+INSERT INTO `foadmin_sys_config_version` (`id`, `version`, `updated_at`) VALUES (1, 0, NULL);
@@ -0,0 +1,18 @@
+-- mysql/migrations/006_sys_job_lease.sql
+-- 调度器主节点租约，以及非主节点转交给主节点执行的调度命令
+
+CREATE TABLE `foadmin_sys_job_command` (
+  `id` bigint NOT NULL AUTO_INCREMENT COMMENT '命令ID',
+  `job_id` varchar(128) NOT NULL COMMENT '任务唯一标识',
+  `command` varchar(16) NOT NULL COMMENT '命令：sync/remove/pause/resume',
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='定时任务调度命令（非主节点转交主节点执行）';
+
+CREATE TABLE `foadmin_sys_job_lease` (
+  `name` varchar(64) NOT NULL COMMENT '租约名称',
+  `owner` varchar(128) NOT NULL COMMENT '持有者：主机名:进程号:随机串',
+  `expires_at` bigint NOT NULL COMMENT '过期时间（毫秒时间戳）',
+  `renewed_at` datetime DEFAULT NULL COMMENT '最后续期时间',
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='调度器主节点租约';
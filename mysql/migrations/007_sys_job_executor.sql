@@ -0,0 +1,8 @@
+-- mysql/migrations/007_sys_job_executor.sql
+-- 定时任务按任务选择执行器，并可配置并发实例数 / 合并补跑 / 错过执行的宽限时间
+
+ALTER TABLE `foadmin_sys_job`
+  ADD COLUMN `executor` varchar(16) NOT NULL DEFAULT 'thread' COMMENT '执行器：thread-线程池，process-独立进程，asyncio-事件循环' AFTER `run_date`,
+  ADD COLUMN `max_instances` int NOT NULL DEFAULT '1' COMMENT '同一任务最多同时运行的实例数' AFTER `executor`,
+  ADD COLUMN `coalesce` int NOT NULL DEFAULT '1' COMMENT '错过多次执行时：1-合并为一次，0-逐次补跑' AFTER `max_instances`,
+  ADD COLUMN `misfire_grace_time` int DEFAULT NULL COMMENT '错过执行时间后仍允许执行的秒数，空为调度器默认值' AFTER `coalesce`;
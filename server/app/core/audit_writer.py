@@ -0,0 +1,355 @@
+# app/core/audit_writer.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+审计日志批量写入器
+
+RequestAuditMiddleware 不再在请求内同步 INSERT，而是把审计行投递到进程内的有界队列，
+由后台线程按「满 N 条 / 每 M 毫秒」批量写入（多行 INSERT）。
+
+配置项（.env / 环境变量，见 app/core/config.py）：
+- AUDIT_QUEUE_MAX: 队列容量
+- AUDIT_BATCH_SIZE: 单批最大行数
+- AUDIT_FLUSH_INTERVAL_MS: 最长攒批时间
+- AUDIT_OVERFLOW_POLICY: 队列满时的策略 block / drop_oldest / spill
+- AUDIT_SPILL_PATH: spill 策略或写库失败时的本地落盘文件（JSON Lines），启动时自动回放
+- AUDIT_SPILL_MAX_REPLAYS: 落盘行回放失败的次数上限，达到后移入 {AUDIT_SPILL_PATH}.poison 不再回放
+
+用法:
+    from app.core.audit_writer import audit_writer
+    audit_writer.submit({...})       # 非阻塞投递；block 策略下队列满返回 False
+    audit_writer.put({...})          # 阻塞投递（在线程池中调用）
+    # stop() 之后投递的行不会重新启动刷写线程，直接落盘，下次 start() 时回放
+    audit_writer.stats()             # 队列深度、写入耗时等计数
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+# 落盘行中记录已回放失败次数的字段（不写入数据库）
+REPLAY_KEY = "_replays"
+
+
+class AuditWriter:
+    """有界队列 + 后台批量刷写线程"""
+
+    def __init__(
+        self,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval_ms: int = 500,
+        overflow_policy: str = "block",
+        spill_path: str = "./runtime/audit_spill.jsonl",
+        max_replays: int = 3,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid audit overflow policy: {overflow_policy}")
+        self.max_queue = max(1, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        self.max_replays = max(1, int(max_replays))
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # stop() 之后为 True：投递不再自动启动线程，直到再次显式 start()
+        self._closed = False
+
+        # 计数器
+        self._enqueued = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._written = 0
+        self._failed = 0
+        self._quarantined = 0
+        self._flush_count = 0
+        self._flush_total_ms = 0.0
+        self._flush_max_ms = 0.0
+        self._flush_last_ms = 0.0
+
+    # ---------------- 生命周期 ----------------
+
+    def start(self) -> None:
+        """
+        启动后台刷写线程（幂等）
+        上次落盘的审计行由刷写线程启动后先行回放：submit() 在事件循环中发现线程已退出而重启时，
+        文件读写与数据库写入不会落在事件循环上
+        """
+        with self._cond:
+            self._closed = False
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止线程，退出前把队列中剩余的行全部刷入数据库"""
+        with self._cond:
+            self._stopping = True
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # 线程未能按时退出时兜底：剩余行落盘，避免丢失
+        leftover = self._drain(len(self._queue))
+        if leftover:
+            self._spill(leftover)
+
+    # ---------------- 投递 ----------------
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        非阻塞投递一行审计记录
+
+        Returns:
+            True: 已入队（或按策略丢弃/落盘；已 stop() 时直接落盘）
+            False: 仅 block 策略下队列已满，调用方应改用 put() 等待
+        """
+        row.setdefault("created_at", datetime.now())
+        if not self._ensure_started():
+            self._spill([row])
+            return True
+        spill_row = None
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == "block":
+                    return False
+                if self.overflow_policy == "drop_oldest":
+                    self._queue.popleft()
+                    self._dropped += 1
+                else:
+                    spill_row = row
+            if spill_row is None:
+                self._queue.append(row)
+                self._enqueued += 1
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify()
+        if spill_row is not None:
+            self._spill([spill_row])
+        return True
+
+    def put(self, row: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """阻塞投递：队列满时等待刷写线程腾出空间（不要在事件循环中直接调用）；已 stop() 时直接落盘"""
+        row.setdefault("created_at", datetime.now())
+        if not self._ensure_started():
+            self._spill([row])
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._queue) >= self.max_queue:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._dropped += 1
+                    return False
+                self._cond.notify()
+                self._cond.wait(remaining if remaining is not None else self.flush_interval)
+            self._queue.append(row)
+            self._enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    # ---------------- 指标 ----------------
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度与刷写耗时计数"""
+        with self._cond:
+            flush_count = self._flush_count
+            return {
+                "queue_depth": len(self._queue),
+                "queue_max": self.max_queue,
+                "overflow_policy": self.overflow_policy,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "spilled": self._spilled,
+                "failed": self._failed,
+                "quarantined": self._quarantined,
+                "flush_count": flush_count,
+                "flush_last_ms": round(self._flush_last_ms, 2),
+                "flush_max_ms": round(self._flush_max_ms, 2),
+                "flush_avg_ms": round(self._flush_total_ms / flush_count, 2) if flush_count else 0.0,
+            }
+
+    # ---------------- 内部实现 ----------------
+
+    def _ensure_started(self) -> bool:
+        """刷写线程未运行时启动；已 stop() 时不再启动并返回 False"""
+        if self._closed:
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        return True
+
+    def _drain(self, n: int) -> List[Dict[str, Any]]:
+        with self._cond:
+            batch = []
+            while self._queue and len(batch) < n:
+                batch.append(self._queue.popleft())
+            if batch:
+                # 唤醒 block 策略下等待空间的生产者
+                self._cond.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        try:
+            self._replay_spill()
+        except Exception as e:
+            logger.error(f"回放落盘审计日志失败: {e}")
+        while True:
+            with self._cond:
+                if not self._queue and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                elif len(self._queue) < self.batch_size and not self._stopping:
+                    # 未攒满一批：再等一个周期，超时后也照常刷写
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                self._flush(batch)
+                if len(batch) < self.batch_size and not stopping:
+                    break
+            if stopping and not self._queue:
+                return
+
+    def _flush(self, batch: List[Dict[str, Any]], spill_on_error: bool = True) -> bool:
+        """写入一批，返回是否成功；失败时落盘（spill_on_error=False 时由调用方处理）"""
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            # executemany：PyMySQL 会改写为单条多行 INSERT ... VALUES (...), (...)
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+            ok = True
+        except Exception as e:
+            db.rollback()
+            ok = False
+            logger.error(f"审计日志批量写入失败（{len(batch)} 条）: {e}")
+        finally:
+            db.close()
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._flush_count += 1
+            self._flush_last_ms = elapsed
+            self._flush_total_ms += elapsed
+            self._flush_max_ms = max(self._flush_max_ms, elapsed)
+            if ok:
+                self._written += len(batch)
+            else:
+                self._failed += len(batch)
+        if not ok and spill_on_error:
+            self._spill(batch)
+        return ok
+
+    def _spill(self, rows: List[Dict[str, Any]], path: Optional[str] = None) -> None:
+        if not self.spill_path:
+            with self._cond:
+                self._dropped += len(rows)
+            return
+        path = path or self.spill_path
+        try:
+            with self._spill_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(path, "a", encoding="utf-8") as fp:
+                    for r in rows:
+                        fp.write(json.dumps(r, ensure_ascii=False, default=_json_default) + "\n")
+            with self._cond:
+                if path == self.spill_path:
+                    self._spilled += len(rows)
+                else:
+                    self._quarantined += len(rows)
+        except Exception as e:
+            logger.error(f"审计日志落盘失败，丢弃 {len(rows)} 条: {e}")
+            with self._cond:
+                self._dropped += len(rows)
+
+    def _replay_spill(self) -> None:
+        """
+        把落盘文件中的审计行重新写入数据库
+        失败的批次带上失败次数重新落盘，等待下次启动；累计失败 max_replays 次的批次（如数据本身
+        无法写入）移入 {spill_path}.poison，不再回放，需人工处理
+        """
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            replay_path = f"{self.spill_path}.replay"
+            try:
+                os.replace(self.spill_path, replay_path)
+            except OSError:
+                return
+        rows: List[Dict[str, Any]] = []
+        with open(replay_path, "r", encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    r = json.loads(line)
+                    r.setdefault(REPLAY_KEY, 0)
+                    if r.get("created_at"):
+                        r["created_at"] = datetime.fromisoformat(r["created_at"])
+                    rows.append(r)
+                except Exception:
+                    continue
+        os.remove(replay_path)
+        written = 0
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            counts = [r.pop(REPLAY_KEY) for r in batch]
+            if self._flush(batch, spill_on_error=False):
+                written += len(batch)
+                continue
+            retry, poison = [], []
+            for r, n in zip(batch, counts):
+                r[REPLAY_KEY] = n + 1
+                (poison if n + 1 >= self.max_replays else retry).append(r)
+            if retry:
+                self._spill(retry)
+            if poison:
+                self._spill(poison, path=f"{self.spill_path}.poison")
+                logger.error(f"审计日志 {len(poison)} 条回放失败 {self.max_replays} 次，"
+                             f"已移入 {self.spill_path}.poison，不再回放")
+        if written:
+            logger.info(f"已回放落盘审计日志 {written} 条")
+
+
+def _json_default(o: Any):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    return str(o)
+
+
+# 全局实例（main.on_startup 启动，on_shutdown 刷写并停止）
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_MAX,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    overflow_policy=settings.AUDIT_OVERFLOW_POLICY,
+    spill_path=settings.AUDIT_SPILL_PATH,
+    max_replays=settings.AUDIT_SPILL_MAX_REPLAYS,
+)
@@ -11,12 +11,88 @@ ENV_FILE = ROOT_DIR / ".env"
 
 class Settings(BaseSettings):
     MYSQL_DSN: str
+    # 异步引擎 DSN（见 app/core/db.py），留空时由 MYSQL_DSN 推导：mysql+pymysql -> mysql+aiomysql，sqlite -> sqlite+aiosqlite
+    ASYNC_MYSQL_DSN: str = ""
+    # 只读库 DSN（列表、导出接口使用，见 app/core/db.get_read_db），留空时全部走主库
+    MYSQL_READ_DSN: str = ""
+    # 连接池（每个引擎各一份：同步 / 异步、主库 / 只读库），单个引擎上限 = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # 默认与 SQLAlchemy 一致（5 + 10）。每个 worker 最多 4 个引擎，调大前按
+    # worker 数 * 引擎数 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) 核对 MySQL max_connections（默认 151）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30             # 等待空闲连接的秒数，超时抛错
+    DB_POOL_RECYCLE: int = 3600           # 连接最长存活秒数，需小于 MySQL wait_timeout
     JWT_SECRET: str = ""  # 默认为空，将在 validator 中生成随机值
     JWT_ALGO: str = "HS256"
     # 缩短访问令牌过期时间，默认为 60 分钟，可通过环境变量覆盖
     ACCESS_EXPIRE_MINUTES: int = 60
+
+    # JWT 解码结果缓存（见 app/core/token_cache.py），TTL 设为 0 关闭
+    AUTH_CACHE_TTL: int = 60
+    AUTH_CACHE_SIZE: int = 10000
+    # 精简令牌：只携带权限集合 ID（ps），权限由服务端注册表解析（见 app/core/perm_registry.py）
+    AUTH_COMPACT_TOKEN: bool = False
+    PERM_REGISTRY_TTL: int = 60           # 多进程部署时注册表的最长陈旧时间（秒）
+    # 用户角色 / 权限缓存（见 app/services/user_acl.py），TTL 设为 0 关闭
+    USER_ACL_CACHE_TTL: int = 60
+    USER_ACL_CACHE_SIZE: int = 10000
+
+    # 登录密码哈希（见 app/core/password_hasher.py）
+    PASSWORD_HASH_ROUNDS: int = 29000     # pbkdf2_sha256 迭代次数，调整后旧哈希在用户下次登录时自动重算
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 16         # 排队上限，超出直接返回 429
+
+    # 限流与登录锁定存储（见 app/core/rate_limit.py）：memory / sqlite（同机多 worker 共享）
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SQLITE_PATH: str = "./runtime/rate_limit.db"
+
     CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://127.0.0.1:5173"]
 
+    # 动态配置（见 app/core/config_loader.py）：各 worker 轮询配置版本号的间隔（秒），0 关闭轮询
+    CONFIG_POLL_INTERVAL: float = 2.0
+
+    # 定时任务选主（见 app/core/scheduler.py）：多 worker 时只有持有租约的进程运行调度器
+    # 关闭后每个进程都运行调度器（仅适合单 worker 部署）
+    SCHEDULER_LEADER_ELECTION: bool = True
+    SCHEDULER_LEASE_TTL: float = 10.0       # 租约有效期（秒），主节点退出后其他进程最长在此时间 + 轮询间隔内接管
+    SCHEDULER_POLL_INTERVAL: float = 2.0    # 续期 / 抢占租约、处理调度命令的间隔（秒），须明显小于 TTL
+    # 定时任务执行器：thread 为线程池（与接口共享 GIL），process 为独立进程池（spawn，CPU 密集任务用）
+    SCHEDULER_THREAD_WORKERS: int = 10
+    SCHEDULER_PROCESS_WORKERS: int = 2
+
+    # 审计日志批量写入（见 app/core/audit_writer.py）
+    AUDIT_QUEUE_MAX: int = 10000
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_MS: int = 500
+    AUDIT_OVERFLOW_POLICY: str = "block"  # block / drop_oldest / spill
+    AUDIT_SPILL_PATH: str = "./runtime/audit_spill.jsonl"
+    AUDIT_SPILL_MAX_REPLAYS: int = 3      # 落盘行回放失败次数上限，达到后移入 .poison 文件不再回放
+
+    # 分片上传暂存目录（须在上传目录之外，避免未合并的分片经静态文件访问暴露）
+    UPLOAD_SESSION_DIR: str = "./runtime/upload_sessions"
+
+    # 媒体缩略图 / 视频封面生成（见 app/services/media_derivative.py）
+    MEDIA_DERIVATIVE_WORKERS: int = 2
+    FFMPEG_PATH: str = "ffmpeg"
+
+    # PDF / PPTX 导入栅格化（见 app/services/convert_engine.py）
+    CONVERT_WORKERS: int = 2
+    CONVERT_MAX_JOBS: int = 2
+    CONVERT_JOB_TIMEOUT: int = 300
+    CONVERT_QUEUE_TIMEOUT: int = 30
+    CONVERT_RANGE_PAGES: int = 4
+    CONVERT_INLINE_MAX_MB: int = 64       # inline=1 且非流式返回时的图片总量上限（按 base64 编码后计算），超出需改用 stream=1
+    CONVERT_MAX_DPI: int = 300            # 渲染分辨率上限，请求中更大的 dpi 按此值处理
+
+    # LibreOffice 常驻进程池（见 app/services/soffice_pool.py）
+    SOFFICE_PATH: str = ""                # 留空时自动查找 soffice / libreoffice
+    SOFFICE_WORKERS: int = 2
+    SOFFICE_MAX_JOBS_PER_WORKER: int = 50
+    SOFFICE_JOB_TIMEOUT: int = 120
+    SOFFICE_QUEUE_TIMEOUT: int = 30
+    SOFFICE_PROFILE_DIR: str = "./runtime/soffice"
+    SOFFICE_PREWARM: bool = False         # 应用启动时预先拉起全部进程
+
     # v2 正确写法
     model_config = SettingsConfigDict(
         env_file=str(ENV_FILE),         
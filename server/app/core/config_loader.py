@@ -6,18 +6,120 @@
 动态配置加载器 - 从数据库读取配置
 用法:
     from app.core.config_loader import get_config
-    
+
     site_name = get_config('site_name', default='Foadmin')
     max_upload = get_config('upload_max_size', value_type='int', default=10)
+
+    已声明类型与派生值的配置项（登录、上传、静态访问、密码、邮件）请用 app.core.config_registry.typed_config
+
+实现:
+- 进程内持有全部配置的不可变快照：一次查询加载所有行，并按每行的 value_type 预先解析好类型
+- 配置变更后调用 refresh_config_cache()：数据库中的版本号（foadmin_sys_config_version）+1，本进程立即重新加载
+- 其他 worker 由后台线程每 CONFIG_POLL_INTERVAL 秒查询一次版本号（单行主键查询），
+  发现变化后重新加载，最长延迟 CONFIG_POLL_INTERVAL 秒；读取配置本身不访问数据库
 """
-from typing import Any, Optional
-from sqlalchemy.orm import Session
-from app.core.db import SessionLocal
-from app.models.config import SysConfig
 import json
+import logging
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Mapping, NamedTuple, Optional
+
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import session_scope
+from app.models.config import SysConfig, SysConfigVersion
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# value_type 归一化：与 _parse_value 的判断一致
+_TYPE_ALIASES = {'int': 'int', 'number': 'int', 'float': 'float', 'bool': 'bool', 'boolean': 'bool', 'json': 'json'}
+
+
+def _norm_type(value_type: Optional[str]) -> str:
+    return _TYPE_ALIASES.get(value_type or 'string', 'string')
+
+
+class ConfigSnapshot(NamedTuple):
+    version: int                      # 加载时数据库中的版本号
+    raw: Mapping[str, Optional[str]]  # key -> 原始值（value 为空时取 default_value）
+    types: Mapping[str, str]          # key -> 归一化后的 value_type
+    typed: Mapping[str, Any]          # key -> 按 value_type 预解析的值（json 除外，解析失败为 _MISSING）
+    public: frozenset                 # is_public=1 的 key
+    loaded_at: float
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+# 本进程快照代数：每次装入新快照递增，供中间件等判断预编译配置是否过期
+_generation = 0
+_reloads = 0
+_load_lock = threading.Lock()
+# 读取版本号持续失败时只警告一次，其后降为 debug，直到再次读取成功
+_version_failing = False
+
+
+def _read_version(db: Session) -> int:
+    global _version_failing
+    try:
+        version = db.query(SysConfigVersion.version).filter(SysConfigVersion.id == 1).scalar() or 0
+    except DBAPIError as e:
+        # 未执行迁移（缺少版本表）时退化为只在本进程内刷新
+        if _version_failing:
+            logger.debug(f"读取配置版本号失败: {e.orig}")
+        else:
+            _version_failing = True
+            logger.warning(f"读取配置版本号失败（恢复前不再重复警告）: {e.orig}")
+        return 0
+    if _version_failing:
+        _version_failing = False
+        logger.info("配置版本号读取已恢复")
+    return version
+
+
+def _load(db: Session) -> ConfigSnapshot:
+    """先读版本号再读配置：读取期间发生的变更会使版本号大于快照版本，下次轮询时再加载"""
+    version = _read_version(db)
+    raw, types, typed, public = {}, {}, {}, set()
+    for key, value, default_value, value_type, is_public in db.query(
+        SysConfig.key, SysConfig.value, SysConfig.default_value, SysConfig.value_type, SysConfig.is_public
+    ):
+        value = value if value is not None else default_value
+        vtype = _norm_type(value_type)
+        raw[key] = value
+        types[key] = vtype
+        # json 每次调用重新解析，避免调用方修改共享的 dict / list
+        typed[key] = _MISSING if vtype == 'json' else _parse_value(value, vtype, _MISSING)
+        if is_public == 1:
+            public.add(key)
+    return ConfigSnapshot(version, MappingProxyType(raw), MappingProxyType(types),
+                          MappingProxyType(typed), frozenset(public), time.time())
+
+
+def _install(snapshot: ConfigSnapshot) -> None:
+    global _snapshot, _generation, _reloads
+    with _load_lock:
+        _snapshot = snapshot
+        _generation += 1
+        _reloads += 1
+
+
+def _reload(db: Optional[Session] = None) -> ConfigSnapshot:
+    if db is None:
+        with session_scope() as db:
+            _install(_load(db))
+    else:
+        _install(_load(db))
+    return _snapshot
+
 
-# 配置缓存（避免频繁查询数据库）
-_config_cache = {}
+def get_snapshot(db: Optional[Session] = None) -> ConfigSnapshot:
+    """当前配置快照；首次访问时加载"""
+    return _snapshot if _snapshot is not None else _reload(db)
 
 
 def get_config(
@@ -27,44 +129,32 @@ def get_config(
     db: Optional[Session] = None
 ) -> Any:
     """
-    从数据库获取配置值
-    
+    获取配置值（读快照，不访问数据库）
+
     Args:
         key: 配置键名
         value_type: 值类型 string/int/float/bool/json
         default: 默认值
-        db: 数据库会话（可选）
-    
+        db: 数据库会话（可选，仅首次加载快照时使用）
+
     Returns:
         配置值（已转换类型）
     """
-    # 优先从缓存读取
-    if key in _config_cache:
-        return _parse_value(_config_cache[key], value_type, default)
-    
-    # 从数据库读取
-    should_close = False
-    if db is None:
-        db = SessionLocal()
-        should_close = True
-    
-    try:
-        config = db.query(SysConfig).filter(SysConfig.key == key).first()
-        if config:
-            value = config.value if config.value is not None else config.default_value
-            _config_cache[key] = value
-            return _parse_value(value, value_type, default)
+    snap = get_snapshot(db)
+    if key not in snap.raw:
         return default
-    finally:
-        if should_close:
-            db.close()
+    vtype = _norm_type(value_type)
+    if vtype == snap.types[key] and vtype != 'json':
+        value = snap.typed[key]
+        return default if value is _MISSING else value
+    return _parse_value(snap.raw[key], vtype, default)
 
 
 def _parse_value(value: str, value_type: str, default: Any) -> Any:
     """解析配置值类型"""
     if value is None or value == '':
         return default
-    
+
     try:
         if value_type == 'int' or value_type == 'number':
             return int(value)
@@ -81,45 +171,123 @@ def _parse_value(value: str, value_type: str, default: Any) -> Any:
         return default
 
 
+def bump_config_version(db: Session) -> int:
+    """数据库中的配置版本号 +1 并提交，返回新版本号"""
+    updated = db.query(SysConfigVersion).filter(SysConfigVersion.id == 1).update(
+        {SysConfigVersion.version: SysConfigVersion.version + 1, SysConfigVersion.updated_at: datetime.now()},
+        synchronize_session=False,
+    )
+    if not updated:
+        db.add(SysConfigVersion(id=1, version=1, updated_at=datetime.now()))
+        try:
+            db.commit()
+            return 1
+        except IntegrityError:
+            # 其他 worker 同时插入了版本行
+            db.rollback()
+            return bump_config_version(db)
+    db.commit()
+    return _read_version(db)
+
+
 def refresh_config_cache():
-    """刷新配置缓存（配置更新后调用）"""
-    global _config_cache
-    _config_cache.clear()
+    """配置更新（已提交）后调用：递增数据库版本号，本进程立即重新加载，其他 worker 轮询后跟进"""
+    with session_scope() as db:
+        try:
+            bump_config_version(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"配置版本号更新失败，其他 worker 将在重启前使用旧配置: {e}")
+        _reload(db)
+
+
+def get_config_version() -> int:
+    """获取本进程配置快照的代数（装入新快照后递增）"""
+    return _generation
 
 
 def get_all_configs(db: Optional[Session] = None) -> dict:
     """获取所有配置（字典格式）"""
-    should_close = False
-    if db is None:
-        db = SessionLocal()
-        should_close = True
-    
-    try:
-        configs = db.query(SysConfig).all()
-        result = {}
-        for cfg in configs:
-            value = cfg.value if cfg.value is not None else cfg.default_value
-            result[cfg.key] = _parse_value(value, cfg.value_type, None)
-        return result
-    finally:
-        if should_close:
-            db.close()
+    snap = get_snapshot(db)
+    return {key: _typed_value(snap, key) for key in snap.raw}
 
 
 def get_public_configs(db: Optional[Session] = None) -> dict:
     """获取所有公开配置"""
-    should_close = False
-    if db is None:
-        db = SessionLocal()
-        should_close = True
-    
-    try:
-        configs = db.query(SysConfig).filter(SysConfig.is_public == 1).all()
-        result = {}
-        for cfg in configs:
-            value = cfg.value if cfg.value is not None else cfg.default_value
-            result[cfg.key] = _parse_value(value, cfg.value_type, None)
-        return result
-    finally:
-        if should_close:
-            db.close()
+    snap = get_snapshot(db)
+    return {key: _typed_value(snap, key) for key in snap.raw if key in snap.public}
+
+
+def _typed_value(snap: ConfigSnapshot, key: str) -> Any:
+    value = snap.typed[key]
+    if value is _MISSING:
+        return _parse_value(snap.raw[key], snap.types[key], None)
+    return value
+
+
+# ---------------------------
+# 版本号轮询
+# ---------------------------
+class _ConfigWatcher:
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.polls = 0
+        self.errors = 0
+        self._failing = False
+
+    def start(self) -> None:
+        """启动时预先加载快照，并按 CONFIG_POLL_INTERVAL 启动轮询线程"""
+        try:
+            get_snapshot()
+        except Exception as e:
+            logger.error(f"加载配置快照失败: {e}")
+        interval = settings.CONFIG_POLL_INTERVAL
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                with session_scope() as db:
+                    self.polls += 1
+                    if _snapshot is None or _read_version(db) != _snapshot.version:
+                        _reload(db)
+            except Exception as e:
+                # 连续失败只警告一次，其后降为 debug，直到再次轮询成功
+                self.errors += 1
+                if self._failing:
+                    logger.debug(f"配置版本号轮询失败: {e}")
+                else:
+                    self._failing = True
+                    logger.warning(f"配置版本号轮询失败（恢复前不再重复警告）: {e}")
+            else:
+                if self._failing:
+                    self._failing = False
+                    logger.info("配置版本号轮询已恢复")
+
+
+config_watcher = _ConfigWatcher()
+
+
+def config_stats() -> dict:
+    snap = _snapshot
+    return {
+        "version": snap.version if snap else None,
+        "generation": _generation,
+        "keys": len(snap.raw) if snap else 0,
+        "loaded_at": snap.loaded_at if snap else None,
+        "reloads": _reloads,
+        "polls": config_watcher.polls,
+        "poll_errors": config_watcher.errors,
+        "poll_interval": settings.CONFIG_POLL_INTERVAL,
+    }
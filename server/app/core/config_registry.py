@@ -0,0 +1,152 @@
+# app/core/config_registry.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+类型化配置注册表 - 热路径读取配置用
+用法:
+    from app.core.config_registry import typed_config
+
+    cfg = typed_config()
+    if size > cfg.upload_max_bytes: ...
+    if ext not in cfg.upload_allowed_exts: ...
+
+实现:
+- CONFIG_KEYS 声明已知配置项的类型与默认值，DERIVED 声明由其计算的派生值（后缀集合、字节数、绝对路径等）
+- 每个配置快照（见 config_loader）只构建一次 TypedConfig：所有声明的键与派生值都是普通属性，
+  请求内读取不再解析类型、不再拆分逗号列表；配置变更装入新快照后，下一次访问时重建
+- 未声明的配置项仍用 get_config 读取
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config_loader import ConfigSnapshot, get_config, get_snapshot
+from app.utils.thumb_sizes import parse_sizes
+
+
+class ConfigKey(NamedTuple):
+    value_type: str
+    default: Any
+    # 为 True 时 0 / 空值也取默认值（对应原来 `int(get_config(...) or default)` 的写法）
+    falsy_default: bool = False
+
+
+CONFIG_KEYS: Dict[str, ConfigKey] = {
+    # 上传
+    'upload_path': ConfigKey('string', './runtime/uploads'),
+    'upload_max_size': ConfigKey('int', 10),  # MB
+    'upload_allowed_exts': ConfigKey('string', 'jpg,jpeg,png,gif,pdf,doc,docx,xls,xlsx,zip'),
+    'upload_storage': ConfigKey('string', 'local'),
+    'media_thumb_sizes': ConfigKey('string', '160,320,640'),
+    # 静态文件访问
+    'enable_static_access': ConfigKey('bool', False),
+    'static_url_prefix': ConfigKey('string', '/runtime/uploads', True),
+    'static_allowed_types': ConfigKey('string', ''),
+    # 登录
+    'login_rate_limit_requests': ConfigKey('int', 20, True),
+    'login_rate_limit_window': ConfigKey('int', 60, True),
+    'login_max_fails': ConfigKey('int', 5, True),
+    'login_lock_seconds': ConfigKey('int', 600, True),
+    'enable_captcha': ConfigKey('bool', True),
+    'session_expire_minutes': ConfigKey('int', 120),
+    # 密码复杂度
+    'password_complexity_enabled': ConfigKey('bool', False),
+    'password_min_length': ConfigKey('int', 8, True),
+    'password_require_uppercase': ConfigKey('bool', True),
+    'password_require_lowercase': ConfigKey('bool', True),
+    'password_require_digit': ConfigKey('bool', True),
+    'password_require_special': ConfigKey('bool', True),
+    # 邮件
+    'smtp_host': ConfigKey('string', ''),
+    'smtp_port': ConfigKey('int', 465, True),
+    'smtp_user': ConfigKey('string', ''),
+    'smtp_password': ConfigKey('string', ''),
+    'smtp_from': ConfigKey('string', ''),
+    'smtp_ssl': ConfigKey('bool', True),
+    'smtp_ssl_verify': ConfigKey('bool', False),
+    'site_name': ConfigKey('string', 'Foadmin'),
+}
+
+
+def _ext_set(value: Optional[str]) -> frozenset:
+    """逗号分隔的后缀列表 -> 小写后缀集合"""
+    return frozenset(ext.strip().lower() for ext in (value or '').split(',') if ext.strip())
+
+
+# 派生值：name -> fn(已类型化的配置项)
+DERIVED: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'upload_root': lambda v: os.path.abspath(v['upload_path']),
+    'upload_max_bytes': lambda v: v['upload_max_size'] * 1024 * 1024,
+    'upload_allowed_ext_set': lambda v: _ext_set(v['upload_allowed_exts']),
+    'media_thumb_size_list': lambda v: tuple(parse_sizes(v['media_thumb_sizes'])),
+    'static_allowed_ext_set': lambda v: _ext_set(v['static_allowed_types']),
+}
+
+
+class TypedConfig:
+    """某个配置快照的类型化视图（只读），属性名为 CONFIG_KEYS 与 DERIVED 中的名称"""
+
+    def __init__(self, snapshot: ConfigSnapshot, values: Dict[str, Any]):
+        self.__dict__.update(values)
+        self.__dict__['snapshot'] = snapshot
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TypedConfig 只读")
+
+    def __getattr__(self, name):
+        # 仅在属性不存在时调用
+        raise AttributeError(f"未在 config_registry 中声明的配置项: {name}")
+
+
+def _typed(key: str, spec: ConfigKey, db: Optional[Session]) -> Any:
+    value = get_config(key, spec.value_type, spec.default, db)
+    if spec.falsy_default and not value:
+        return spec.default
+    # 配置表里登记的类型与声明不一致时（如 upload_max_size 登记为 string）按声明再转换一次
+    if spec.value_type == 'int' and not isinstance(value, int):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return spec.default
+    return value
+
+
+def _build(snapshot: ConfigSnapshot, db: Optional[Session]) -> TypedConfig:
+    values = {key: _typed(key, spec, db) for key, spec in CONFIG_KEYS.items()}
+    for name, derive in DERIVED.items():
+        values[name] = derive(values)
+    return TypedConfig(snapshot, values)
+
+
+_current: Optional[TypedConfig] = None
+_build_lock = threading.Lock()
+_builds = 0
+
+
+def typed_config(db: Optional[Session] = None) -> TypedConfig:
+    """
+    当前配置快照对应的 TypedConfig（按快照缓存，快照更新后首次访问时重建）
+
+    Args:
+        db: 数据库会话（可选，仅首次加载配置快照时使用）
+    """
+    global _current, _builds
+    snapshot = get_snapshot(db)
+    cfg = _current
+    if cfg is not None and cfg.snapshot is snapshot:
+        return cfg
+    with _build_lock:
+        cfg = _current
+        if cfg is None or cfg.snapshot is not snapshot:
+            cfg = _current = _build(snapshot, db)
+            _builds += 1
+    return cfg
+
+
+def typed_config_stats() -> dict:
+    cfg = _current
+    return {"builds": _builds, "keys": len(CONFIG_KEYS), "derived": len(DERIVED),
+            "version": cfg.snapshot.version if cfg else None}
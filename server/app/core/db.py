@@ -1,17 +1,193 @@
 # app/core/db.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.MYSQL_DSN, pool_pre_ping=True, pool_recycle=3600)
+# 连接池参数（DB_POOL_*），同步 / 异步、主库 / 只读库共用
+POOL_KWARGS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+
+engine = create_engine(settings.MYSQL_DSN, **POOL_KWARGS)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# 只读库（MYSQL_READ_DSN）：未配置时与主库为同一个引擎
+read_engine = create_engine(settings.MYSQL_READ_DSN, **POOL_KWARGS) if settings.MYSQL_READ_DSN else engine
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False) if settings.MYSQL_READ_DSN else SessionLocal
+
 class Base(DeclarativeBase):
     pass
 
-def get_db():
-    db = SessionLocal()
+
+# ---------------------------
+# 请求级会话：一次请求内的中间件、依赖、配置加载共用同一个会话（同一条连接）
+# 由 DBSessionMiddleware 开启 / 关闭，首次使用时才创建
+# ---------------------------
+class RequestSessions:
+    __slots__ = ("primary", "replica")
+
+    def __init__(self):
+        self.primary: Optional[Session] = None
+        self.replica: Optional[Session] = None
+
+    def get(self, replica: bool = False) -> Session:
+        if replica and read_engine is not engine:
+            if self.replica is None:
+                self.replica = ReadSessionLocal()
+            return self.replica
+        if self.primary is None:
+            self.primary = SessionLocal()
+        return self.primary
+
+    @property
+    def used(self) -> bool:
+        return self.primary is not None or self.replica is not None
+
+    def release(self) -> None:
+        """归还连接但保留会话对象：之后（如流式响应的生成器里）再使用会重新取连接，由 close 最终关闭"""
+        for s in (self.primary, self.replica):
+            if s is not None:
+                s.close()
+
+    def close(self) -> None:
+        for s in (self.primary, self.replica):
+            if s is not None:
+                s.close()
+        self.primary = self.replica = None
+
+
+_request_sessions: ContextVar[Optional[RequestSessions]] = ContextVar("db_request_sessions", default=None)
+
+
+# 归还 / 关闭请求会话连接专用的线程（会回滚未提交事务，涉及 I/O，不在事件循环上执行）。
+# 不与请求处理函数共用 AnyIO 线程池：线程池被等待连接的请求占满时，已完成的请求仍能归还连接，
+# 否则要等到 DB_POOL_TIMEOUT 超时才能继续
+_release_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="db-release")
+
+
+async def release_in_thread(fn) -> None:
+    """在专用线程中执行 RequestSessions.release / close 或 Session.close"""
+    await asyncio.get_running_loop().run_in_executor(_release_executor, fn)
+
+
+def begin_request_sessions():
+    """开启请求级会话，返回供 end_request_sessions 使用的 token"""
+    return _request_sessions.set(RequestSessions())
+
+
+def current_request_sessions() -> Optional[RequestSessions]:
+    return _request_sessions.get()
+
+
+def end_request_sessions(token) -> RequestSessions:
+    """结束请求级会话，返回持有的会话（由调用方关闭，关闭会回滚未提交事务，涉及 I/O）"""
+    holder = _request_sessions.get()
+    _request_sessions.reset(token)
+    return holder
+
+
+@contextmanager
+def session_scope(replica: bool = False) -> Iterator[Session]:
+    """
+    请求内：返回请求共享的会话，不关闭（请求结束时统一关闭）
+    请求外（调度任务、后台线程、启动脚本）：新建会话，用完关闭
+    """
+    holder = _request_sessions.get()
+    if holder is not None:
+        yield holder.get(replica)
+        return
+    db = (ReadSessionLocal if replica else SessionLocal)()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_db():
+    with session_scope() as db:
+        yield db
+
+
+def get_read_db():
+    """只读查询（列表、导出）：配置了 MYSQL_READ_DSN 时走只读库，存在复制延迟，不要用于写后立即读"""
+    with session_scope(replica=True) as db:
+        yield db
+
+
+# ---------------------------
+# 异步引擎（读多写少、纯 I/O 的接口使用，不占用线程池）
+# ---------------------------
+_ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
+
+
+def async_dsn(dsn: str) -> str:
+    """同步 DSN 换成对应的异步驱动：mysql+pymysql -> mysql+aiomysql，sqlite -> sqlite+aiosqlite"""
+    url = make_url(dsn)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"不支持的异步数据库类型: {url.get_backend_name()}，请配置 ASYNC_MYSQL_DSN")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+# 显式指定连接池：aiosqlite 文件库默认是 NullPool（每次请求新建连接与线程），与同步引擎保持一致
+async_engine: AsyncEngine = create_async_engine(
+    settings.ASYNC_MYSQL_DSN or async_dsn(settings.MYSQL_DSN), poolclass=AsyncAdaptedQueuePool, **POOL_KWARGS
+)
+# expire_on_commit=False：提交后仍可直接读取对象属性，避免在异步会话里触发隐式懒加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_read_engine: AsyncEngine = create_async_engine(
+    async_dsn(settings.MYSQL_READ_DSN), poolclass=AsyncAdaptedQueuePool, **POOL_KWARGS
+) if settings.MYSQL_READ_DSN else async_engine
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, autoflush=False, expire_on_commit=False
+) if settings.MYSQL_READ_DSN else AsyncSessionLocal
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """get_read_db 的异步版本"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def pool_stats() -> dict:
+    """各连接池占用情况（/api/admin/system/info/metrics）"""
+    def one(pool) -> dict:
+        if not hasattr(pool, "checkedout"):
+            return {"class": type(pool).__name__}
+        return {"size": pool.size(), "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(), "checked_in": pool.checkedin()}
+
+    data = {"primary": one(engine.pool), "async": one(async_engine.sync_engine.pool)}
+    if read_engine is not engine:
+        data["replica"] = one(read_engine.pool)
+        data["async_replica"] = one(async_read_engine.sync_engine.pool)
+    return data
+
+
+async def dispose_engines() -> None:
+    """关闭连接池（main.on_shutdown 调用）"""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
@@ -4,37 +4,46 @@
 # BUG反馈邮箱: 1032904660@qq.com
 from fastapi import Depends, HTTPException, status, Request
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.core.db import get_db
+from app.core.token_cache import Claims, token_cache
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def get_current_user(request: Request):
     auth = request.headers.get("Authorization", "")
     if not auth.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No token")
-    
+
     token = auth.split(" ", 1)[1]
-    try:
-        # 解码 token
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGO])
-        print(f"Decoded payload roles: {payload.get('roles')}")  # 调试日志
-        # 将用户信息注入到 request.state 中
-        request.state.user_id = payload.get("sub")  
-        request.state.user_name = payload.get("username")
-        request.state.roles = payload.get("roles", [])
-        request.state.perms = payload.get("perms", [])
-        request.state.user_roles = request.state.roles
-        request.state.user_perms  = request.state.perms
-        
-        return payload  # 返回 payload，包含 sub、roles、perms 等信息
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    # 命中缓存则跳过验签与解析（缓存有效期不超过 token 的 exp）
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = Claims(jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGO]))
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        token_cache.put(token, payload)
+
+    # 将用户信息注入到 request.state 中
+    request.state.user_id = payload.get("sub")
+    request.state.user_name = payload.get("username")
+    request.state.roles = payload.get("roles", [])
+    request.state.perms = payload.get("perms") or payload.perm_set
+    request.state.user_roles = request.state.roles
+    request.state.user_perms  = request.state.perms
+
+    return payload  # 返回 payload，包含 sub、roles、perms 等信息（缓存共享，勿修改）
+
 
+def has_perm(user: dict, code: str) -> bool:
+    """权限判断：优先使用预先计算的权限集合"""
+    perm_set = getattr(user, "perm_set", None)
+    if perm_set is None:
+        return code in user.get("perms", [])
+    return code in perm_set
 
 
 def require_perm(code: str):
     def checker(user = Depends(get_current_user)):
-        if code not in user.get("perms", []):
+        if not has_perm(user, code):
             raise HTTPException(status_code=403, detail="No permission")
         return user
-    return checker
\ No newline at end of file
+    return checker
@@ -0,0 +1,116 @@
+# app/core/file_response.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+文件响应工具：协商缓存 + 大块发送
+
+上传文件按 sha256 内容寻址、写入后不再变化，因此：
+- ETag 使用由哈希派生的强校验值，配合长期 immutable 缓存
+- 支持 If-None-Match / If-Modified-Since，命中返回 304（不读文件），304 同样带上 Vary / Content-Location
+- 全量响应按 1MB 大块读取发送；服务器声明 http.response.pathsend 扩展（如 Granian）时，
+  由 Starlette FileResponse 直接把文件路径交给服务器发送。
+  项目默认的 uvicorn 不支持该扩展，走大块读取
+- Range 请求沿用 Starlette FileResponse 的实现（206 / 多段 / If-Range）
+"""
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def strong_etag(digest: str, size: int) -> str:
+    """由内容哈希派生强 ETag"""
+    return f'"{digest}-{size}"'
+
+
+def is_not_modified(request_headers: Headers, etag: str, mtime: float) -> bool:
+    """
+    判断协商缓存是否命中（RFC 7232）
+    - 有 If-None-Match 时只比较 ETag（弱比较），忽略 If-Modified-Since
+    - 否则比较 If-Modified-Since 与文件修改时间（秒级）
+    """
+    inm = request_headers.get("if-none-match")
+    if inm:
+        if inm.strip() == "*":
+            return True
+        target = etag[2:] if etag.startswith("W/") else etag
+        for tag in inm.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == target:
+                return True
+        return False
+
+    ims = request_headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(ims).timestamp())
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+    return False
+
+
+# 304 响应中需与 200 保持一致的表示相关头（RFC 7232 4.1），小写比较
+NOT_MODIFIED_HEADERS = ("vary", "content-location", "expires")
+
+
+class ChunkedFileResponse(FileResponse):
+    """FileResponse 按 1MB 大块读取（默认 64KB），减少大文件发送时的 Python 循环次数"""
+    chunk_size = 1024 * 1024
+
+
+def conditional_file_response(
+    request_headers: Headers,
+    path: str,
+    *,
+    media_type: str,
+    digest: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None,
+    stat_result: Optional[os.stat_result] = None,
+) -> Response:
+    """
+    构建带协商缓存的文件响应
+
+    Args:
+        request_headers: 请求头
+        path: 文件绝对路径
+        media_type: MIME 类型
+        digest: 内容哈希（sha256 或其前缀）；提供时使用强 ETag，默认附带 immutable 缓存
+        cache_control: Cache-Control，缺省时内容寻址文件为 immutable，其余不设置
+        headers: 额外响应头（如 Content-Disposition）
+        stat_result: 已有的 os.stat 结果，避免重复 stat
+
+    Returns:
+        304 Response 或 ChunkedFileResponse
+    """
+    st = stat_result or os.stat(path)
+    if digest:
+        etag = strong_etag(digest, st.st_size)
+        if cache_control is None:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+
+    base_headers = {"ETag": etag, "Last-Modified": last_modified}
+    if cache_control:
+        base_headers["Cache-Control"] = cache_control
+
+    if is_not_modified(request_headers, etag, st.st_mtime):
+        for name, value in (headers or {}).items():
+            if name.lower() in NOT_MODIFIED_HEADERS:
+                base_headers[name] = value
+        return Response(status_code=304, headers=base_headers)
+
+    if headers:
+        base_headers.update(headers)
+    return ChunkedFileResponse(path, media_type=media_type, headers=base_headers, stat_result=st)
@@ -1,27 +1,81 @@
 # app/core/middlewares.py
+# 纯 ASGI 中间件：不经过 BaseHTTPMiddleware 的任务切换与响应体重新包装，
+# StreamingResponse（媒体预览、CSV 导出等）可以原样流式透传
 import json, time
-from typing import Callable
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi import Request
-from app.core.db import SessionLocal
+from app.core.db import (
+    begin_request_sessions, current_request_sessions, end_request_sessions, release_in_thread, session_scope,
+)
 from app.core.trace import get_or_create_trace_id
-from app.models.audit import AuditLog
+from app.core.audit_writer import audit_writer
 from app.models.login_log import LoginLog
 from app.models.user import User
-from sqlalchemy import text
 
 WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 AUDIT_EXCLUDE_PATH_PREFIX = ("/docs", "/redoc", "/openapi", "/static")
+RESOURCE_ID_KEYS = ("id", "rid", "pid", "uid", "file_id", "user_id")
 
-class LoginLogMiddleware(BaseHTTPMiddleware):
+
+class DBSessionMiddleware:
+    """
+    请求级数据库会话：请求内的中间件、依赖（get_db / get_read_db）、配置加载共用同一个会话，
+    一个请求最多占用一条主库连接（配置只读库时另加一条只读连接）。
+    接口返回（发出 http.response.start）时即归还连接，流式响应体（预览、下载、导出、SSE）发送期间不占用连接池；
+    之后再使用会话会重新取连接，请求结束时统一关闭。
+    需注册在最外层，以覆盖其他中间件。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = begin_request_sessions()
+        holder = current_request_sessions()
+        released = False
+
+        async def send_wrapper(message: Message):
+            nonlocal released
+            if message["type"] == "http.response.start" and not released:
+                released = True
+                if holder.used:
+                    await release_in_thread(holder.release)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request_sessions(token)
+            if holder.used:
+                await release_in_thread(holder.close)
+
+
+class LoginLogMiddleware:
     LOGIN_PATH = "/api/common/login"
 
-    async def dispatch(self, request: Request, call_next: Callable):
-        if request.url.path != self.LOGIN_PATH or request.method not in {"POST"}:
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] != self.LOGIN_PATH or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        # 读取完整请求体用于解析用户名，随后重放给下游
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body_bytes = b"".join(chunks)
 
-        start = time.perf_counter()
-        body_bytes = await request.body()
         username = None
         try:
             data = json.loads(body_bytes.decode("utf-8") or "{}")
@@ -29,62 +83,91 @@ class LoginLogMiddleware(BaseHTTPMiddleware):
         except Exception:
             pass
 
-        async def receive():
-            return {"type": "http.request", "body": body_bytes, "more_body": False}
-        request._receive = receive
+        body_replayed = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_replayed
+            if not body_replayed:
+                body_replayed = True
+                return {"type": "http.request", "body": body_bytes, "more_body": False}
+            return await receive()
 
         status = "SUCCESS"; message = None; http_status = 200
+
+        async def send_wrapper(msg: Message):
+            nonlocal http_status
+            if msg["type"] == "http.response.start":
+                http_status = msg["status"]
+            await send(msg)
+
         try:
-            response = await call_next(request)
-            http_status = getattr(response, "status_code", 200) or 200
+            await self.app(scope, replay_receive, send_wrapper)
             if http_status >= 400:
                 status = "FAIL"
                 message = f"HTTP {http_status}"
-            return response
         except Exception as e:
             status = "FAIL"
             http_status = getattr(e, "status_code", 500) or 500
             message = str(e)[:250]
             raise
         finally:
-            db = SessionLocal()
-            try:
-                # 查询用户ID
-                user = None
-                if username:
-                    user = db.query(User).filter(User.username == username).first()
-                actor_id = user.id if user else getattr(request.state, "user_id", None)
-                actor_name = getattr(request.state, "user_name", username)
-
-                row = LoginLog(
-                    trace_id=get_or_create_trace_id(request),
-                    actor_id=actor_id,
-                    actor_name=actor_name,
-                    ip=request.client.host if request.client else None,
-                    user_agent=request.headers.get("user-agent"),
-                    status=status,
-                    message=message
-                )
-                db.add(row)
-                db.commit()
-            finally:
-                db.close()
-
-class RequestAuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
+            request = Request(scope)
+            await run_in_threadpool(self._write_log, request, username, status, message)
+
+    @staticmethod
+    def _write_log(request: Request, username, status: str, message):
+        with session_scope() as db:
+            # 共享会话里登录接口未提交的改动一律丢弃，与原来关闭会话的效果一致
+            db.rollback()
+            # 查询用户ID
+            user = None
+            if username:
+                user = db.query(User).filter(User.username == username).first()
+            actor_id = user.id if user else getattr(request.state, "user_id", None)
+            actor_name = getattr(request.state, "user_name", username)
+
+            row = LoginLog(
+                trace_id=get_or_create_trace_id(request),
+                actor_id=actor_id,
+                actor_name=actor_name,
+                ip=request.client.host if request.client else None,
+                user_agent=request.headers.get("user-agent"),
+                status=status,
+                message=message
+            )
+            db.add(row)
+            db.commit()
+
+
+class RequestAuditMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
         # 排除不需要审计的路径
-        if (request.method == "GET" or 
-            any(request.url.path.startswith(prefix) for prefix in AUDIT_EXCLUDE_PATH_PREFIX) or
-            request.url.path == "/api/common/login"):  # 排除登录路径
-            return await call_next(request)
+        if (scope["method"] == "GET" or
+            path.startswith(AUDIT_EXCLUDE_PATH_PREFIX) or
+            path == LoginLogMiddleware.LOGIN_PATH):  # 排除登录路径
+            await self.app(scope, receive, send)
+            return
+
         start = time.perf_counter()
         http_status = 200
         status = "SUCCESS"
         message = None
+
+        async def send_wrapper(msg: Message):
+            nonlocal http_status
+            if msg["type"] == "http.response.start":
+                http_status = msg["status"]
+            await send(msg)
+
         try:
-            response = await call_next(request)
-            http_status = getattr(response, "status_code", 200) or 200
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             status = "FAIL"
             message = str(e)[:500]
@@ -92,6 +175,8 @@ class RequestAuditMiddleware(BaseHTTPMiddleware):
             raise
         finally:
             latency_ms = int((time.perf_counter() - start) * 1000)
+            # 路由匹配后 path_params / state 已写回同一个 scope
+            request = Request(scope)
 
             # 获取用户名 (不再记录 ID)
             actor_name = getattr(request.state, "user_name", None)  # 获取用户名
@@ -101,22 +186,18 @@ class RequestAuditMiddleware(BaseHTTPMiddleware):
             ip = request.client.host if request.client else None
             ua = request.headers.get("user-agent")
             method = request.method
-            path = request.url.path
 
             # 1) 尝试从路由参数取 resource_id
-            try:
-                path_params = (request.scope or {}).get("path_params", {})
-            except Exception:
-                path_params = {}
+            path_params = scope.get("path_params") or {}
             resource_id = None
-            for k in ("id", "rid", "pid", "uid", "file_id", "user_id"):
+            for k in RESOURCE_ID_KEYS:
                 if k in path_params and path_params[k] is not None:
                     resource_id = str(path_params[k])
                     break
             # 2) 若路由参数没有，再从查询串兜底
             if resource_id is None:
                 qp = request.query_params
-                for k in ("id", "rid", "pid", "uid", "file_id", "user_id"):
+                for k in RESOURCE_ID_KEYS:
                     if k in qp and qp[k]:
                         resource_id = qp[k]
                         break
@@ -124,28 +205,24 @@ class RequestAuditMiddleware(BaseHTTPMiddleware):
             # 3) 记录操作者角色快照（对齐 get_current_user）
             actor_roles = getattr(request.state, "roles", None)
 
-            db = SessionLocal()
-            try:
-                
-                row = AuditLog(
-                    trace_id=trace_id,
-                    level="BUSINESS",
-                    status=status,
-                    action="operate",  # 操作类型
-                    resource_type="system",  # 资源类型
-                    actor_id=actor_id,
-                    actor_name=actor_name, 
-                    actor_roles=actor_roles,
-                    ip=ip,
-                    user_agent=ua,
-                    method=method,
-                    path=path,
-                    resource_id=resource_id,
-                    http_status=http_status,
-                    latency_ms=latency_ms,
-                    message=message
-                )
-                db.add(row)
-                db.commit()
-            finally:
-                db.close()
+            row = dict(
+                trace_id=trace_id,
+                level="BUSINESS",
+                status=status,
+                action="operate",  # 操作类型
+                resource_type="system",  # 资源类型
+                actor_id=actor_id,
+                actor_name=actor_name,
+                actor_roles=actor_roles,
+                ip=ip,
+                user_agent=ua,
+                method=method,
+                path=path,
+                resource_id=resource_id,
+                http_status=http_status,
+                latency_ms=latency_ms,
+                message=message
+            )
+            # 投递到批量写入队列；block 策略下队列满时到线程池中等待，避免阻塞事件循环
+            if not audit_writer.submit(row):
+                await run_in_threadpool(audit_writer.put, row)
@@ -0,0 +1,128 @@
+# app/core/password_hasher.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+登录密码哈希专用线程池
+
+- 密码校验 / 哈希（pbkdf2 / bcrypt，单次约数十到上百毫秒 CPU）放到独立的定长线程池执行，
+  不占用 FastAPI 默认线程池，撞库式突发请求不会拖垮其他同步接口
+- 背压：在途（执行中 + 排队）数量达到 PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE 时立即返回 429
+- 校验耗时（含排队）记入直方图，见 /api/admin/system/info/metrics 的 password_hasher
+
+用法:
+    ok = await password_hasher.verify(plain, hashed)      # 繁忙时抛 HTTPException(429)
+    new_hash = await password_hasher.hash(plain)
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._counts: List[int] = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float) -> None:
+        i = 0
+        while i < len(self.buckets) and ms > self.buckets[i]:
+            i += 1
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += ms
+
+    def snapshot(self) -> dict:
+        """累计计数（le=上界），与 Prometheus histogram 口径一致"""
+        with self._lock:
+            counts, total_ms = list(self._counts), self._sum
+        cumulative, buckets = 0, {}
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            "buckets": buckets,
+            "count": cumulative,
+            "sum_ms": round(total_ms, 1),
+            "avg_ms": round(total_ms / cumulative, 1) if cumulative else None,
+        }
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = 2, queue_size: int = 16):
+        self.workers = max(1, int(workers))
+        self.queue_size = max(0, int(queue_size))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self.verify_latency = LatencyHistogram()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwd-hash")
+            return self._executor
+
+    async def _run(self, fn: Callable, *args):
+        with self._lock:
+            if self._inflight >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise HTTPException(status_code=429, detail="登录请求过多，请稍后再试")
+            self._inflight += 1
+        try:
+            return await asyncio.wrap_future(self._pool().submit(fn, *args))
+        finally:
+            with self._lock:
+                self._inflight -= 1
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        from app.core.security import verify_password
+        start = time.perf_counter()
+        ok = await self._run(verify_password, plain, hashed)
+        self.verify_latency.observe((time.perf_counter() - start) * 1000)
+        return ok
+
+    async def hash(self, plain: str) -> str:
+        from app.core.security import hash_password
+        return await self._run(hash_password, plain)
+
+    def count_rehash(self) -> None:
+        with self._lock:
+            self._rehashed += 1
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "inflight": self._inflight,
+                "rejected": self._rejected,
+                "rehashed": self._rehashed,
+            }
+        data["verify_latency_ms"] = self.verify_latency.snapshot()
+        return data
+
+
+# 全局实例（线程池按需创建，main.on_shutdown 关闭）
+password_hasher = PasswordHasher(workers=settings.PASSWORD_HASH_WORKERS, queue_size=settings.PASSWORD_HASH_QUEUE)
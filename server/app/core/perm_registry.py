@@ -0,0 +1,156 @@
+# app/core/perm_registry.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+权限集合注册表（精简令牌使用）
+
+精简令牌（AUTH_COMPACT_TOKEN=true）不再携带完整的 perms 列表，只带权限集合 ID：
+    "ps": "1.3"      # 用户签发时所属角色 ID（升序，点号分隔）
+服务端据此从内存注册表解析出权限集合：
+
+- 注册表由 Permission / RolePerm 构建：每个权限码（code 及 API 的 "METHOD:/path"）分配一个位，
+  每个角色对应一个整数位图，权限集合 = 各角色位图按位或；判断权限只需一次字典查找 + 一次位运算
+- 同一 ps 的解析结果在注册表版本内缓存
+- 角色授权、权限增删改后调用 invalidate()，下次使用时重建，已签发的令牌无需重新登录即按新权限生效
+- 多进程部署时其他进程无法收到 invalidate()，注册表最长 PERM_REGISTRY_TTL 秒后自动重建
+
+用法:
+    ps = perm_registry.set_id(role_ids)                 # 签发令牌时
+    if "user:list" in perm_registry.resolve(ps): ...    # 校验时
+    perm_registry.invalidate()                          # 角色 / 权限变更后
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.core.config import settings
+
+
+class _Snapshot:
+    """某一版本的注册表（只读）"""
+
+    __slots__ = ("version", "built_at", "codes", "index", "role_bits", "sets")
+
+    def __init__(self, version: int, codes: List[str], role_bits: Dict[int, int]):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.codes = codes
+        self.index = {c: i for i, c in enumerate(codes)}
+        self.role_bits = role_bits
+        self.sets: Dict[str, "PermSet"] = {}
+
+
+class PermSet:
+    """位图权限集合：支持 in / 迭代 / len，可直接替代 perms 列表使用"""
+
+    __slots__ = ("_snap", "bits")
+
+    def __init__(self, snap: _Snapshot, bits: int):
+        self._snap = snap
+        self.bits = bits
+
+    def __contains__(self, code: str) -> bool:
+        i = self._snap.index.get(code)
+        return i is not None and (self.bits >> i) & 1 == 1
+
+    def __iter__(self) -> Iterator[str]:
+        bits, i = self.bits, 0
+        while bits:
+            if bits & 1:
+                yield self._snap.codes[i]
+            bits >>= 1
+            i += 1
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+
+class PermRegistry:
+    def __init__(self, ttl: int = 60):
+        self.ttl = max(0, int(ttl))
+        self._snap: Optional[_Snapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._builds = 0
+
+    @staticmethod
+    def set_id(role_ids: Iterable[int]) -> str:
+        """角色 ID 集合 -> 权限集合 ID（与顺序、重复无关）"""
+        return ".".join(str(r) for r in sorted({int(r) for r in role_ids}))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snap = None
+            self._version += 1
+
+    def _build(self) -> _Snapshot:
+        from app.core.db import session_scope
+        from app.models.rbac import Permission, RolePerm
+
+        with session_scope() as db:
+            codes: List[str] = []
+            index: Dict[str, int] = {}
+            perm_bits: Dict[int, int] = {}
+            # 与 auth.load_user_perms 的展开规则一致：code 与 API 的 "METHOD:/path" 各占一位
+            for pid, code, ptype, method, path in db.query(
+                Permission.id, Permission.code, Permission.type, Permission.method, Permission.path
+            ):
+                keys = []
+                if code:
+                    keys.append(code)
+                if ptype == "api" and method and path:
+                    keys.append(f"{method}:{path}")
+                mask = 0
+                for key in keys:
+                    if key not in index:
+                        index[key] = len(codes)
+                        codes.append(key)
+                    mask |= 1 << index[key]
+                perm_bits[pid] = mask
+            role_bits: Dict[int, int] = {}
+            for rid, pid in db.query(RolePerm.role_id, RolePerm.perm_id):
+                role_bits[rid] = role_bits.get(rid, 0) | perm_bits.get(pid, 0)
+        return _Snapshot(self._version, codes, role_bits)
+
+    def _snapshot(self) -> _Snapshot:
+        snap = self._snap
+        if snap is not None and (not self.ttl or time.monotonic() - snap.built_at < self.ttl):
+            return snap
+        with self._lock:
+            snap = self._snap
+            if snap is None or (self.ttl and time.monotonic() - snap.built_at >= self.ttl):
+                version = self._version
+                snap = self._build()
+                self._builds += 1
+                # 构建期间发生 invalidate 时不缓存，下次重新构建
+                if version == self._version:
+                    self._snap = snap
+            return snap
+
+    def resolve(self, ps: str) -> PermSet:
+        snap = self._snapshot()
+        perm_set = snap.sets.get(ps)
+        if perm_set is None:
+            bits = 0
+            for rid in (ps or "").split("."):
+                if rid.isdigit():
+                    bits |= snap.role_bits.get(int(rid), 0)
+            perm_set = snap.sets[ps] = PermSet(snap, bits)
+        return perm_set
+
+    def stats(self) -> dict:
+        snap = self._snap
+        return {
+            "version": self._version,
+            "builds": self._builds,
+            "codes": len(snap.codes) if snap else 0,
+            "roles": len(snap.role_bits) if snap else 0,
+            "sets": len(snap.sets) if snap else 0,
+        }
+
+
+# 全局实例
+perm_registry = PermRegistry(ttl=settings.PERM_REGISTRY_TTL)
@@ -0,0 +1,282 @@
+# app/core/rate_limit.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+限流与登录锁定存储（可切换后端）
+
+- 限流算法：滑动窗口计数（当前窗口计数 + 上一窗口计数按剩余比例折算），每次检查 O(1)，
+  不会像固定窗口那样在窗口交界处放过 2 倍请求
+- 锁定 / 失败计数：带过期时间的计数器与键值
+- 所有条目都有过期时间，过期后自动清理，内存 / 磁盘占用不会随访问过的 IP 数无限增长
+- 后端（RATE_LIMIT_BACKEND）：
+  * memory：进程内字典（默认）；多 worker 部署时各进程独立计数
+  * sqlite：本机 SQLite 文件（WAL 模式，RATE_LIMIT_SQLITE_PATH），同一台机器上的多个 worker 共享计数
+
+用法:
+    from app.core.rate_limit import rate_limiter
+    ok, retry_after = rate_limiter.hit(f"login:ip:{ip}", limit=20, window=60)
+    n = rate_limiter.incr(f"login:fail:{username}", ttl=600)
+    rate_limiter.set(f"login:lock:{username}", until_ts, ttl=600)
+    rate_limiter.get(f"login:lock:{username}")
+    rate_limiter.delete(f"login:fail:{username}")
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _slide(state: Optional[Tuple[float, float, float]], now: float, window: float):
+    """
+    滑动窗口推进：state = (当前窗口起点, 当前窗口计数, 上一窗口计数)
+    返回 (推进后的 state, 估算的窗口内请求数)
+    """
+    start = math.floor(now / window) * window
+    if state is None:
+        cur_start, cur, prev = start, 0.0, 0.0
+    else:
+        cur_start, cur, prev = state
+        if start != cur_start:
+            prev = cur if start - cur_start == window else 0.0
+            cur, cur_start = 0.0, start
+    estimate = prev * (window - (now - cur_start)) / window + cur
+    return (cur_start, cur, prev), estimate
+
+
+def _retry_after(state: Tuple[float, float, float], now: float, window: float, limit: int) -> float:
+    """估算多久后可再次请求（秒）"""
+    cur_start, cur, prev = state
+    if cur >= limit or prev <= 0:
+        return max(0.0, cur_start + window - now)
+    # 上一窗口的折算部分随时间线性衰减：prev * (1 - t/window) + cur <= limit - 1
+    t = (1 - (limit - 1 - cur) / prev) * window
+    return max(0.0, cur_start + t - now)
+
+
+class MemoryBackend:
+    """进程内实现：所有条目带过期时间，按操作次数摊销清理"""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max(1, int(max_size))
+        self._items: Dict[str, Tuple[float, object]] = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def _sweep(self, now: float) -> None:
+        # 操作次数达到当前条目数后整体清理一次，摊销 O(1)
+        self._ops += 1
+        if self._ops < max(1000, len(self._items)) and len(self._items) < self.max_size:
+            return
+        self._ops = 0
+        for k in [k for k, (exp, _) in self._items.items() if exp <= now]:
+            del self._items[k]
+        # 仍达到上限时淘汰最早过期的一半，避免之后每次操作都触发清理
+        if len(self._items) >= self.max_size:
+            victims = sorted(self._items.items(), key=lambda kv: kv[1][0])[:len(self._items) - self.max_size // 2]
+            for k, _ in victims:
+                del self._items[k]
+
+    def _get_live(self, key: str, now: float):
+        item = self._items.get(key)
+        if item is None or item[0] <= now:
+            return None
+        return item[1]
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            self._sweep(now)
+            state, estimate = _slide(self._get_live(key, now), now, window)
+            if estimate + 1 > limit:
+                self._items[key] = (state[0] + 2 * window, state)
+                return False, _retry_after(state, now, window, limit)
+            state = (state[0], state[1] + 1, state[2])
+            self._items[key] = (state[0] + 2 * window, state)
+            return True, 0.0
+
+    def incr(self, key: str, ttl: float, now: float) -> int:
+        with self._lock:
+            self._sweep(now)
+            n = int(self._get_live(key, now) or 0) + 1
+            self._items[key] = (now + ttl, n)
+            return n
+
+    def get(self, key: str, now: float) -> Optional[float]:
+        with self._lock:
+            value = self._get_live(key, now)
+            return None if value is None else float(value)
+
+    def set(self, key: str, value: float, ttl: float, now: float) -> None:
+        with self._lock:
+            self._sweep(now)
+            self._items[key] = (now + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._items)
+
+
+class SQLiteBackend:
+    """
+    本机 SQLite 实现（WAL 模式），同一台机器上的多个 worker 进程共享
+    每个线程一条连接；读改写在 BEGIN IMMEDIATE 事务内完成，跨进程原子
+    """
+
+    name = "sqlite"
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL,"
+                " a REAL NOT NULL DEFAULT 0, b REAL NOT NULL DEFAULT 0, c REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_exp ON rate_limit (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _txn(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _maybe_cleanup(self, conn: sqlite3.Connection, now: float) -> None:
+        # 计数器按线程保存（与连接一样放在 threading.local 里），多线程并发调用时无需加锁
+        ops = getattr(self._local, "ops", 0) + 1
+        self._local.ops = ops
+        if ops % self.CLEANUP_EVERY == 0:
+            conn.execute("DELETE FROM rate_limit WHERE expires_at <= ?", (now,))
+
+    @staticmethod
+    def _row(conn: sqlite3.Connection, key: str, now: float):
+        return conn.execute(
+            "SELECT a, b, c FROM rate_limit WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+
+    @staticmethod
+    def _put(conn: sqlite3.Connection, key: str, expires_at: float, a: float, b: float = 0, c: float = 0) -> None:
+        conn.execute(
+            "INSERT INTO rate_limit (key, expires_at, a, b, c) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at, "
+            "a = excluded.a, b = excluded.b, c = excluded.c",
+            (key, expires_at, a, b, c),
+        )
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> Tuple[bool, float]:
+        def run(conn):
+            self._maybe_cleanup(conn, now)
+            row = self._row(conn, key, now)
+            state, estimate = _slide(tuple(row) if row else None, now, window)
+            if estimate + 1 > limit:
+                self._put(conn, key, state[0] + 2 * window, *state)
+                return False, _retry_after(state, now, window, limit)
+            self._put(conn, key, state[0] + 2 * window, state[0], state[1] + 1, state[2])
+            return True, 0.0
+        return self._txn(run)
+
+    def incr(self, key: str, ttl: float, now: float) -> int:
+        def run(conn):
+            self._maybe_cleanup(conn, now)
+            row = self._row(conn, key, now)
+            n = int(row[0] if row else 0) + 1
+            self._put(conn, key, now + ttl, n)
+            return n
+        return self._txn(run)
+
+    def get(self, key: str, now: float) -> Optional[float]:
+        row = self._row(self._conn(), key, now)
+        return None if row is None else row[0]
+
+    def set(self, key: str, value: float, ttl: float, now: float) -> None:
+        self._put(self._conn(), key, now + ttl, value)
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM rate_limit WHERE key = ?", (key,))
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._denied = 0
+
+    def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        """记一次请求；返回 (是否放行, 建议的重试等待秒数)"""
+        ok, retry_after = self.backend.hit(key, max(0, int(limit)), max(1.0, float(window)), time.time())
+        with self._lock:
+            if ok:
+                self._allowed += 1
+            else:
+                self._denied += 1
+        return ok, retry_after
+
+    def incr(self, key: str, ttl: float) -> int:
+        """计数 +1 并把过期时间顺延到 ttl 秒后，返回新计数（过期后从 1 开始）"""
+        return self.backend.incr(key, max(1.0, float(ttl)), time.time())
+
+    def get(self, key: str) -> Optional[float]:
+        return self.backend.get(key, time.time())
+
+    def set(self, key: str, value: float, ttl: float) -> None:
+        self.backend.set(key, value, max(1.0, float(ttl)), time.time())
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.backend.delete(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            data = {"backend": self.backend.name, "allowed": self._allowed, "denied": self._denied}
+        try:
+            data["entries"] = self.backend.size()
+        except Exception:
+            data["entries"] = None
+        return data
+
+
+def _create_backend():
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        try:
+            return SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH)
+        except Exception as e:
+            logger.error(f"限流 SQLite 后端初始化失败，改用内存后端: {e}")
+    return MemoryBackend()
+
+
+# 全局实例
+rate_limiter = RateLimiter(_create_backend())
@@ -2,17 +2,33 @@
 # 版权所有：厦门市知序技术服务工作室
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
+import asyncio
+import concurrent.futures
 import logging
+import multiprocessing
+import socket
 import sys
 import os
+import threading
+import time
+import uuid
 from datetime import datetime
+from typing import Optional
+from apscheduler.executors.base import BaseExecutor, run_job
+from apscheduler.executors.base_py3 import run_coroutine_job
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.util import iscoroutinefunction_partial, undefined
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
-from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from apscheduler.events import (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_SUBMITTED,
+                                EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED)
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.core.db import SessionLocal
+from app.core.config import settings
+from app.core.db import session_scope
 import json
 import importlib
 import traceback as tb
@@ -32,20 +48,118 @@ logger = logging.getLogger(__name__)
 
 # 全局调度器实例
 scheduler: BackgroundScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+# Job.executor -> APScheduler 执行器别名
+EXECUTORS = {'thread': 'default', 'process': 'process', 'asyncio': 'asyncio'}
+
+
+class _AsyncLoopExecutor(BaseExecutor):
+    """
+    asyncio 执行器：BackgroundScheduler 没有事件循环，在独立线程里运行一个事件循环，
+    协程任务在其中并发执行、不占用线程池；普通函数交给该循环的默认线程池执行
+    """
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        self._pending = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="scheduler-asyncio", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, wait=True):
+        for f in list(self._pending):
+            f.cancel()
+        self._pending.clear()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if wait:
+            self._thread.join(timeout=10)
+
+    def _do_submit_job(self, job, run_times):
+        if iscoroutinefunction_partial(job.func):
+            coro = run_coroutine_job(job, job._jobstore_alias, run_times, self._logger.name)
+        else:
+            async def _in_thread():
+                return await asyncio.get_running_loop().run_in_executor(
+                    None, run_job, job, job._jobstore_alias, run_times, self._logger.name
+                )
+            coro = _in_thread()
+
+        def callback(f):
+            self._pending.discard(f)
+            try:
+                events = f.result()
+            except BaseException:
+                self._run_job_error(job.id, *sys.exc_info()[1:])
+            else:
+                self._run_job_success(job.id, events)
+
+        f = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        self._pending.add(f)
+        f.add_done_callback(callback)
 
 
 def get_scheduler() -> BackgroundScheduler:
     """获取调度器实例"""
     global scheduler
-    if scheduler is None:
-        scheduler = BackgroundScheduler(timezone='Asia/Shanghai')
-        # 添加事件监听器
-        scheduler.add_listener(job_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
-    return scheduler
+    with _scheduler_lock:
+        if scheduler is None:
+            scheduler = BackgroundScheduler(
+                timezone='Asia/Shanghai',
+                executors={
+                    'default': ThreadPoolExecutor(settings.SCHEDULER_THREAD_WORKERS),
+                    # spawn：子进程不继承父进程的线程和数据库连接；进程在首次提交任务时才创建
+                    'process': ProcessPoolExecutor(
+                        settings.SCHEDULER_PROCESS_WORKERS,
+                        pool_kwargs={'mp_context': multiprocessing.get_context('spawn')},
+                    ),
+                    'asyncio': _AsyncLoopExecutor(),
+                },
+            )
+            # 添加事件监听器
+            scheduler.add_listener(job_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+            scheduler.add_listener(next_run_listener, EVENT_JOB_SUBMITTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+        return scheduler
+
+
+def get_running_scheduler() -> Optional[BackgroundScheduler]:
+    """
+    本进程正在运行任务的调度器；非主节点（或尚未启动）返回 None，不会创建调度器实例
+    非主节点上任务的下次执行时间以任务表为准（主节点每次触发后回写）
+    """
+    s = scheduler
+    if s is not None and s.running and _is_local():
+        return s
+    return None
 
 
 def start_scheduler():
-    """启动调度器"""
+    """
+    启动调度器
+
+    启用 SCHEDULER_LEADER_ELECTION 时只启动选主线程：抢到租约的进程才启动 APScheduler 并加载任务，
+    其他进程的任务管理操作写入命令表，由主节点执行
+    """
+    if settings.SCHEDULER_LEADER_ELECTION:
+        scheduler_leader.start()
+        return
+    _start_local()
+
+
+def shutdown_scheduler():
+    """关闭调度器（主节点同时释放租约，其他进程下一次轮询即可接管）"""
+    global _run_now_executor
+    if settings.SCHEDULER_LEADER_ELECTION:
+        scheduler_leader.stop()
+    else:
+        _shutdown_local()
+    with _scheduler_lock:
+        pool, _run_now_executor = _run_now_executor, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _start_local():
     s = get_scheduler()
     if not s.running:
         s.start()
@@ -53,11 +167,13 @@ def start_scheduler():
     load_jobs_from_db()
 
 
-def shutdown_scheduler():
-    """关闭调度器"""
-    s = get_scheduler()
-    if s.running:
-        s.shutdown()
+def _shutdown_local():
+    """关闭并丢弃调度器实例：已关闭的调度器（及其线程池）不能再次启动，重新成为主节点时新建"""
+    global scheduler
+    with _scheduler_lock:
+        s, scheduler = scheduler, None
+    if s is not None and s.running:
+        s.shutdown(wait=False)
         logger.info("❌ APScheduler shutdown")
 
 
@@ -65,35 +181,18 @@ def load_jobs_from_db():
     """从数据库加载所有启用的任务"""
     from app.models.job import Job
     
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         jobs = db.query(Job).filter(Job.status == 1).all()
         for job in jobs:
             try:
-                add_job_to_scheduler(job)
+                _add_job_local(job)
                 logger.info(f"✅ Loaded job: {job.job_id} - {job.name}")
             except Exception as e:
                 logger.error(f"❌ Failed to load job {job.job_id}: {e}")
-    finally:
-        db.close()
 
 
-def add_job_to_scheduler(job):
-    """添加任务到调度器"""
-    from app.models.job import Job
-    
-    s = get_scheduler()
-    
-    # 移除旧任务（如果存在）
-    if s.get_job(job.job_id):
-        s.remove_job(job.job_id)
-    
-    # 解析函数
-    func = _import_function(job.func_name)
-    args = json.loads(job.func_args) if job.func_args else []
-    kwargs = json.loads(job.func_kwargs) if job.func_kwargs else {}
-    
-    # 根据类型创建触发器
+def _build_trigger(job):
+    """根据任务类型创建触发器"""
     trigger = None
     if job.job_type == 'cron':
         # cron表达式格式：秒 分 时 日 月 周
@@ -122,6 +221,46 @@ def add_job_to_scheduler(job):
     
     if trigger is None:
         raise ValueError(f"Invalid job type: {job.job_type}")
+    return trigger
+
+
+def _job_options(job) -> dict:
+    """执行器、并发上限、合并与错过执行的宽限时间"""
+    executor = job.executor or 'thread'
+    if executor not in EXECUTORS:
+        raise ValueError(f"Invalid executor: {executor}")
+    return {
+        'executor': EXECUTORS[executor],
+        'max_instances': max(1, job.max_instances or 1),
+        'coalesce': job.coalesce != 0,
+        'misfire_grace_time': job.misfire_grace_time if job.misfire_grace_time else undefined,
+    }
+
+
+def add_job_to_scheduler(job):
+    """添加任务到调度器（非主节点：校验函数、触发器与执行配置后转交主节点）"""
+    if not _is_local():
+        _import_function(job.func_name)
+        _build_trigger(job)
+        _job_options(job)
+        _enqueue_command(job.job_id, 'sync')
+        return
+    _add_job_local(job)
+
+
+def _add_job_local(job):
+    s = get_scheduler()
+    
+    # 移除旧任务（如果存在）
+    if s.get_job(job.job_id):
+        s.remove_job(job.job_id)
+    
+    # 解析函数
+    func = _import_function(job.func_name)
+    args = json.loads(job.func_args) if job.func_args else []
+    kwargs = json.loads(job.func_kwargs) if job.func_kwargs else {}
+    
+    trigger = _build_trigger(job)
     
     # 添加任务
     s.add_job(
@@ -131,24 +270,33 @@ def add_job_to_scheduler(job):
         kwargs=kwargs,
         id=job.job_id,
         name=job.name,
-        replace_existing=True
+        replace_existing=True,
+        **_job_options(job)
     )
     
     # 更新下次执行时间
     ap_job = s.get_job(job.job_id)
     if ap_job and ap_job.next_run_time:
-        db = SessionLocal()
-        try:
-            db_job = db.query(Job).filter(Job.job_id == job.job_id).first()
-            if db_job:
-                db_job.next_run_time = ap_job.next_run_time
-                db.commit()
-        finally:
-            db.close()
+        # 请求内（创建 / 修改 / 恢复任务接口，均已先提交）复用请求会话
+        _save_next_run_time(job.job_id, ap_job.next_run_time)
+
+
+def _save_next_run_time(job_id: str, next_run_time) -> None:
+    """回写任务表的下次执行时间（非主节点的任务列表据此显示）"""
+    from app.models.job import Job
+
+    with session_scope() as db:
+        db_job = db.query(Job).filter(Job.job_id == job_id).first()
+        if db_job and db_job.next_run_time != next_run_time:
+            db_job.next_run_time = next_run_time
+            db.commit()
 
 
 def remove_job_from_scheduler(job_id: str):
     """从调度器移除任务"""
+    if not _is_local():
+        _enqueue_command(job_id, 'remove')
+        return
     s = get_scheduler()
     if s.get_job(job_id):
         s.remove_job(job_id)
@@ -156,22 +304,31 @@ def remove_job_from_scheduler(job_id: str):
 
 def pause_job(job_id: str):
     """暂停任务"""
+    if not _is_local():
+        _enqueue_command(job_id, 'pause')
+        return
     s = get_scheduler()
     s.pause_job(job_id)
 
 
 def resume_job(job_id: str):
     """恢复任务"""
+    if not _is_local():
+        _enqueue_command(job_id, 'resume')
+        return
     s = get_scheduler()
     s.resume_job(job_id)
 
 
 def run_job_now(job_id: str):
-    """立即执行任务"""
+    """
+    立即执行任务（由发起请求的进程执行一次，不经过调度器，因此不需要转交主节点）
+
+    按任务的执行器运行：process 提交到独立进程池（当前线程只等待结果），asyncio 的协程函数用 asyncio.run 执行
+    """
     from app.models.job import Job
     
-    db = SessionLocal()
-    try:
+    with session_scope() as db:
         job = db.query(Job).filter(Job.job_id == job_id).first()
         if not job:
             raise ValueError(f"Job {job_id} not found")
@@ -179,11 +336,32 @@ def run_job_now(job_id: str):
         func = _import_function(job.func_name)
         args = json.loads(job.func_args) if job.func_args else []
         kwargs = json.loads(job.func_kwargs) if job.func_kwargs else {}
-        
-        # 记录执行日志
-        _execute_with_log(job_id, job.name, func, args, kwargs)
-    finally:
-        db.close()
+        name = job.name
+        executor = job.executor or 'thread'
+
+    if iscoroutinefunction_partial(func):
+        coro_func = func
+        func = lambda *a, **kw: asyncio.run(coro_func(*a, **kw))
+    elif executor == 'process':
+        pool_func = func
+        func = lambda *a, **kw: _run_now_pool().submit(pool_func, *a, **kw).result()
+
+    # 记录执行日志
+    _execute_with_log(job_id, name, func, args, kwargs)
+
+
+_run_now_executor: concurrent.futures.ProcessPoolExecutor | None = None
+
+
+def _run_now_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """立即执行 process 类任务用的进程池（任何进程都可能收到立即执行请求，与调度器的进程池分开，首次使用时创建）"""
+    global _run_now_executor
+    with _scheduler_lock:
+        if _run_now_executor is None:
+            _run_now_executor = concurrent.futures.ProcessPoolExecutor(
+                settings.SCHEDULER_PROCESS_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _run_now_executor
 
 
 def _import_function(func_path: str):
@@ -218,7 +396,6 @@ def _execute_with_log(job_id: str, job_name: str, func, args, kwargs):
     """执行任务并记录日志"""
     from app.models.job import Job, JobLog
     
-    db = SessionLocal()
     start_time = datetime.now()
     status = 1
     result = None
@@ -249,18 +426,19 @@ def _execute_with_log(job_id: str, job_name: str, func, args, kwargs):
             error=error,
             traceback=traceback
         )
-        db.add(log)
-        
-        # 更新任务统计
-        job = db.query(Job).filter(Job.job_id == job_id).first()
-        if job:
-            job.last_run_time = start_time
-            job.run_count += 1
-            if status == 0:
-                job.fail_count += 1
-        
-        db.commit()
-        db.close()
+        # 执行结束后才取会话，任务执行期间不占用连接
+        with session_scope() as db:
+            db.add(log)
+
+            # 更新任务统计
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            if job:
+                job.last_run_time = start_time
+                job.run_count += 1
+                if status == 0:
+                    job.fail_count += 1
+
+            db.commit()
 
 
 def job_listener(event):
@@ -269,3 +447,232 @@ def job_listener(event):
         logger.error(f"❌ Job {event.job_id} crashed: {event.exception}")
     else:
         logger.info(f"✅ Job {event.job_id} executed successfully")
+
+
+def next_run_listener(event):
+    """
+    任务触发（提交执行、因实例数上限跳过、错过执行）后回写下次执行时间
+    在调度线程中、APScheduler 已算出下次执行时间之后调用；一次性任务执行后为 None
+    """
+    s = scheduler
+    if s is None:
+        return
+    ap_job = s.get_job(event.job_id)
+    try:
+        _save_next_run_time(event.job_id, ap_job.next_run_time if ap_job else None)
+    except Exception as e:
+        logger.warning(f"回写任务 {event.job_id} 下次执行时间失败: {e}")
+
+
+# ---------------------------
+# 选主：租约行 + 心跳
+# ---------------------------
+LEASE_NAME = "scheduler"
+_COMMANDS = ('sync', 'remove', 'pause', 'resume')
+
+
+def _is_local() -> bool:
+    """任务操作是否直接作用于本进程的调度器（未启用选主，或本进程是主节点）"""
+    return not settings.SCHEDULER_LEADER_ELECTION or scheduler_leader.is_leader
+
+
+def _enqueue_command(job_id: str, command: str) -> None:
+    """写入调度命令，主节点下一次轮询时执行（调用方须已提交任务表的修改）"""
+    from app.models.job import JobCommand
+
+    with session_scope() as db:
+        db.add(JobCommand(job_id=job_id, command=command))
+        db.commit()
+    scheduler_leader.forwarded += 1
+
+
+def _apply_command(job_id: str, command: str) -> None:
+    """主节点执行调度命令；sync 以任务表中的当前配置为准"""
+    from app.models.job import Job
+
+    s = get_scheduler()
+    if command == 'sync':
+        with session_scope() as db:
+            job = db.query(Job).filter(Job.job_id == job_id).first()
+            if job is not None:
+                db.expunge(job)
+        if job is not None and job.status == 1:
+            _add_job_local(job)
+        elif s.get_job(job_id):
+            s.remove_job(job_id)
+    elif command == 'remove':
+        if s.get_job(job_id):
+            s.remove_job(job_id)
+    elif command == 'pause':
+        if s.get_job(job_id):
+            s.pause_job(job_id)
+    elif command == 'resume':
+        if s.get_job(job_id):
+            s.resume_job(job_id)
+
+
+def _try_lease(db: Session, owner: str, now: float, ttl: float) -> bool:
+    """
+    抢占或续期租约，返回本进程是否持有租约
+
+    UPDATE 只在租约由自己持有或已过期时生效；并发抢占时行锁保证只有一个进程更新成功。
+    各主机时钟须同步（NTP），时钟偏差应远小于 SCHEDULER_LEASE_TTL
+    """
+    from app.models.job import JobLease
+
+    now_ms, expires_ms = int(now * 1000), int((now + ttl) * 1000)
+    updated = db.query(JobLease).filter(
+        JobLease.name == LEASE_NAME,
+        or_(JobLease.owner == owner, JobLease.expires_at < now_ms),
+    ).update(
+        {JobLease.owner: owner, JobLease.expires_at: expires_ms, JobLease.renewed_at: datetime.now()},
+        synchronize_session=False,
+    )
+    if updated:
+        db.commit()
+        return True
+    if db.query(JobLease.name).filter(JobLease.name == LEASE_NAME).first() is not None:
+        db.rollback()
+        return False
+    db.add(JobLease(name=LEASE_NAME, owner=owner, expires_at=expires_ms, renewed_at=datetime.now()))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        # 其他进程同时插入了租约行
+        db.rollback()
+        return False
+
+
+def _release_lease(db: Session, owner: str) -> None:
+    from app.models.job import JobLease
+
+    db.query(JobLease).filter(JobLease.name == LEASE_NAME, JobLease.owner == owner).update(
+        {JobLease.expires_at: 0}, synchronize_session=False
+    )
+    db.commit()
+
+
+class _LeaderElector:
+    """
+    调度器选主线程
+
+    每 SCHEDULER_POLL_INTERVAL 秒续期 / 抢占一次租约：
+    - 抢到租约：清空积压的调度命令（随后全量加载任务，已包含这些修改），启动 APScheduler
+    - 主节点：执行其他进程写入的调度命令
+    - 租约被接管，或续期失败且租约即将到期：停止 APScheduler（正在执行的任务会跑完）
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._lease_until = 0.0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.acquired = 0
+        self.lost = 0
+        self.forwarded = 0
+        self.commands = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self.is_leader:
+            self._step_down("进程退出", logging.INFO)
+            try:
+                with session_scope() as db:
+                    _release_lease(db, self.owner)
+            except Exception as e:
+                logger.warning(f"释放调度器租约失败: {e}")
+
+    def _run(self) -> None:
+        while True:
+            self._tick()
+            if self._stop.wait(settings.SCHEDULER_POLL_INTERVAL):
+                return
+
+    def _tick(self) -> None:
+        ttl = settings.SCHEDULER_LEASE_TTL
+        now = time.time()
+        try:
+            with session_scope() as db:
+                held = _try_lease(db, self.owner, now, ttl)
+            if held:
+                self._lease_until = now + ttl
+                if not self.is_leader:
+                    self._become_leader()
+                self._process_commands()
+            elif self.is_leader:
+                self._step_down("租约已被其他进程接管")
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"调度器租约续期失败: {e}")
+            # 下一次续期之前租约就会过期：主动退出，避免与接管的进程重复执行
+            if self.is_leader and time.time() + settings.SCHEDULER_POLL_INTERVAL >= self._lease_until:
+                self._step_down("租约续期失败")
+
+    def _become_leader(self) -> None:
+        from app.models.job import JobCommand
+
+        with session_scope() as db:
+            db.query(JobCommand).delete(synchronize_session=False)
+            db.commit()
+        _start_local()
+        self.is_leader = True
+        self.acquired += 1
+        logger.info(f"✅ 调度器主节点: {self.owner}")
+
+    def _step_down(self, reason: str, level: int = logging.WARNING) -> None:
+        self.is_leader = False
+        self.lost += 1
+        _shutdown_local()
+        logger.log(level, f"调度器主节点退出（{reason}）: {self.owner}")
+
+    def _process_commands(self) -> None:
+        from app.models.job import JobCommand
+
+        with session_scope() as db:
+            rows = [(c.id, c.job_id, c.command)
+                    for c in db.query(JobCommand).order_by(JobCommand.id).limit(100)]
+        if not rows:
+            return
+        # 读取后先结束查询会话，执行命令时会另开会话回写 next_run_time
+        for _, job_id, command in rows:
+            try:
+                if command not in _COMMANDS:
+                    raise ValueError(f"未知命令: {command}")
+                _apply_command(job_id, command)
+            except Exception as e:
+                logger.error(f"❌ 调度命令执行失败 {command} {job_id}: {e}")
+        with session_scope() as db:
+            db.query(JobCommand).filter(JobCommand.id <= rows[-1][0]).delete(synchronize_session=False)
+            db.commit()
+        self.commands += len(rows)
+
+    def stats(self) -> dict:
+        s = scheduler
+        return {
+            "election": settings.SCHEDULER_LEADER_ELECTION,
+            "owner": self.owner,
+            "leader": _is_local(),
+            "running": bool(s and s.running),
+            "jobs": len(s.get_jobs()) if s and s.running else 0,
+            "acquired": self.acquired,
+            "lost": self.lost,
+            "forwarded": self.forwarded,
+            "commands": self.commands,
+            "errors": self.errors,
+        }
+
+
+scheduler_leader = _LeaderElector()
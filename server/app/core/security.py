@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import jwt
 from app.core.config import settings
-from app.core.config_loader import get_config
+from app.core.config_registry import typed_config
 from fastapi import HTTPException
 import bcrypt
 import re
@@ -28,8 +28,11 @@ def _truncate_password_for_bcrypt(password: str) -> str:
                 continue
         return truncated_bytes.decode('utf-8', errors='ignore')
 
-# 只使用 pbkdf2_sha256 来避免初始化问题
-pwd = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# 只使用 pbkdf2_sha256 来避免初始化问题；迭代次数由 PASSWORD_HASH_ROUNDS 配置
+pwd = CryptContext(
+    schemes=["pbkdf2_sha256"], deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.PASSWORD_HASH_ROUNDS,
+)
 
 def validate_password_complexity(password: str, db=None) -> None:
     """
@@ -37,21 +40,19 @@ def validate_password_complexity(password: str, db=None) -> None:
     
     如果密码不符合复杂度要求，抛出 HTTPException
     """
-    from app.core.config_loader import get_config
+    cfg = typed_config(db)
     
     # 从系统配置读取是否启用密码复杂度要求
-    enable_complexity = get_config('password_complexity_enabled', 'boolean', False, db)
-    
-    if not enable_complexity:
+    if not cfg.password_complexity_enabled:
         # 未启用密码复杂度要求，直接返回
         return
     
     # 从系统配置读取密码复杂度要求
-    min_length = int(get_config('password_min_length', 'number', 8, db) or 8)
-    require_uppercase = get_config('password_require_uppercase', 'boolean', True, db)
-    require_lowercase = get_config('password_require_lowercase', 'boolean', True, db)
-    require_digit = get_config('password_require_digit', 'boolean', True, db)
-    require_special = get_config('password_require_special', 'boolean', True, db)
+    min_length = cfg.password_min_length
+    require_uppercase = cfg.password_require_uppercase
+    require_lowercase = cfg.password_require_lowercase
+    require_digit = cfg.password_require_digit
+    require_special = cfg.password_require_special
     
     # 验证密码长度
     if len(password) < min_length:
@@ -77,6 +78,19 @@ def validate_password_complexity(password: str, db=None) -> None:
 def hash_password(p: str) -> str:
     return pwd.hash(p)
 
+def password_needs_rehash(hashed: str) -> bool:
+    """
+    登录成功后是否需要重算哈希：
+    - 旧的 bcrypt 哈希迁移为当前方案
+    - pbkdf2_sha256 迭代次数与 PASSWORD_HASH_ROUNDS 不一致
+    """
+    if not hashed.startswith("$pbkdf2-sha256$"):
+        return True
+    try:
+        return int(hashed.split("$")[2]) != settings.PASSWORD_HASH_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
 def verify_password(plain: str, hashed: str) -> bool:
     # 检查是否是 bcrypt 格式
     if hashed.startswith('$2b$') or hashed.startswith('$2a$') or hashed.startswith('$2y$'):
@@ -93,12 +107,15 @@ def verify_password(plain: str, hashed: str) -> bool:
         # 使用 passlib 验证其他格式
         return pwd.verify(plain, hashed)
 
-def create_token(sub: str, roles: list[str], perms: list[str], username: str = None):
+def create_token(sub: str, roles: list[str], perms: list[str], username: str = None, role_ids: list[int] = None):
     """
     创建JWT Token，过期时间从系统配置读取
+
+    启用 AUTH_COMPACT_TOKEN 且传入 role_ids 时签发精简令牌：
+    用权限集合 ID（ps）代替完整的 perms 列表，权限由服务端注册表解析（见 app/core/perm_registry.py）
     """
     # 从系统配置读取Session过期时间（分钟），默认120分钟
-    expire_minutes = get_config('session_expire_minutes', 'number', 120)
+    expire_minutes = typed_config().session_expire_minutes
     
     payload = {
         "sub": sub,
@@ -107,4 +124,8 @@ def create_token(sub: str, roles: list[str], perms: list[str], username: str = N
         "username": username,
         "exp": datetime.now() + timedelta(minutes=int(expire_minutes)),
     }
+    if settings.AUTH_COMPACT_TOKEN and role_ids is not None:
+        from app.core.perm_registry import perm_registry
+        del payload["perms"]
+        payload["ps"] = perm_registry.set_id(role_ids)
     return jwt.encode(payload, settings.JWT_SECRET, algorithm=settings.JWT_ALGO)
@@ -10,23 +10,40 @@
 1. 支持配置开关，动态启用/禁用静态文件访问
 2. 防止路径穿越攻击
 3. 支持自定义URL前缀
-4. 配置热更新，无需重启服务
+4. 配置热更新，无需重启服务（配置缓存刷新后自动重建快照）
 """
 
+import re
 from pathlib import Path
-from fastapi import Request
-from fastapi.responses import FileResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.core.db import SessionLocal
-from app.core.config_loader import get_config
+from typing import NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.db import session_scope
+from app.core.config_loader import get_config_version
+from app.core.config_registry import typed_config
+from app.core.file_response import conditional_file_response
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 媒体库落盘文件名为 sha256 前 16 位（见 routers/media.upload_file），可视为内容寻址
+_CONTENT_ADDRESSED_STEM = re.compile(r"^[0-9a-f]{16,64}$")
 
-class StaticFileMiddleware(BaseHTTPMiddleware):
+
+class StaticSettings(NamedTuple):
+    """静态访问配置快照（配置缓存失效后重建）"""
+    version: int
+    enabled: bool
+    prefix: str
+    upload_root: Path
+    allowed_exts: frozenset
+
+
+class StaticFileMiddleware:
     """
-    静态文件访问中间件
+    静态文件访问中间件（纯 ASGI 实现）
     
     根据系统配置动态决定是否允许直接URL访问上传的文件
     
@@ -36,94 +53,112 @@ class StaticFileMiddleware(BaseHTTPMiddleware):
     - upload_path: 文件存储路径（默认 ./runtime/uploads）
     - static_allowed_types: 允许访问的文件类型（可选，逗号分隔）
     
+    配置在首次请求时读取一次并预编译为 StaticSettings 快照，
+    仅当配置快照更新（本进程 refresh_config_cache 或轮询到其他 worker 的变更）后才重新编译。
+    不匹配前缀的请求只做一次字符串前缀判断，不占用连接池。
+    
     安全机制：
     - 路径穿越防护：自动检测并阻止 ../ 等攻击
     - 路径验证：确保只能访问上传目录内的文件
     - 文件类型限制：可配置允许访问的文件扩展名
     """
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._settings: Optional[StaticSettings] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        处理静态文件请求：命中则直接返回文件（或 304），否则交给下游处理
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cfg = self._settings
+        if cfg is None or cfg.version != get_config_version():
+            cfg = await run_in_threadpool(self._load_settings)
+            self._settings = cfg
+
+        path = scope["path"]
+        if not cfg.enabled or not path.startswith(cfg.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        response = await run_in_threadpool(self._resolve, path, cfg, Headers(scope=scope))
+        if response is None:
+            await self.app(scope, receive, send)
+            return
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _load_settings() -> StaticSettings:
+        """从类型化配置（首次访问时从数据库加载）编译为快照"""
+        version = get_config_version()
+        with session_scope() as db:
+            cfg = typed_config(db)
+        return StaticSettings(
+            version=version,
+            enabled=bool(cfg.enable_static_access),
+            prefix=cfg.static_url_prefix,
+            upload_root=Path(cfg.upload_path).resolve(),
+            allowed_exts=cfg.static_allowed_ext_set,
+        )
+
+    def _resolve(self, path: str, cfg: StaticSettings, headers: Headers) -> Optional[Response]:
         """
-        处理静态文件请求
+        根据请求路径解析静态文件
         
         Args:
-            request: HTTP请求对象
-            call_next: 下一个中间件或路由处理器
+            path: 请求路径（已确认匹配前缀）
+            cfg: 配置快照
+            headers: 请求头（用于 If-None-Match / If-Modified-Since）
             
         Returns:
-            FileResponse 或继续传递给下一个处理器
+            文件响应（或 304）；校验不通过时返回 None
         """
-        path = request.url.path
+        # 提取文件相对路径
+        relative_path = path[len(cfg.prefix):].lstrip('/')
         
-        # 从数据库读取配置（每次请求都读取，支持热更新）
-        db = SessionLocal()
+        # 如果路径为空，返回404
+        if not relative_path:
+            return None
+        
+        # 安全检查：防止路径穿越攻击
         try:
-            # 检查是否启用静态文件访问
-            enable_static = get_config('enable_static_access', 'bool', False, db)
-            
-            # 如果未启用，直接跳过
-            if not enable_static:
-                return await call_next(request)
+            # 解析真实路径
+            file_path = (cfg.upload_root / relative_path).resolve()
             
-            # 获取配置
-            static_prefix = get_config('static_url_prefix', 'string', '/runtime/uploads', db)
-            upload_path = get_config('upload_path', 'string', './runtime/uploads', db)
-            allowed_types_str = get_config('static_allowed_types', 'string', '', db)
+            # 检查解析后的路径是否在上传目录内
+            if not str(file_path).startswith(str(cfg.upload_root)):
+                logger.warning(f"路径穿越尝试: {path} -> {file_path}")
+                return None
             
-            # 检查路径是否匹配静态文件前缀
-            if not path.startswith(static_prefix):
-                return await call_next(request)
+            # 检查文件是否存在
+            if not file_path.is_file():
+                return None
             
-            # 提取文件相对路径
-            relative_path = path[len(static_prefix):].lstrip('/')
+            # 文件类型检查（如果配置了允许的类型）
+            if cfg.allowed_exts:
+                file_ext = file_path.suffix.lstrip('.').lower()
+                if file_ext not in cfg.allowed_exts:
+                    logger.warning(f"文件类型不允许访问: {file_ext}, 文件: {path}")
+                    return None
             
-            # 如果路径为空，返回404
-            if not relative_path:
-                return await call_next(request)
+            # 返回文件：内容寻址的文件名使用强 ETag + immutable 缓存
+            logger.info(f"静态文件访问: {path}")
+            stem = file_path.stem.lower()
+            digest = stem if _CONTENT_ADDRESSED_STEM.match(stem) else None
+            return conditional_file_response(
+                headers,
+                str(file_path),
+                media_type=self._get_mime_type(file_path),
+                digest=digest,
+            )
             
-            # 拼接完整文件路径
-            file_path = Path(upload_path) / relative_path
-            
-            # 安全检查：防止路径穿越攻击
-            try:
-                # 解析真实路径
-                file_path = file_path.resolve()
-                upload_root = Path(upload_path).resolve()
-                
-                # 检查解析后的路径是否在上传目录内
-                if not str(file_path).startswith(str(upload_root)):
-                    logger.warning(f"路径穿越尝试: {path} -> {file_path}")
-                    return await call_next(request)
-                
-                # 检查文件是否存在
-                if not file_path.exists() or not file_path.is_file():
-                    return await call_next(request)
-                
-                # 文件类型检查（如果配置了允许的类型）
-                if allowed_types_str:
-                    allowed_types = [ext.strip().lower() for ext in allowed_types_str.split(',') if ext.strip()]
-                    file_ext = file_path.suffix.lstrip('.').lower()
-                    
-                    if allowed_types and file_ext not in allowed_types:
-                        logger.warning(f"文件类型不允许访问: {file_ext}, 文件: {path}")
-                        return await call_next(request)
-                
-                # 返回文件
-                logger.info(f"静态文件访问: {path}")
-                return FileResponse(
-                    file_path,
-                    media_type=self._get_mime_type(file_path)
-                )
-                
-            except Exception as e:
-                logger.error(f"静态文件访问错误: {path}, 错误: {e}")
-                return await call_next(request)
-                
-        finally:
-            db.close()
-        
-        # 非静态文件请求，继续正常处理
-        return await call_next(request)
+        except Exception as e:
+            logger.error(f"静态文件访问错误: {path}, 错误: {e}")
+            return None
     
     def _get_mime_type(self, file_path: Path) -> str:
         """
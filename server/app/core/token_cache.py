@@ -0,0 +1,116 @@
+# app/core/token_cache.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+JWT 解码结果缓存（get_current_user 使用）
+
+- 键为 token 的 SHA-256 摘要（不在内存中保存 token 原文），值为已校验的 claims 与预先计算好的权限集合
+- 有效期取 AUTH_CACHE_TTL 与 token 自身 exp 中较早者，过期后重新验签
+- 容量上限 AUTH_CACHE_SIZE，超出时淘汰最久未使用的条目（LRU）
+- 命中时只需一次字典查找，省去 HMAC 验签与 JSON 解析；权限判断为集合查找
+
+用法:
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = Claims(jwt.decode(...))
+        token_cache.put(token, claims)
+    if "user:list" in claims.perm_set: ...
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+
+class Claims(dict):
+    """
+    JWT claims；perm_set 供 require_perm 做 O(1) 判断：
+    - 完整令牌：perms 列表的 frozenset（预先计算）
+    - 精简令牌（带 ps）：每次从权限注册表解析，角色授权变更后无需重新登录即生效
+    """
+
+    __slots__ = ("_perm_set",)
+
+    def __init__(self, payload: dict):
+        super().__init__(payload)
+        self._perm_set = None if "ps" in self else frozenset(self.get("perms") or ())
+
+    @property
+    def perm_set(self):
+        if self._perm_set is not None:
+            return self._perm_set
+        from app.core.perm_registry import perm_registry
+        return perm_registry.resolve(self["ps"])
+
+
+class TokenCache:
+    def __init__(self, ttl: int = 60, max_size: int = 10000):
+        self.ttl = max(0, int(ttl))
+        self.max_size = max(1, int(max_size))
+        self._items: "OrderedDict[bytes, Tuple[float, Claims]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Claims]:
+        if not self.ttl:
+            return None
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, claims = item
+            if expires_at <= now:
+                del self._items[key]
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return claims
+
+    def put(self, token: str, claims: Claims) -> None:
+        if not self.ttl:
+            return
+        expires_at = time.time() + self.ttl
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        key = self._key(token)
+        with self._lock:
+            self._items[key] = (expires_at, claims)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else None,
+            }
+
+
+# 全局实例
+token_cache = TokenCache(ttl=settings.AUTH_CACHE_TTL, max_size=settings.AUTH_CACHE_SIZE)
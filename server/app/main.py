@@ -1,12 +1,20 @@
 # app/main.py
 import os
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-from app.core.db import Base, engine
-from app.core.middlewares import RequestAuditMiddleware, LoginLogMiddleware
+from app.core.db import Base, engine, dispose_engines
+from app.core.middlewares import RequestAuditMiddleware, LoginLogMiddleware, DBSessionMiddleware
 from app.core.static_file_middleware import StaticFileMiddleware  # 静态文件访问中间件
 from app.core.scheduler import start_scheduler, shutdown_scheduler
+from app.core.audit_writer import audit_writer
+from app.core.config_loader import config_watcher
+from app.core.password_hasher import password_hasher
+from app.services.media_derivative import media_derivative
+from app.services.convert_engine import convert_engine
+from app.services.soffice_pool import soffice_pool
 from app.routers.router_registry import register_routers
 #前台
 from app.routers.front.front_routes import front_routers
@@ -19,6 +27,7 @@ app = FastAPI(title="Foadmin API")
 app.add_middleware(StaticFileMiddleware)  # 静态文件访问中间件
 app.add_middleware(LoginLogMiddleware)
 app.add_middleware(RequestAuditMiddleware)
+app.add_middleware(DBSessionMiddleware)  # 请求级数据库会话，须在以上中间件外层
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,11 +48,27 @@ for router in front_routers:
 # 启动和关闭事件
 @app.on_event("startup")
 def on_startup():
-    """应用启动时启动调度器"""
+    """应用启动时加载配置快照并启动版本号轮询、调度器选主和审计日志写入线程，按配置在后台预热 soffice 进程池"""
+    config_watcher.start()
+    audit_writer.start()
     start_scheduler()
+    if settings.SOFFICE_PREWARM:
+        threading.Thread(target=soffice_pool.prewarm, name="soffice-prewarm", daemon=True).start()
+
+
+def _shutdown_workers():
+    """停止调度器、各进程池与审计写入线程（均为阻塞调用：等待线程 / 进程退出，最长数秒）"""
+    shutdown_scheduler()
+    config_watcher.stop()
+    media_derivative.shutdown()
+    convert_engine.shutdown()
+    soffice_pool.shutdown()
+    password_hasher.shutdown()
+    audit_writer.stop()
 
 
 @app.on_event("shutdown")
-def on_shutdown():
-    """应用关闭时停止调度器"""
-    shutdown_scheduler()
\ No newline at end of file
+async def on_shutdown():
+    """应用关闭时停止调度器、缩略图与文档转换进程池，把未写入的审计日志刷入数据库，并关闭数据库连接池"""
+    await run_in_threadpool(_shutdown_workers)
+    await dispose_engines()
\ No newline at end of file
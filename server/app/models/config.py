@@ -25,3 +25,12 @@ class SysConfig(Base):
     sort: Mapped[int] = mapped_column(Integer, default=0, comment="排序")
     updated_at: Mapped[DateTime | None] = mapped_column(DateTime, onupdate=func.now(), comment="更新时间")
     updated_by: Mapped[int | None] = mapped_column(BigInteger, nullable=True, comment="更新人ID")
+
+
+class SysConfigVersion(Base):
+    """系统配置版本号（单行）：配置变更时递增，各 worker 轮询发现变化后重新加载配置快照"""
+    __tablename__ = "foadmin_sys_config_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, comment="固定为 1")
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, comment="配置版本号")
+    updated_at: Mapped[DateTime | None] = mapped_column(DateTime, nullable=True, comment="更新时间")
@@ -27,6 +27,12 @@ class Job(Base):
     interval_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True, comment='interval类型：间隔秒数')
     run_date: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, comment='date类型：单次执行时间')
     
+    # 执行配置（执行器见 app/core/scheduler.py）
+    executor: Mapped[str] = mapped_column(String(16), default='thread', comment='执行器：thread-线程池，process-独立进程，asyncio-事件循环')
+    max_instances: Mapped[int] = mapped_column(Integer, default=1, comment='同一任务最多同时运行的实例数，达到上限时本次跳过')
+    coalesce: Mapped[int] = mapped_column(Integer, default=1, comment='错过多次执行时：1-合并为一次，0-逐次补跑')
+    misfire_grace_time: Mapped[int | None] = mapped_column(Integer, nullable=True, comment='错过执行时间后仍允许执行的秒数，空为调度器默认值')
+    
     # 状态和元信息
     status: Mapped[int] = mapped_column(Integer, default=1, comment='状态：1-启用，0-暂停')
     description: Mapped[str | None] = mapped_column(String(512), nullable=True, comment='任务描述')
@@ -61,3 +67,23 @@ class JobLog(Base):
     traceback: Mapped[str | None] = mapped_column(Text, nullable=True, comment='异常堆栈')
     
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, comment='创建时间')
+
+
+class JobCommand(Base):
+    """调度命令表：非主节点上的任务管理操作写入此表，由持有租约的主节点执行"""
+    __tablename__ = "foadmin_sys_job_command"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True, comment='命令ID')
+    job_id: Mapped[str] = mapped_column(String(128), nullable=False, comment='任务唯一标识')
+    command: Mapped[str] = mapped_column(String(16), nullable=False, comment='命令：sync/remove/pause/resume')
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, comment='创建时间')
+
+
+class JobLease(Base):
+    """调度器主节点租约表：只有持有未过期租约的进程运行 APScheduler"""
+    __tablename__ = "foadmin_sys_job_lease"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True, comment='租约名称')
+    owner: Mapped[str] = mapped_column(String(128), nullable=False, comment='持有者：主机名:进程号:随机串')
+    expires_at: Mapped[int] = mapped_column(BigInteger, nullable=False, comment='过期时间（毫秒时间戳）')
+    renewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, comment='最后续期时间')
@@ -3,7 +3,7 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import BigInteger, Integer, String, DateTime, Text
+from sqlalchemy import BigInteger, Integer, String, DateTime, Text, UniqueConstraint, Index
 from datetime import datetime
 from app.core.db import Base
 
@@ -55,19 +55,55 @@ class MediaAudit(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
-# 缓存转换结果（去重）
+# 缓存转换结果（去重），读写见 app/services/convert_cache.py
 class MediaConvertCache(Base):
     __tablename__ = "foadmin_media_convert_cache"
+    __table_args__ = (
+        UniqueConstraint("kind", "src_sha256", "params", "page", name="uk_convert_key"),
+        Index("idx_last_access", "last_access_at"),
+    )
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     # 'pdf' | 'pptx' | 'docx'
     kind: Mapped[str] = mapped_column(String(16), nullable=False)
     # 源文件 sha256
     src_sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    # 渲染参数（缓存键的一部分），如 "dpi=144" / "inline=1"
+    params: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    # 0 为整份文档（或懒转换清单）记录；N 为第 N 页（从 1 开始）的图片记录，file_ids 只有一个
+    page: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     # 对于 docx-mammoth，直接存 HTML；对于 pdf/pptx 或 docx-soffice，存图片 file_id 列表（逗号分隔）
     html: Mapped[str | None] = mapped_column(Text)
     file_ids: Mapped[str | None] = mapped_column(Text)  # "12,13,14"
     pages: Mapped[int | None] = mapped_column(Integer)
+    # 创建清单的用户（懒渲染的页面图片记在该用户名下）
+    created_by: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # 占用字节数：HTML + 衍生图片 + 懒转换保留的源 PDF（淘汰时按总量控制）
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_access_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # 你也可以加联合唯一索引（如用 Alembic）；若没用迁移，这里先靠逻辑防重
+
+# 分片上传会话（可断点续传；分片暂存在 .env UPLOAD_SESSION_DIR/{upload_id}/ 下，位于上传目录之外）
+class MediaUploadSession(Base):
+    __tablename__ = "foadmin_media_upload_session"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    upload_id: Mapped[str] = mapped_column(String(32), unique=True, nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    ext: Mapped[str | None] = mapped_column(String(20))
+    mime: Mapped[str | None] = mapped_column(String(100))
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # 客户端声明的 sha256（可选，合并时校验）；完成后为实际值
+    sha256: Mapped[str | None] = mapped_column(String(64))
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    total_chunks: Mapped[int] = mapped_column(Integer, nullable=False)
+    dir_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    remark: Mapped[str | None] = mapped_column(String(255))
+    tags: Mapped[str | None] = mapped_column(String(512))  # 逗号分隔
+    uploader_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # uploading / completing / completed / aborted
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="uploading")
+    file_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -9,10 +9,11 @@ from typing import Optional
 from datetime import datetime, timedelta
 import csv, io, json
 
-from app.core.db import get_db
+from app.core.db import get_db, get_read_db
 from app.models.audit import AuditLog
 from app.schemas.audit import PageOut, DetailOut, AuditLogOut
 from app.core.deps import require_perm
+from app.utils.pagination import paginate, COUNT_PATTERN
 
 router = APIRouter(prefix="/api/admin/audit", tags=["audit"])
 
@@ -30,9 +31,11 @@ def _parse_dt(s: Optional[str]) -> Optional[datetime]:
 
 @router.get("/logs", response_model=PageOut, dependencies=[Depends(require_perm("audit:log:list"))])
 def list_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor"),
+    count: str = Query("capped", pattern=COUNT_PATTERN, description="计数方式：exact/capped/none"),
     kw: Optional[str] = None,
     level: Optional[str] = None,
     status: Optional[str] = None,
@@ -78,9 +81,10 @@ def list_logs(
             (AuditLog.user_agent.ilike(like))
         )
 
-    total = q.count()
-    items = q.order_by(AuditLog.id.desc()).offset((page-1)*size).limit(size).all()
-    return {"items": items, "total": total}
+    # 审计表数据量大：默认最多数到 DEFAULT_COUNT_CAP，深翻页用游标
+    p = paginate(db, q, order_cols=(AuditLog.id,), page=page, size=size, cursor=cursor, count=count)
+    return {"items": p["rows"], "total": p["total"],
+            "total_capped": p["total_capped"], "next_cursor": p["next_cursor"]}
 
 @router.get("/logs/{log_id}", response_model=DetailOut, dependencies=[Depends(require_perm("audit:log:detailApi"))])
 def log_detail(log_id: int, db: Session = Depends(get_db)):
@@ -91,7 +95,7 @@ def log_detail(log_id: int, db: Session = Depends(get_db)):
 
 @router.get("/export", dependencies=[Depends(require_perm("audit:log:exportApi"))])
 def export_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     kw: Optional[str] = None,
     level: Optional[str] = None,
     status: Optional[str] = None,
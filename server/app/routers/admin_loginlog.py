@@ -6,10 +6,11 @@ from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
-from app.core.db import get_db
+from app.core.db import get_db, get_read_db
 from app.models.login_log import LoginLog
 from app.schemas.login_log import PageOut, DetailOut
 from app.core.deps import require_perm
+from app.utils.pagination import paginate, COUNT_PATTERN
 
 router = APIRouter(prefix="/api/admin/logs/login", tags=["login-log"])
 
@@ -27,9 +28,11 @@ def _parse_dt(s: Optional[str]) -> Optional[datetime]:
 @router.get("",response_model=PageOut, dependencies=[Depends(require_perm("login:log:list"))])  # 权限验证
 
 def list_login_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor"),
+    count: str = Query("capped", pattern=COUNT_PATTERN, description="计数方式：exact/capped/none"),
     kw: Optional[str] = Query(None, description="关键字：用户名/IP/UA/trace"),
     status: Optional[str] = None,
     actor_id: Optional[int] = None,
@@ -54,9 +57,10 @@ def list_login_logs(
             (LoginLog.user_agent.ilike(like)) |
             (LoginLog.trace_id.ilike(like))
         )
-    total = q.count()
-    items = q.order_by(LoginLog.id.desc()).offset((page-1)*size).limit(size).all()
-    return {"items": items, "total": total}
+    # 登录日志数据量大：默认最多数到 DEFAULT_COUNT_CAP，深翻页用游标
+    p = paginate(db, q, order_cols=(LoginLog.id,), page=page, size=size, cursor=cursor, count=count)
+    return {"items": p["rows"], "total": p["total"],
+            "total_capped": p["total_capped"], "next_cursor": p["next_cursor"]}
 
 
 
@@ -68,7 +72,7 @@ import csv, io
 
 @router.get("/export", dependencies=[Depends(require_perm("login:log:exportApi"))])  # 权限验证
 def export_login_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     kw: Optional[str] = Query(None, description="关键字：用户名/IP/UA/trace"),
     status: Optional[str] = Query(None),
     actor_id: Optional[int] = Query(None),
@@ -80,8 +84,10 @@ def export_login_logs(
     # 复用 list 的过滤逻辑
     page_out = list_login_logs(
         db=db,
-        page=1, 
+        page=1,
         size=200000,
+        cursor=None,
+        count="none",
         kw=kw,
         status=status,
         actor_id=actor_id,
@@ -3,9 +3,10 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.core.db import get_db
-from app.core.deps import get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_async_db
+from app.core.deps import get_current_user, has_perm
 from app.models.rbac import Permission
 
 router = APIRouter(prefix="/api/admin/menus", tags=["admin-menu"])  # 后台菜单
@@ -32,14 +33,13 @@ def build_tree(items: list[dict]):
 
 
 @router.get("")
-def my_menus(user=Depends(get_current_user), db: Session = Depends(get_db)):
+async def my_menus(user=Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # 过滤平台=admin 且 type=menu
-    rows = db.query(Permission).filter(Permission.type=="menu", Permission.platform=="admin").all()
+    rows = (await db.scalars(select(Permission).where(Permission.type=="menu", Permission.platform=="admin"))).all()
     # 根据用户权限码过滤可见菜单（若菜单声明 code 则用户必须拥有）
-    user_perms: list[str] = user.get("perms", [])
     items = []
     for p in rows:
-        if p.code and p.code not in user_perms:
+        if p.code and not has_perm(user, p.code):
             continue
         items.append({
             "id": p.id,
@@ -3,123 +3,106 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from app.core.db import get_db
-from app.core.config_loader import get_config
+from app.core.config_registry import typed_config
 from app.models.user import User
-from app.models.rbac import Role, Permission, RolePerm, UserRole
-from app.core.security import verify_password, create_token, hash_password
+from app.core.security import verify_password, create_token, hash_password, password_needs_rehash
+from app.core.password_hasher import password_hasher
 from app.schemas.auth import LoginReq, LoginResp
 from app.core.deps import get_current_user
+from app.services.user_acl import user_acl
 
 router = APIRouter(prefix="/api/common", tags=["common-auth"])  # 公共登录，不区分平台
 
 # -----------------------
 #  防护相关配置（从系统配置动态读取）
 # -----------------------
-# 失败次数与锁定信息，存放于内存中。因为 FastAPI 默认以多进程/多线程运行，
-# 若部署在多实例环境，应改用 Redis 等集中式存储。
+# IP 限流、失败次数与锁定信息存放于 app.core.rate_limit（条目自动过期）；
+# 多 worker 部署时设置 RATE_LIMIT_BACKEND=sqlite 在同一台机器的进程间共享，
+# 多台机器部署应改用 Redis 等集中式存储。
 from time import time
+import math
 import string
 import random
 from uuid import uuid4
-
-# 内存表：用户名 -> (失败次数, 最后失败时间)
-FAILED_ATTEMPTS: dict[str, tuple[int, float]] = {}
-# 被锁定的用户：用户名 -> 解锁时间戳
-LOCKED_USERS: dict[str, float] = {}
-# IP 限流：IP -> (请求次数, 窗口开始时间)
-RATE_LIMIT: dict[str, tuple[int, float]] = {}
+from app.core.rate_limit import rate_limiter
 
 # 验证码逻辑将由前端库 vue3-slide-verify 完成
 
 
-'''
-def load_user_perms(db: Session, user_id: int):
-    role_ids = [r.role_id for r in db.query(UserRole).filter(UserRole.user_id == user_id).all()]
-    roles = [r.code for r in db.query(Role).filter(Role.id.in_(role_ids)).all()] if role_ids else []
-    perm_ids = [rp.perm_id for rp in db.query(RolePerm).filter(RolePerm.role_id.in_(role_ids)).all()] if role_ids else []
-    perms: list[str] = []
-    if perm_ids:
-        for p in db.query(Permission).filter(Permission.id.in_(perm_ids)).all():
-            if p.type in ("menu", "button") and p.code:
-                perms.append(p.code)
-            if p.type == "api" and p.method and p.path:
-                perms.append(f"{p.method}:{p.path}")
-    return roles, perms '''
-
 def load_user_perms(db: Session, user_id: int):
-    role_ids = [r.role_id for r in db.query(UserRole).filter(UserRole.user_id == user_id).all()]
-    roles = [r.code for r in db.query(Role).filter(Role.id.in_(role_ids)).all()] if role_ids else []
-    perm_ids = [rp.perm_id for rp in db.query(RolePerm).filter(RolePerm.role_id.in_(role_ids)).all()] if role_ids else []
-    perms: list[str] = []
-    if perm_ids:
-        for p in db.query(Permission).filter(Permission.id.in_(perm_ids)).all():
-            if p.code:  # 加载所有 code
-                perms.append(p.code)
-            if p.type == "api" and p.method and p.path:  # 加载 API 路径
-                perms.append(f"{p.method}:{p.path}")
-    return roles, perms
+    """返回 (roles, perms)，经进程内缓存（见 app/services/user_acl.py）"""
+    acl = user_acl.get(db, user_id)
+    return acl.roles, acl.perms
 
 
-@router.post("/login", response_model=LoginResp)
-def login(body: LoginReq, request: Request, db: Session = Depends(get_db)):
-    
-    # 从系统配置读取速率限制参数（确保转换为数字类型）
-    rate_limit_requests = int(get_config('login_rate_limit_requests', 'number', 20, db) or 20)
-    rate_limit_window = int(get_config('login_rate_limit_window', 'number', 60, db) or 60)
+def _login_precheck(db: Session, body: LoginReq, client_ip: str):
+    """限流、锁定检查并查询用户（同步，在线程池中执行），返回 (user, max_login_fails, lock_seconds)"""
+    # 从系统配置读取速率限制参数（类型化配置，按配置版本缓存）
+    cfg = typed_config(db)
+    rate_limit_requests = cfg.login_rate_limit_requests
+    rate_limit_window = cfg.login_rate_limit_window
     
-    # 限流逻辑
-    client_ip = request.client.host or "unknown"
-    now = time()
-    # 获取当前 IP 的记录
-    req_count, start = RATE_LIMIT.get(client_ip, (0, now))
-    # 如果窗口过期，重置
-    if now - start > rate_limit_window:
-        req_count, start = 0, now
-    req_count += 1
-    RATE_LIMIT[client_ip] = (req_count, start)
-    if req_count > rate_limit_requests:
+    # 限流逻辑（滑动窗口）
+    ok, retry_after = rate_limiter.hit(f"login:ip:{client_ip}", rate_limit_requests, rate_limit_window)
+    if not ok:
         # 返回 429 Too Many Requests
-        raise HTTPException(status_code=429, detail="请求过于频繁，请稍后再试")
+        raise HTTPException(status_code=429, detail="请求过于频繁，请稍后再试",
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
 
-    # 从系统配置读取安全参数（确保转换为正确类型）
-    max_login_fails = int(get_config('login_max_fails', 'number', 5, db) or 5)
-    lock_seconds = int(get_config('login_lock_seconds', 'number', 600, db) or 600)
-    enable_captcha = get_config('enable_captcha', 'boolean', True, db)
+    # 从系统配置读取安全参数
+    max_login_fails = cfg.login_max_fails
+    lock_seconds = cfg.login_lock_seconds
 
     # 滑动验证码由客户端完成，无需在后端校验（如果启用验证码，前端会处理）
 
     # 检查是否锁定
-    lock_until = LOCKED_USERS.get(body.username)
-    if lock_until and lock_until > now:
+    lock_until = rate_limiter.get(f"login:lock:{body.username}")
+    if lock_until and lock_until > time():
         raise HTTPException(status_code=403, detail="该账号已被锁定，请稍后再试")
 
     u = db.query(User).filter(User.username == body.username).first()
-    # 判断用户名密码
-    if not u or not verify_password(body.password, u.password_hash):
-        # 更新失败次数
-        fail_count, last_fail = FAILED_ATTEMPTS.get(body.username, (0, now))
-        # 如果距离上次失败超过锁定周期，则重置
-        if now - last_fail > lock_seconds:
-            fail_count = 0
-        fail_count += 1
-        FAILED_ATTEMPTS[body.username] = (fail_count, now)
-        # 超过阈值锁定
-        if fail_count >= max_login_fails:
-            LOCKED_USERS[body.username] = now + lock_seconds
-            FAILED_ATTEMPTS.pop(body.username, None)
-            raise HTTPException(status_code=403, detail="密码错误次数过多，账号已锁定，请稍后再试")
-        raise HTTPException(status_code=400, detail="用户名或密码错误")
-
-    # 登录成功，清除失败记录和锁定
-    FAILED_ATTEMPTS.pop(body.username, None)
-    LOCKED_USERS.pop(body.username, None)
-
-    roles, perms = load_user_perms(db, u.id)
-    token = create_token(str(u.id), roles, perms, u.username)
+    return u, max_login_fails, lock_seconds
+
+
+def _login_failed(username: str, max_login_fails: int, lock_seconds: int):
+    """记录一次失败并抛出 400 / 403（同步，在线程池中执行：限流存储可能是 sqlite）"""
+    # 更新失败次数（距离上次失败超过锁定周期时自动从 1 重新计数）
+    fail_count = rate_limiter.incr(f"login:fail:{username}", ttl=lock_seconds)
+    # 超过阈值锁定
+    if fail_count >= max_login_fails:
+        rate_limiter.set(f"login:lock:{username}", time() + lock_seconds, ttl=lock_seconds)
+        rate_limiter.delete(f"login:fail:{username}")
+        raise HTTPException(status_code=403, detail="密码错误次数过多，账号已锁定，请稍后再试")
+    raise HTTPException(status_code=400, detail="用户名或密码错误")
+
+
+async def _rehash_if_needed(db: Session, u: User, plain: str):
+    """哈希方案或迭代次数与当前配置不一致时重算并保存（尽力而为，哈希线程池繁忙时跳过）"""
+    if not password_needs_rehash(u.password_hash):
+        return
+    try:
+        new_hash = await password_hasher.hash(plain)
+    except HTTPException:
+        return
+
+    def save():
+        u.password_hash = new_hash
+        db.commit()
+
+    await run_in_threadpool(save)
+    password_hasher.count_rehash()
+
+
+def _login_resp(db: Session, u: User) -> LoginResp:
+    """签发令牌并组装登录响应（登录 / 刷新共用）"""
+    acl = user_acl.get(db, u.id)
+    roles, perms = acl.roles, acl.perms
+    token = create_token(str(u.id), roles, perms, u.username, role_ids=acl.role_ids)
     
     # 获取头像 SHA256
     avatar_sha256 = None
@@ -144,6 +127,22 @@ def login(body: LoginReq, request: Request, db: Session = Depends(get_db)):
     )
 
 
+@router.post("/login", response_model=LoginResp)
+async def login(body: LoginReq, request: Request, db: Session = Depends(get_db)):
+    client_ip = request.client.host or "unknown"
+    u, max_login_fails, lock_seconds = await run_in_threadpool(_login_precheck, db, body, client_ip)
+
+    # 判断用户名密码（哈希校验在专用线程池执行，繁忙时返回 429）
+    if not u or not await password_hasher.verify(body.password, u.password_hash):
+        await run_in_threadpool(_login_failed, body.username, max_login_fails, lock_seconds)
+
+    # 登录成功，清除失败记录和锁定
+    await run_in_threadpool(rate_limiter.delete, f"login:fail:{body.username}", f"login:lock:{body.username}")
+
+    await _rehash_if_needed(db, u, body.password)
+    return await run_in_threadpool(_login_resp, db, u)
+
+
 @router.get("/me")
 def me(user=Depends(get_current_user)):
     return user
@@ -164,30 +163,7 @@ def refresh_token(user=Depends(get_current_user), db: Session = Depends(get_db))
     if not u:
         raise HTTPException(404, "用户不存在")
     # 重新加载角色权限，防止角色变更后仍旧使用旧权限
-    roles, perms = load_user_perms(db, u.id)
-    token = create_token(str(u.id), roles, perms, u.username)
-    
-    # 获取头像 SHA256
-    avatar_sha256 = None
-    if u.avatar_file_id:
-        from app.models.media import MediaFile
-        media = db.get(MediaFile, u.avatar_file_id)
-        if media:
-            avatar_sha256 = media.sha256
-    
-    return LoginResp(
-        token=token,
-        user={
-            "id": u.id,
-            "username": u.username,
-            "nick_name": u.nick_name,
-            "avatar_file_id": u.avatar_file_id,
-            "avatar_url": u.avatar_url,
-            "avatar_sha256": avatar_sha256,  # 新增
-        },
-        roles=roles,
-        perms=perms,
-    )
+    return _login_resp(db, u)
 
 
 # ---------- 个人资料（新增） ----------
@@ -2,22 +2,33 @@
 # 版权所有：厦门市知序技术服务工作室
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
-import os, io, base64, shutil, subprocess, tempfile, urllib.parse, hashlib
-from typing import Optional, List
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request
+import os, io, base64, shutil, tempfile, urllib.parse, hashlib, hmac, json, logging
+from contextlib import aclosing
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request, Path, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.core.deps import require_perm
-import fitz  # PyMuPDF
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app.core.deps import has_perm, require_perm
 import mammoth
 
-from app.core.db import get_db
+from app.core.config import settings
+from app.core.db import get_db, SessionLocal
+from app.core.file_response import conditional_file_response
+from app.utils.fs import mkstemp_public
 from app.core.deps import get_current_user
 from app.routers.media import ensure_dir, get_actor_id, get_upload_root
 from app.models.media import MediaFile
 from app.models.media import MediaConvertCache  # ✅ 新增缓存模型
+from app.services.convert_engine import convert_engine, PageResult
+from app.services.convert_cache import convert_cache, cache_params, parse_ids
+from app.services.soffice_pool import soffice_pool
 
 router = APIRouter(prefix="/api/convert", tags=["convert"])
+logger = logging.getLogger(__name__)
 
 # -------- 公共工具：生成绝对预览URL + token --------
 def _extract_bearer_token(request: Request) -> str | None:
@@ -31,18 +42,21 @@ def _preview_url(sha256: str, request: Request, token: str | None) -> str:
     base = str(request.base_url).rstrip("/")
     return f"{base}/api/admin/media/preview/{sha256}"
 
-def _img_tag(src: str) -> str:
+def _img_tag(src: str, lazy: bool = False) -> str:
     style = 'style="max-width:100%;display:block;margin:8px 0;"'
-    return f'<p><img src="{src}" {style} /></p>'
+    loading = ' loading="lazy"' if lazy else ""
+    return f'<p><img src="{src}"{loading} {style} /></p>'
+
+def _b64_len(n: int) -> int:
+    """n 字节经 base64 编码后的长度"""
+    return (n + 2) // 3 * 4
 
 def _data_url(mime: str, buf: bytes) -> str:
     return f"data:{mime};base64,{base64.b64encode(buf).decode()}"
 
 def _ensure_soffice():
-    path = shutil.which("soffice") or shutil.which("libreoffice")
-    if not path:
+    if not soffice_pool.available():
         raise HTTPException(500, "后端未安装 LibreOffice（soffice），无法转换 PPTX/PDF/HTML")
-    return path
 
 def _save_bytes_as_media(db: Session, user, buf: bytes, filename: str, mime: str, dir_hint="convert") -> int:
     from datetime import datetime
@@ -67,58 +81,436 @@ def _save_bytes_as_media(db: Session, user, buf: bytes, filename: str, mime: str
     db.add(mf); db.commit(); db.refresh(mf)
     return mf.id
 
-# -------- 缓存相关 --------
+# -------- 缓存相关（见 app/services/convert_cache.py） --------
 def _get_src_sha256(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
-def _get_cache(db: Session, kind: str, sha: str) -> MediaConvertCache | None:
-    return db.query(MediaConvertCache).filter(
-        and_(MediaConvertCache.kind == kind, MediaConvertCache.src_sha256 == sha)
-    ).first()
-
-def _save_cache(db: Session, kind: str, sha: str, *, html: str | None, file_ids: List[int] | None, pages: int | None):
-    rec = _get_cache(db, kind, sha)
-    if rec is None:
-        rec = MediaConvertCache(kind=kind, src_sha256=sha)
-        db.add(rec)
-    rec.html = html
-    rec.file_ids = ",".join(map(str, file_ids)) if file_ids else None
-    rec.pages = pages
-    db.commit()
-    return rec
+class _PageImage(NamedTuple):
+    path: str       # 图片绝对路径
+    mime: str
+    sha256: str
+    size: int
+
+def _images_from_file_ids(ids: List[int], db: Session) -> List[_PageImage]:
+    """缓存的 file_ids -> 按原顺序的页面图片（一次查询；记录或文件缺失的页跳过）"""
+    files = {mf.id: mf for mf in db.query(MediaFile).filter(MediaFile.id.in_(set(ids)))} if ids else {}
+    # 动态获取上传根目录（支持热更新）
+    upload_root = get_upload_root(db)
+    images: List[_PageImage] = []
+    for fid in ids:
+        mf = files.get(fid)
+        if not mf or not mf.sha256:
+            continue
+        abs_path = os.path.join(upload_root, mf.path)
+        if not os.path.exists(abs_path):
+            continue
+        images.append(_PageImage(abs_path, mf.mime or "image/png", mf.sha256, mf.size or 0))
+    return images
+
+def _images_from_pages(pages: List[PageResult]) -> List[_PageImage]:
+    return [_PageImage(p.path, "image/png", p.sha256, p.size) for p in pages]
+
+async def _page_html(img: _PageImage, *, inline: int, request: Request, token: Optional[str]) -> str | None:
+    """单页 HTML：inline=1 读盘转 dataURL；否则用预览 URL（绝对地址+SHA256）"""
+    if not inline:
+        return _img_tag(_preview_url(img.sha256, request, token))
+    try:
+        buf = await run_in_threadpool(_read_file, img.path)
+    except OSError:
+        return None
+    return _img_tag(_data_url(img.mime, buf))
 
-def _html_from_file_ids(ids: List[int], *, inline: int, request: Request, token: Optional[str], db: Session) -> str:
+async def _html_from_images(images: List[_PageImage], *, inline: int, request: Request,
+                            token: Optional[str]) -> str:
+    parts: List[str] = []
+    for img in images:
+        html = await _page_html(img, inline=inline, request=request, token=token)
+        if html:
+            parts.append(html)
+    return "\n".join(parts)
+
+def _ndjson(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+def _stream_images(images: List[_PageImage], *, inline: int, request: Request,
+                   token: Optional[str]) -> StreamingResponse:
     """
-    用缓存的图片 file_ids 生成 HTML：inline=1 走 dataURL；否则走预览 URL（绝对地址+SHA256）
+    逐页流式返回（NDJSON，每行一个 JSON）：
+      {"type": "start", "pages": N}
+      {"type": "page", "index": i, "html": "<p><img …></p>"}   按页码顺序
+      {"type": "done", "pages": N}
+    每次只读取、编码一页，内存占用与总页数无关
     """
-    parts: List[str] = []
-    if inline:
-        # 读取磁盘，转 base64
-        # 动态获取上传根目录（支持热更新）
-        upload_root = get_upload_root(db)
-        for fid in ids:
-            mf: MediaFile | None = db.get(MediaFile, fid)
-            if not mf: 
-                continue
-            abs_path = os.path.join(upload_root, mf.path)
-            if not os.path.exists(abs_path):
+    async def lines():
+        yield _ndjson({"type": "start", "pages": len(images)})
+        for i, img in enumerate(images):
+            if await request.is_disconnected():
+                return
+            html = await _page_html(img, inline=inline, request=request, token=token)
+            if html:
+                yield _ndjson({"type": "page", "index": i, "html": html})
+        yield _ndjson({"type": "done", "pages": len(images)})
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+async def _images_response(images: List[_PageImage], *, inline: int, stream: int, request: Request,
+                           pages: Optional[int] = None):
+    """
+    页面图片 -> 响应
+    - stream=1：NDJSON 逐页返回
+    - 否则一次性返回 {"html", "pages"}；inline=1 时整份 HTML 在内存中拼接，超过 CONVERT_INLINE_MAX_MB 返回 413
+    """
+    token = _extract_bearer_token(request)
+    if stream:
+        return _stream_images(images, inline=inline, request=request, token=token)
+    # inline=1 时图片以 base64 dataURL 内联，按编码后的大小（原始大小的 4/3）判断
+    if inline and sum(_b64_len(img.size) for img in images) > settings.CONVERT_INLINE_MAX_MB * 1024 * 1024:
+        raise HTTPException(413, f"内联图片超过 {settings.CONVERT_INLINE_MAX_MB} MB，请使用 stream=1 或 inline=0")
+    html = await _html_from_images(images, inline=inline, request=request, token=token)
+    return {"html": html, "pages": pages or len(images)}
+
+# -------- PDF 栅格化（进程池）+ 批量入库 --------
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _discard_pages(pages: List[PageResult]) -> None:
+    """删除本次新写入的页面图片（转换失败时清理）"""
+    for p in pages:
+        if p.created:
+            try:
+                os.remove(p.path)
+            except OSError:
+                pass
+
+async def _page_count(job, pdf_path: str) -> int:
+    try:
+        total = await job.page_count(pdf_path)
+    except (HTTPException, TimeoutError):
+        raise
+    except Exception:
+        raise HTTPException(400, "无法解析 PDF 文件")
+    if total == 0:
+        raise HTTPException(400, "PDF 无页面")
+    return total
+
+async def _rasterize(pdf_path: str, dpi: int, abs_dir: str, *, pages: int | None = None,
+                     only: List[int] | None = None) -> List[PageResult]:
+    """
+    在转换进程池中按页段并行渲染 PDF，结果按页码排序返回
+    图片由子进程直接写入 abs_dir（文件名为 sha256 前 16 位）；only 为要渲染的页（从 0 开始）
+    """
+    results: List[PageResult] = []
+    try:
+        async with convert_engine.job() as job:
+            total = pages if pages is not None else await _page_count(job, pdf_path)
+            async with aclosing(job.rasterize(pdf_path, dpi, abs_dir, pages=total, only=only)) as batches:
+                async for batch in batches:
+                    results.extend(batch)
+    except BaseException:
+        _discard_pages(results)
+        raise
+    results.sort(key=lambda p: p.index)
+    return results
+
+def _register_pages(db: Session, uploader_id: int, pages: List[PageResult], *, upload_root: str,
+                    rel_dir: str, prefix: str) -> List[int]:
+    """
+    把渲染好的页面图片登记为媒体文件，返回按页码排列的 file_id
+    - 一次 IN 查询找出已存在的 (sha256, size)：软删除的恢复，文件丢失的指向新文件，
+      已有记录指向别处时删除本次重复写入的图片
+    - 其余一次批量插入，整个过程只提交一次
+    - 并发转换同一份内容撞唯一键时回滚重试一次
+    """
+    shas = {p.sha256 for p in pages}
+    for attempt in range(2):
+        existing = {
+            (mf.sha256, mf.size): mf
+            for mf in db.query(MediaFile).filter(MediaFile.sha256.in_(shas))
+        }
+        new_rows = {}
+        for p in pages:
+            key = (p.sha256, p.size)
+            rel_path = os.path.join(rel_dir, os.path.basename(p.path))
+            mf = existing.get(key)
+            if mf is None:
+                new_rows.setdefault(key, dict(
+                    dir_id=None, filename=f"{prefix}_{p.index + 1}.png", ext="png", mime="image/png",
+                    size=p.size, sha256=p.sha256, width=p.width, height=p.height, duration=None,
+                    storage="local", path=rel_path, url=None, uploader_id=uploader_id,
+                    remark="convert", created_at=datetime.utcnow(),
+                ))
                 continue
+            if mf.deleted_at is not None:
+                mf.deleted_at = None
+            existing_abs = os.path.normpath(os.path.join(upload_root, mf.path))
+            if existing_abs != os.path.normpath(p.path):
+                if not os.path.exists(existing_abs):
+                    mf.path = rel_path
+                elif p.created:
+                    _discard_pages([p])
+        try:
+            if new_rows:
+                db.execute(insert(MediaFile), list(new_rows.values()))
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+
+    ids = {
+        (sha, size): fid
+        for fid, sha, size in db.query(MediaFile.id, MediaFile.sha256, MediaFile.size)
+        .filter(MediaFile.sha256.in_(shas))
+    }
+    return [ids[(p.sha256, p.size)] for p in pages]
+
+def _convert_target_dir(db: Session):
+    """页面图片存放目录：convert/YYYY/MM/DD，返回 (upload_root, rel_dir, abs_dir)"""
+    upload_root = get_upload_root(db)
+    rel_dir = os.path.join("convert", datetime.now().strftime("%Y/%m/%d"))
+    abs_dir = os.path.normpath(os.path.join(upload_root, rel_dir))
+    ensure_dir(abs_dir)
+    return upload_root, rel_dir, abs_dir
+
+async def _convert_pdf_file(db: Session, user, pdf_path: str, *, kind: str, sha: str,
+                            params: str, dpi: int) -> List[PageResult]:
+    """PDF 文件 -> 页面图片入库 -> 写缓存（PDF / PPTX 共用），返回按页码排序的渲染结果"""
+    upload_root, rel_dir, abs_dir = await run_in_threadpool(_convert_target_dir, db)
+    pages = await _rasterize(pdf_path, dpi, abs_dir)
+    try:
+        ids = await run_in_threadpool(_register_pages, db, get_actor_id(user), pages, upload_root=upload_root,
+                                      rel_dir=rel_dir, prefix=_PAGE_PREFIX[kind])
+    except BaseException:
+        _discard_pages(pages)
+        raise
+    await run_in_threadpool(convert_cache.save, db, kind, sha, params, file_ids=ids, pages=len(pages),
+                            size=sum(p.size for p in pages))
+    return pages
+
+async def _cached_or_convert(db: Session, user, request: Request, *, kind: str, sha: str, dpi: int, inline: int,
+                             lazy: int, stream: int, to_pdf: Callable[[str], Awaitable[str]]):
+    """
+    PDF / PPTX 公共流程：命中缓存直接返回；否则（同一文档并发请求只转换一次）
+    - lazy=0：渲染全部页面
+    - lazy=1：只生成清单
+    to_pdf(tmp_dir) 负责把上传内容落成 PDF 文件并返回路径
+    """
+    params = cache_params(kind, dpi=dpi)
+    cache = await run_in_threadpool(convert_cache.get, db, kind, sha, params)
+    if cache and cache.file_ids:
+        images = await run_in_threadpool(_images_from_file_ids, parse_ids(cache.file_ids), db)
+        return await _images_response(images, inline=inline, stream=stream, request=request, pages=cache.pages)
+    if lazy and cache and cache.pages and await run_in_threadpool(_source_exists, db, kind, sha):
+        # 已有清单且源 PDF 仍在：直接返回清单（PPTX 可跳过 soffice）
+        return _manifest(request, kind, sha, cache.pages, dpi)
+
+    async def convert():
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = await to_pdf(tmp)
+            if lazy:
+                return await _create_manifest(db, user, pdf_path, kind=kind, sha=sha, params=params)
+            return await _convert_pdf_file(db, user, pdf_path, kind=kind, sha=sha, params=params, dpi=dpi)
+
+    result = await convert_cache.single_flight((kind, sha, params, "lazy" if lazy else "full"), convert)
+    if lazy:
+        return _manifest(request, kind, sha, result, dpi)
+    return await _images_response(_images_from_pages(result), inline=inline, stream=stream, request=request)
+
+# -------- 按页懒转换 --------
+# 懒转换时保留源 PDF（PPTX 为 soffice 转出的 PDF），页面在首次访问时渲染并按页缓存
+_PAGE_PREFIX = {"pdf": "pdf", "pptx": "ppt"}
+
+def _source_pdf_path(upload_root: str, kind: str, sha: str) -> str:
+    return os.path.join(upload_root, "convert", "src", f"{kind}-{sha}.pdf")
+
+def _source_exists(db: Session, kind: str, sha: str) -> bool:
+    return os.path.exists(_source_pdf_path(get_upload_root(db), kind, sha))
+
+def _keep_source(pdf_path: str, dst: str) -> int:
+    """保留源 PDF（同一文档不同参数共用一份），返回文件大小"""
+    if not os.path.exists(dst):
+        ensure_dir(os.path.dirname(dst))
+        fd, tmp = mkstemp_public(prefix=".src-", suffix=".pdf", dir=os.path.dirname(dst))
+        os.close(fd)
+        try:
+            shutil.copyfile(pdf_path, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return os.path.getsize(dst)
+
+def _clamp_dpi(dpi: int) -> int:
+    """渲染分辨率限制在 [36, CONVERT_MAX_DPI]；导入与取页使用同一规则，缓存参数保持一致"""
+    return max(36, min(dpi, settings.CONVERT_MAX_DPI))
+
+def _page_sig(kind: str, sha: str, dpi: int) -> str:
+    """清单中页面地址的签名（<img> 无法携带 Authorization，凭签名访问）"""
+    msg = f"convert-page:{kind}:{sha}:{dpi}".encode()
+    return hmac.new(settings.JWT_SECRET.encode(), msg, hashlib.sha256).hexdigest()[:32]
+
+def _require_import_perm(user, kind: str) -> None:
+    """{kind}:import 权限；精简令牌的权限集合可能需从数据库重建注册表，异步接口中放到线程池调用"""
+    if not has_perm(user, f"{kind}:import"):
+        raise HTTPException(status_code=403, detail="No permission")
+
+async def _check_page_access(request: Request, kind: str, sha: str, dpi: int, sig: str | None) -> None:
+    """取页权限：清单签名有效，或 Bearer 用户拥有 {kind}:import 权限"""
+    if sig and hmac.compare_digest(sig, _page_sig(kind, sha, dpi)):
+        return
+    user = await run_in_threadpool(get_current_user, request)
+    await run_in_threadpool(_require_import_perm, user, kind)
+
+def _page_url(request: Request, kind: str, sha: str, page: int, dpi: int) -> str:
+    base = str(request.base_url).rstrip("/")
+    return f"{base}/api/convert/page/{kind}/{sha}/{page}?dpi={dpi}&sig={_page_sig(kind, sha, dpi)}"
+
+def _manifest(request: Request, kind: str, sha: str, pages: int, dpi: int) -> dict:
+    urls = [_page_url(request, kind, sha, i, dpi) for i in range(1, pages + 1)]
+    base = str(request.base_url).rstrip("/")
+    return {
+        "html": "\n".join(_img_tag(u, lazy=True) for u in urls),
+        "pages": pages,
+        "lazy": 1,
+        "page_urls": urls,
+        "progress_url": f"{base}/api/convert/progress/{kind}/{sha}?dpi={dpi}",
+    }
+
+async def _create_manifest(db: Session, user, pdf_path: str, *, kind: str, sha: str, params: str) -> int:
+    """保留源 PDF、统计页数并写入清单记录（不渲染任何页面），返回页数"""
+    upload_root = await run_in_threadpool(get_upload_root, db)
+    src_size = await run_in_threadpool(_keep_source, pdf_path, _source_pdf_path(upload_root, kind, sha))
+    async with convert_engine.job() as job:
+        total = await _page_count(job, pdf_path)
+    await run_in_threadpool(convert_cache.save, db, kind, sha, params, pages=total, size=src_size,
+                            created_by=get_actor_id(user))
+    return total
+
+def _cached_page_id(db: Session, kind: str, sha: str, params: str, page: int) -> int | None:
+    rec = convert_cache.get(db, kind, sha, params, page)
+    if rec and rec.file_ids:
+        return int(rec.file_ids)
+    doc = convert_cache.get(db, kind, sha, params, touch=False)
+    if doc and doc.file_ids:
+        ids = parse_ids(doc.file_ids)
+        if page <= len(ids):
+            return ids[page - 1]
+    return None
+
+def _cached_page_ids(db: Session, doc: MediaConvertCache) -> Dict[int, int | None]:
+    """整份文档各页的缓存 file_id（一次查询），未渲染的页为 None"""
+    if doc.file_ids:
+        ids = parse_ids(doc.file_ids)
+        return {p: (ids[p - 1] if p <= len(ids) else None) for p in range(1, doc.pages + 1)}
+    done: Dict[int, int | None] = {p: None for p in range(1, doc.pages + 1)}
+    for page, rec in convert_cache.get_pages(db, doc.kind, doc.src_sha256, doc.params).items():
+        if page in done and rec.file_ids:
+            done[page] = int(rec.file_ids)
+    return done
+
+async def _render_pages(db: Session, doc: MediaConvertCache, pages: List[int], dpi: int):
+    """
+    渲染指定页（从 1 开始）并写入按页缓存；按段完成逐段产出 [(page, PageResult, file_id)]
+    - 每段单独占用转换任务名额，段渲染完即归还，再登记、产出（消费方推送给客户端期间不占名额）
+    - 每段 CONVERT_RANGE_PAGES * CONVERT_WORKERS 页，段内仍由各转换进程并行渲染
+    """
+    upload_root, rel_dir, abs_dir = await run_in_threadpool(_convert_target_dir, db)
+    src = _source_pdf_path(upload_root, doc.kind, doc.src_sha256)
+    if not os.path.exists(src):
+        raise HTTPException(404, "源文件已清理，请重新导入")
+    step = max(1, settings.CONVERT_RANGE_PAGES * settings.CONVERT_WORKERS)
+    for i in range(0, len(pages), step):
+        chunk = pages[i:i + step]
+        batch = await _rasterize(src, dpi, abs_dir, pages=doc.pages, only=[p - 1 for p in chunk])
+        try:
+            ids = await run_in_threadpool(_save_rendered, db, doc, batch, upload_root=upload_root, rel_dir=rel_dir)
+        except BaseException:
+            _discard_pages(batch)
+            raise
+        yield [(p.index + 1, p, fid) for p, fid in zip(batch, ids)]
+
+def _save_rendered(db: Session, doc: MediaConvertCache, batch: List[PageResult], *, upload_root: str,
+                   rel_dir: str) -> List[int]:
+    """登记一段渲染结果并写入按页缓存（同步，在线程池中执行）"""
+    ids = _register_pages(db, doc.created_by or 0, batch, upload_root=upload_root,
+                          rel_dir=rel_dir, prefix=_PAGE_PREFIX[doc.kind])
+    convert_cache.save_pages(db, doc.kind, doc.src_sha256, doc.params,
+                             {p.index + 1: (fid, p.size) for p, fid in zip(batch, ids)})
+    return ids
+
+async def _ensure_page(db: Session, kind: str, sha: str, page: int, dpi: int) -> int:
+    """返回第 page 页的图片 file_id，未渲染时渲染（同一页并发请求只渲染一次）"""
+    params = cache_params(kind, dpi=dpi)
+    fid = await run_in_threadpool(_cached_page_id, db, kind, sha, params, page)
+    if fid is not None:
+        return fid
+    doc = await run_in_threadpool(convert_cache.get, db, kind, sha, params, touch=False)
+    if not doc or not doc.pages:
+        raise HTTPException(404, "文档不存在")
+    if page > doc.pages:
+        raise HTTPException(404, "页码超出范围")
+
+    async def render():
+        async for rendered in _render_pages(db, doc, [page], dpi):
+            return rendered[0][2]
+
+    return await convert_cache.single_flight((kind, sha, params, page), render)
+
+def _file_shas(db: Session, ids: List[int]) -> List[tuple]:
+    return db.query(MediaFile.id, MediaFile.sha256).filter(MediaFile.id.in_(ids)).all()
+
+def _finish_document(db: Session, doc: MediaConvertCache, ids: List[int]) -> None:
+    """全部页面渲染完成：回填整份文档记录并删除按页记录（避免重复计算占用）"""
+    page_rows = convert_cache.get_pages(db, doc.kind, doc.src_sha256, doc.params)
+    size = doc.size + sum(r.size for r in page_rows.values())
+    convert_cache.save(db, doc.kind, doc.src_sha256, doc.params, file_ids=ids, pages=len(ids), size=size)
+    for r in page_rows.values():
+        db.delete(r)
+    db.commit()
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# ================= DOCX =================
+def _docx_html_with_media(db: Session, user, request: Request, html_path: str, tmp: str, *, sha: str,
+                          params: str, inline: int) -> str:
+    """soffice 导出的 HTML：图片入媒体库并替换为 dataURL / 预览 URL，写入缓存（同步，在线程池中执行）"""
+    # 替换图片为 dataURL 或 预览 URL（若想缓存成 file_ids，可把它们也入库）
+    html = open(html_path, "r", encoding="utf-8", errors="ignore").read()
+    media_dir = os.path.join(tmp, "media")
+    created_ids: List[int] = []
+    images_size = 0
+    token = _extract_bearer_token(request)
+    if os.path.isdir(media_dir):
+        for name in os.listdir(media_dir):
+            p = os.path.join(media_dir, name)
             try:
-                buf = open(abs_path, "rb").read()
-                mime = mf.mime or "image/png"
-                parts.append(_img_tag(_data_url(mime, buf)))
+                buf = open(p, "rb").read()
+                mime = "image/png"
+                if name.lower().endswith((".jpg", ".jpeg")): mime = "image/jpeg"
+                # 图片进媒体库 -> 记录 id，方便下次复用
+                fid = _save_bytes_as_media(db, user, buf, name, mime, dir_hint="convert")
+                created_ids.append(fid)
+                images_size += len(buf)
+                # 获取SHA256用于生成预览URL
+                mf = db.get(MediaFile, fid)
+                url = _data_url(mime, buf) if inline else (_preview_url(mf.sha256, request, token) if mf else "")
+                html = html.replace(f'src="media/{name}"', f'src="{url}"')
             except Exception:
                 continue
-    else:
-        # 直接拼预览 URL（使用SHA256）
-        for fid in ids:
-            media: MediaFile | None = db.get(MediaFile, fid)
-            if not media or not media.sha256:
-                continue
-            parts.append(_img_tag(_preview_url(media.sha256, request, token)))
-    return "\n".join(parts)
 
-# ================= DOCX =================
+    # 缓存：这里既可存最终 html，也可存 file_ids（两者都存也行）
+    convert_cache.save(db, "docx", sha, params, html=html, file_ids=created_ids,
+                       size=len(html.encode("utf-8")) + images_size)
+    return html
+
 @router.post("/docx", dependencies=[Depends(require_perm("docx:import"))])
 async def convert_docx(
     request: Request,
@@ -131,67 +523,43 @@ async def convert_docx(
     if not data:
         raise HTTPException(400, "空文件")
     sha = _get_src_sha256(data)
+    params = cache_params("docx", inline=inline)
 
     # 命中缓存？
-    cache = _get_cache(db, "docx", sha)
+    cache = await run_in_threadpool(convert_cache.get, db, "docx", sha, params)
     if cache:
         # 优先 html（mammoth/soffice 已渲染的富文本）
         if cache.html:
             return {"html": cache.html, "pages": cache.pages or None}
         # 否则用 file_ids 组装（soffice 走图片）
         if cache.file_ids:
-            token = _extract_bearer_token(request)
-            ids = [int(x) for x in cache.file_ids.split(",") if x.strip()]
-            html = _html_from_file_ids(ids, inline=inline, request=request, token=token, db=db)
-            return {"html": html, "pages": cache.pages or len(ids)}
+            images = await run_in_threadpool(_images_from_file_ids, parse_ids(cache.file_ids), db)
+            return await _images_response(images, inline=inline, stream=0, request=request, pages=cache.pages)
         # 缓存异常则继续转换
 
-    # 1) 优先 mammoth：结构化 HTML（不带内嵌图；但文字保真度高）
-    try:
-        res = mammoth.convert_to_html(io.BytesIO(data))
-        html = res.value or ""
-        if html.strip():
-            _save_cache(db, "docx", sha, html=html, file_ids=None, pages=None)
-            return {"html": html}
-    except Exception:
-        pass
-
-    # 2) 回退 soffice -> HTML（带图片目录），把图片落盘到媒体库，缓存 file_ids；下次复用
-    soffice = _ensure_soffice()
-    with tempfile.TemporaryDirectory() as tmp:
-        src = os.path.join(tmp, "in.docx")
-        with open(src, "wb") as f: f.write(data)
-        cmd = [soffice, "--headless", "--convert-to", "html", "--outdir", tmp, src]
-        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        html_path = os.path.join(tmp, "in.html")
-        if not os.path.exists(html_path):
-            raise HTTPException(500, "DOCX 转换 HTML 失败")
-
-        # 替换图片为 dataURL 或 预览 URL（若想缓存成 file_ids，可把它们也入库）
-        html = open(html_path, "r", encoding="utf-8", errors="ignore").read()
-        media_dir = os.path.join(tmp, "media")
-        created_ids: List[int] = []
-        token = _extract_bearer_token(request)
-        if os.path.isdir(media_dir):
-            for name in os.listdir(media_dir):
-                p = os.path.join(media_dir, name)
-                try:
-                    buf = open(p, "rb").read()
-                    mime = "image/png"
-                    if name.lower().endswith((".jpg", ".jpeg")): mime = "image/jpeg"
-                    # 图片进媒体库 -> 记录 id，方便下次复用
-                    fid = _save_bytes_as_media(db, user, buf, name, mime, dir_hint="convert")
-                    created_ids.append(fid)
-                    # 获取SHA256用于生成预览URL
-                    mf = db.get(MediaFile, fid)
-                    url = _data_url(mime, buf) if inline else (_preview_url(mf.sha256, request, token) if mf else "")
-                    html = html.replace(f'src="media/{name}"', f'src="{url}"')
-                except Exception:
-                    continue
-
-        # 缓存：这里既可存最终 html，也可存 file_ids（两者都存也行）
-        _save_cache(db, "docx", sha, html=html, file_ids=created_ids, pages=None)
-        return {"html": html}
+    async def convert():
+        # 1) 优先 mammoth：结构化 HTML（不带内嵌图；但文字保真度高）
+        try:
+            res = await run_in_threadpool(mammoth.convert_to_html, io.BytesIO(data))
+            html = res.value or ""
+            if html.strip():
+                await run_in_threadpool(convert_cache.save, db, "docx", sha, params, html=html,
+                                        size=len(html.encode("utf-8")))
+                return html
+        except Exception:
+            pass
+
+        # 2) 回退 soffice -> HTML（带图片目录），把图片落盘到媒体库，缓存 file_ids；下次复用
+        _ensure_soffice()
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "in.docx")
+            await run_in_threadpool(_write_file, src, data)
+            html_path = await run_in_threadpool(soffice_pool.convert, src, tmp, "html")
+            return await run_in_threadpool(_docx_html_with_media, db, user, request, html_path, tmp,
+                                           sha=sha, params=params, inline=inline)
+
+    html = await convert_cache.single_flight(("docx", sha, params), convert)
+    return {"html": html}
 
 # ================= PDF =================
 @router.post("/pdf", dependencies=[Depends(require_perm("pdf:import"))])
@@ -201,45 +569,28 @@ async def convert_pdf(
     inline: int = Form(1),
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user),
-    dpi: int = Form(144)
+    dpi: int = Form(144, ge=36, le=600),
+    lazy: int = Form(0),
+    stream: int = Form(0),
 ):
+    """
+    PDF 转图片 HTML
+    - lazy=0：渲染全部页面后返回
+    - lazy=1：立即返回清单（页数 + 每页地址），页面在首次访问时渲染；可订阅 progress_url 批量渲染
+    - stream=1（lazy=0 时）：以 NDJSON 逐页返回，inline=1 时每次只读取、编码一页，适合大文档
+    """
     data = await file.read()
     if not data:
         raise HTTPException(400, "空文件")
     sha = _get_src_sha256(data)
 
-    # 命中缓存？
-    cache = _get_cache(db, "pdf", sha)
-    if cache and cache.file_ids:
-        token = _extract_bearer_token(request)
-        ids = [int(x) for x in cache.file_ids.split(",") if x.strip()]
-        html = _html_from_file_ids(ids, inline=inline, request=request, token=token, db=db)
-        return {"html": html, "pages": cache.pages or len(ids)}
-
-    # 未命中 -> 渲染成图片并入库
-    doc = fitz.open(stream=data, filetype="pdf")
-    if doc.page_count == 0:
-        raise HTTPException(400, "PDF 无页面")
+    async def to_pdf(tmp: str) -> str:
+        pdf_path = os.path.join(tmp, "in.pdf")
+        await run_in_threadpool(_write_file, pdf_path, data)
+        return pdf_path
 
-    token = _extract_bearer_token(request)
-    ids: List[int] = []
-    parts: List[str] = []
-    for i in range(doc.page_count):
-        page = doc.load_page(i)
-        zoom = dpi / 72.0
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        img_buf = pix.tobytes("png")
-        fid = _save_bytes_as_media(db, user, img_buf, f"pdf_{i+1}.png", "image/png", dir_hint="convert")
-        ids.append(fid)
-        # 获取SHA256用于生成预览URL
-        mf = db.get(MediaFile, fid)
-        src = _data_url("image/png", img_buf) if inline else (_preview_url(mf.sha256, request, token) if mf else "")
-        parts.append(_img_tag(src))
-    html = "\n".join(parts)
-
-    _save_cache(db, "pdf", sha, html=None, file_ids=ids, pages=doc.page_count)
-    return {"html": html, "pages": doc.page_count}
+    return await _cached_or_convert(db, user, request, kind="pdf", sha=sha, dpi=_clamp_dpi(dpi), inline=inline,
+                                    lazy=lazy, stream=stream, to_pdf=to_pdf)
 
 # ================= PPTX =================
 @router.post("/pptx", dependencies=[Depends(require_perm("pptx:import"))])
@@ -249,53 +600,128 @@ async def convert_pptx(
     inline: int = Form(1),
     db: Session = Depends(get_db),
     user: dict = Depends(get_current_user),
-    dpi: int = Form(144),
+    dpi: int = Form(144, ge=36, le=600),
+    lazy: int = Form(0),
+    stream: int = Form(0),
 ):
+    """PPTX 转图片 HTML（先转 PDF），lazy / stream 含义同 /pdf"""
     data = await file.read()
     if not data:
         raise HTTPException(400, "空文件")
     sha = _get_src_sha256(data)
 
-    # 命中缓存？
-    cache = _get_cache(db, "pptx", sha)
-    if cache and cache.file_ids:
-        token = _extract_bearer_token(request)
-        ids = [int(x) for x in cache.file_ids.split(",") if x.strip()]
-        html = _html_from_file_ids(ids, inline=inline, request=request, token=token, db=db)
-        return {"html": html, "pages": cache.pages or len(ids)}
-
-    # 未命中 -> 先用 soffice 转 PDF，再渲染为图片并入库
-    soffice = _ensure_soffice()
-    with tempfile.TemporaryDirectory() as tmp:
+    async def to_pdf(tmp: str) -> str:
+        # 先交给 soffice 常驻进程池转 PDF，再交给转换进程池渲染
+        _ensure_soffice()
         src = os.path.join(tmp, "in.pptx")
-        with open(src, "wb") as f: f.write(data)
-        r = subprocess.run([soffice, "--headless", "--convert-to", "pdf", "--outdir", tmp, src],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if r.returncode != 0:
-            raise HTTPException(500, f"PPTX 转 PDF 失败：{r.stderr.decode(errors='ignore')[:200]}")
-        pdf_path = os.path.join(tmp, "in.pdf")
-        if not os.path.exists(pdf_path):
-            raise HTTPException(500, "PPTX 转 PDF 失败（未生成文件）")
-
-        pdf_bytes = open(pdf_path, "rb").read()
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        token = _extract_bearer_token(request)
-
-        ids: List[int] = []
-        parts: List[str] = []
-        zoom = dpi / 72.0
-        mat = fitz.Matrix(zoom, zoom)
-        for i in range(doc.page_count):
-            pix = doc.load_page(i).get_pixmap(matrix=mat, alpha=False)
-            img_buf = pix.tobytes("png")
-            fid = _save_bytes_as_media(db, user, img_buf, f"ppt_{i+1}.png", "image/png", dir_hint="convert")
-            ids.append(fid)
-            # 获取SHA256用于生成预览URL
-            mf = db.get(MediaFile, fid)
-            src = _data_url("image/png", img_buf) if inline else (_preview_url(mf.sha256, request, token) if mf else "")
-            parts.append(_img_tag(src))
-        html = "\n".join(parts)
-
-        _save_cache(db, "pptx", sha, html=None, file_ids=ids, pages=doc.page_count)
-        return {"html": html, "pages": doc.page_count}
+        await run_in_threadpool(_write_file, src, data)
+        return await run_in_threadpool(soffice_pool.convert, src, tmp, "pdf")
+
+    return await _cached_or_convert(db, user, request, kind="pptx", sha=sha, dpi=_clamp_dpi(dpi), inline=inline,
+                                    lazy=lazy, stream=stream, to_pdf=to_pdf)
+
+# ================= 按页懒转换：单页 / 进度 =================
+@router.get("/page/{kind}/{src_sha256}/{page}")
+async def convert_page(
+    request: Request,
+    kind: str = Path(..., pattern="^(pdf|pptx)$"),
+    src_sha256: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    page: int = Path(..., ge=1),
+    dpi: int = Query(144, ge=36, le=600),
+    sig: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    返回第 page 页图片（首次访问时渲染并按页缓存）
+    - 权限：清单中的页面地址带签名 sig（<img> 无法携带 Authorization，签名只由导入接口签发），
+      或 Bearer 用户拥有 {kind}:import 权限；只有已导入生成过清单的文档才会渲染
+    - 内容寻址、渲染后不再变化：强 ETag + 长期缓存
+    """
+    dpi = _clamp_dpi(dpi)
+    await _check_page_access(request, kind, src_sha256, dpi, sig)
+    fid = await _ensure_page(db, kind, src_sha256, page, dpi)
+    mf, abs_path = await run_in_threadpool(_page_file, db, fid)
+    if not mf:
+        raise HTTPException(404, "页面图片不存在")
+    return conditional_file_response(request.headers, abs_path, media_type=mf.mime or "image/png", digest=mf.sha256)
+
+def _page_file(db: Session, fid: int):
+    """页面图片的媒体记录与绝对路径；记录或文件缺失时返回 (None, "")"""
+    mf = db.get(MediaFile, fid)
+    abs_path = os.path.join(get_upload_root(db), mf.path) if mf else ""
+    if not mf or not os.path.exists(abs_path):
+        return None, ""
+    return mf, abs_path
+
+@router.get("/progress/{kind}/{src_sha256}")
+async def convert_progress(
+    request: Request,
+    kind: str = Path(..., pattern="^(pdf|pptx)$"),
+    src_sha256: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    dpi: int = Query(144, ge=36, le=600),
+    db: Session = Depends(get_db),
+    user: dict = Depends(get_current_user),
+):
+    """
+    批量渲染剩余页面，以 SSE 推送进度（text/event-stream）
+    - start：{"total", "done"}
+    - page：{"page", "url", "done", "total"}，url 为媒体预览地址；先推送已渲染的页，之后每渲染完一段推送该段各页
+    - done：{"pages"}；全部完成后回填整份文档缓存，之后非懒转换请求直接命中
+    - error：{"detail"}
+    """
+    await run_in_threadpool(_require_import_perm, user, kind)
+    dpi = _clamp_dpi(dpi)
+    params = cache_params(kind, dpi=dpi)
+    doc = await run_in_threadpool(convert_cache.get, db, kind, src_sha256, params)
+    if not doc or not doc.pages:
+        raise HTTPException(404, "文档不存在")
+    total = doc.pages
+    token = _extract_bearer_token(request)
+
+    async def events():
+        # 流式响应期间使用独立会话，不依赖请求依赖的生命周期
+        s = SessionLocal()
+        try:
+            d = await run_in_threadpool(convert_cache.get, s, kind, src_sha256, params, touch=False)
+            if d is None or not d.pages:
+                # 请求校验之后缓存被淘汰
+                yield _sse("error", {"detail": "文档不存在"})
+                return
+            done = await run_in_threadpool(_cached_page_ids, s, d)
+            missing = [p for p, fid in done.items() if fid is None]
+            yield _sse("start", {"total": total, "done": total - len(missing)})
+            # 已渲染的页（首次访问时懒渲染过的）同样推送一次正式地址
+            cached: Dict[int, List[int]] = {}
+            for p, fid in done.items():
+                if fid is not None:
+                    cached.setdefault(fid, []).append(p)
+            if cached:
+                for fid, sha in await run_in_threadpool(_file_shas, s, list(cached)):
+                    for page in cached[fid]:
+                        yield _sse("page", {"page": page, "url": _preview_url(sha, request, token),
+                                            "done": total - len(missing), "total": total})
+            if missing:
+                try:
+                    async for rendered in _render_pages(s, d, missing, dpi):
+                        for page, res, fid in rendered:
+                            done[page] = fid
+                        finished = sum(1 for fid in done.values() if fid is not None)
+                        for page, res, fid in rendered:
+                            yield _sse("page", {"page": page, "url": _preview_url(res.sha256, request, token),
+                                                "done": finished, "total": total})
+                except HTTPException as e:
+                    yield _sse("error", {"detail": e.detail})
+                    return
+            # 某页渲染失败或未返回时不回填整份文档缓存（否则 file_ids 中混入空值），明确报错
+            absent = [p for p in range(1, total + 1) if done.get(p) is None]
+            if absent:
+                logger.warning(f"{kind} {src_sha256} 渲染未完成，缺少第 {absent[:10]} 页")
+                yield _sse("error", {"detail": f"有 {len(absent)} 页渲染失败，请重试"})
+                return
+            await run_in_threadpool(_finish_document, s, d, [done[p] for p in range(1, total + 1)])
+            yield _sse("done", {"pages": total})
+        finally:
+            s.close()
 
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -3,8 +3,11 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 import os
-import io
 import hashlib
+import logging
+import shutil
+import uuid
+import mimetypes
 import time
 import urllib.parse
 from datetime import datetime
@@ -13,17 +16,22 @@ from typing import Optional, Any, List
 
 from fastapi import (
     APIRouter, Depends, UploadFile, File, Form, HTTPException,
-    Header, Request, Query
+    Request, Query
 )
-from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from app.core.db import get_db
-from app.core.deps import require_perm, get_current_user
-from app.core.config_loader import get_config
-from app.models.media import MediaDir, MediaFile, MediaTag, RelMediaFileTag, MediaAudit
-from app.schemas.media import DirCreate, DirUpdate, RenameBody, FileTagsBody
+from sqlalchemy import func, select
+
+from app.core.db import get_db, get_read_db, current_request_sessions, release_in_thread
+from app.core.deps import require_perm, get_current_user, has_perm
+from app.core.config_registry import typed_config
+from app.core.file_response import conditional_file_response
+from app.utils.pagination import paginate, COUNT_PATTERN
+from app.utils.fs import mkstemp_public
+from app.services.media_derivative import media_derivative, pick_size, FORMAT_MIME
+from app.models.media import MediaDir, MediaFile, MediaTag, RelMediaFileTag, MediaAudit, MediaUploadSession
+from app.schemas.media import DirCreate, DirUpdate, RenameBody, FileTagsBody, UploadSessionCreate, InstantUploadItem, InstantUploadBatch
 
 # 如果你项目已内置 settings.SECRET_KEY / ALGORITHM，可使用它们；否则 fallback 为不校验
 try:
@@ -39,18 +47,30 @@ except Exception:
     jwt = None  # type: ignore
 
 router = APIRouter(prefix="/api/admin/media", tags=["admin-media"])
+logger = logging.getLogger(__name__)
 
 # === 默认上传根目录（已弃用，现在从系统配置读取）===
 # UPLOAD_ROOT = os.getenv("FOADMIN_UPLOAD_ROOT", "./runtime/uploads")
 # os.makedirs(UPLOAD_ROOT, exist_ok=True)
 
+# 流式上传的读写块大小，以及 Content-Length 预检时为其它表单字段预留的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# 分片上传：分片大小范围与会话暂存目录（位于上传根目录下）
+UPLOAD_CHUNK_DEFAULT = 8 * 1024 * 1024
+UPLOAD_CHUNK_MIN = 256 * 1024
+UPLOAD_CHUNK_MAX = 64 * 1024 * 1024
+
+# 批量秒传单次最多文件数
+INSTANT_BATCH_MAX = 500
+
 
 def get_upload_root(db: Session | None = None) -> str:
     """
     从系统配置获取上传根目录（动态读取，支持热更新）
     """
-    upload_path = get_config('upload_path', 'string', './runtime/uploads', db)
-    upload_root = os.path.abspath(upload_path)
+    upload_root = typed_config(db).upload_root
     ensure_dir(upload_root)
     return upload_root
 
@@ -218,6 +238,7 @@ def set_file_tags(
 
 @router.post("/upload", dependencies=[Depends(require_perm("media:upload"))])
 async def upload_file(
+    request: Request,
     db: Session = Depends(get_db),
     user: Any = Depends(get_current_user),
     file: UploadFile = File(...),
@@ -231,127 +252,606 @@ async def upload_file(
     - upload_allowed_exts: 允许的文件后缀（逗号分隔）
     - upload_path: 本地上传路径
     - upload_storage: 存储方式（local/oss/cos）
+
+    流式处理：按块读取上传内容，边读边校验大小、边计算 sha256、边写入目标目录下的临时文件，
+    内存占用与文件大小无关；(sha256, size) 已存在时丢弃临时文件，否则原子 rename 到最终位置
     """
+    tmp_path = None
     try:
-        # 从系统配置读取上传参数
-        max_size_mb = get_config('upload_max_size', 'number', 10, db)  # 默认 10MB
-        allowed_exts_str = get_config('upload_allowed_exts', 'string', 'jpg,jpeg,png,gif,pdf,doc,docx,xls,xlsx,zip', db)
-        upload_storage = get_config('upload_storage', 'string', 'local', db)
-        upload_path = get_config('upload_path', 'string', './runtime/uploads', db)
-        
-        # 解析允许的文件后缀
-        allowed_exts = [ext.strip().lower() for ext in allowed_exts_str.split(',') if ext.strip()]
-        
-        buf = await file.read()
-        if not buf:
-            raise HTTPException(400, "空文件")
-
-        ext = os.path.splitext(file.filename)[1].lower().strip(".")
+        limits = await run_in_threadpool(_upload_limits, db)
+        ext = _check_ext(file.filename, limits)
         mime = file.content_type or ""
-        size = len(buf)
-        
-        # 检查文件大小
-        max_size_bytes = int(max_size_mb) * 1024 * 1024
-        if size > max_size_bytes:
-            raise HTTPException(400, f"文件大小超过限制（最大{max_size_mb}MB）")
-        
-        # 检查文件后缀
-        if allowed_exts and ext and ext not in allowed_exts:
-            raise HTTPException(400, f"不支持的文件类型，允许的后缀：{allowed_exts_str}")
-        
-        sha256 = hashlib.sha256(buf).hexdigest()
-
-        # 检查是否存在相同的文件，且文件已被软删除
-        existing_file = db.query(MediaFile).filter_by(sha256=sha256, size=size).filter(MediaFile.deleted_at.isnot(None)).first()
-        
-        if existing_file:
-            # 如果存在软删除的相同文件，则恢复文件
-            existing_file.deleted_at = None  # 恢复删除标记
-            existing_file.uploader_id = get_actor_id(user)
-            existing_file.remark = remark
-            db.commit()
-            db.refresh(existing_file)
-            record_audit(db, existing_file.id, "restore", get_actor_id(user))  # 记录恢复操作
-            return {"id": existing_file.id, "sha256": existing_file.sha256}
 
-        # 使用配置的上传路径（动态获取，支持热更新）
-        upload_root = get_upload_root(db)
-        
-        # 存储目录：media/YYYY/MM/DD
-        ymd = datetime.now().strftime("%Y/%m/%d")
-        rel_dir = os.path.join("media", ymd)
-        abs_dir = os.path.normpath(os.path.join(upload_root, rel_dir))
-        if not os.path.abspath(abs_dir).startswith(upload_root):
-            raise HTTPException(400, "非法路径")
-        ensure_dir(abs_dir)
-
-        safe_name = f"{sha256[:16]}{('.' + ext) if ext else ''}"
-        abs_path = os.path.join(abs_dir, safe_name)
-
-        # 写文件
-        with open(abs_path, "wb") as f:
-            f.write(buf)
-
-        # 图片宽高（可选）
-        width = height = duration = None
-        if mime.startswith("image/"):
-            try:
-                from PIL import Image  # pillow
-                im = Image.open(io.BytesIO(buf))
-                width, height = im.size
-            except Exception:
-                pass
-
-        mf = MediaFile(
-            dir_id=dir_id,
-            filename=file.filename,
-            ext=ext,
-            mime=mime,
-            size=size,
-            sha256=sha256,
-            width=width,
-            height=height,
-            duration=duration,
-            storage=upload_storage,  # 使用配置的存储方式
-            path=os.path.join(rel_dir, safe_name),
-            url=None,
-            uploader_id=get_actor_id(user),
-            remark=remark,
-        )
-        db.add(mf)
-        db.commit()
-        db.refresh(mf)
-
-        # 标签（可选）
-        if tags:
-            tag_names = [t.strip() for t in tags.split(",") if t.strip()]
-            for tn in tag_names:
-                tag = db.query(MediaTag).filter_by(name=tn).first()
-                if not tag:
-                    tag = MediaTag(name=tn)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-                db.add(RelMediaFileTag(file_id=mf.id, tag_id=tag.id))
-            db.commit()
+        # 请求体声明的长度已明显超限时直接拒绝（预留表单字段与 multipart 边界的开销）
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limits["max_bytes"] + UPLOAD_FORM_OVERHEAD:
+            raise HTTPException(400, f"文件大小超过限制（最大{limits['max_mb']}MB）")
 
-        record_audit(db, mf.id, "upload", get_actor_id(user))
-        # 返回 ID + SHA256，供前端使用
-        return {"id": mf.id, "sha256": mf.sha256}
+        rel_dir, abs_dir = await run_in_threadpool(_media_target_dir, db)
+
+        # 流式写入临时文件（在线程池中执行，不阻塞事件循环）
+        tmp_path, sha256, size = await run_in_threadpool(_spool_upload, file.file, abs_dir, limits["max_bytes"])
+        if size < 0:
+            raise HTTPException(400, f"文件大小超过限制（最大{limits['max_mb']}MB）")
+        if size == 0:
+            raise HTTPException(400, "空文件")
+
+        # 查重、rename 与入库同样在线程池中执行
+        result = await run_in_threadpool(
+            _store_media, db, user, tmp_path, sha256, size,
+            filename=file.filename, ext=ext, mime=mime, rel_dir=rel_dir, abs_dir=abs_dir,
+            storage=limits["storage"], dir_id=dir_id, remark=remark, tags=tags,
+        )
+        tmp_path = None
+        return result
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"保存失败：{e}")
+    finally:
+        if tmp_path:
+            _discard(tmp_path)
+
+
+# ---------------- 秒传（上传前去重握手） ----------------
+# 客户端先在本地计算 sha256，提交 {sha256, size, filename, dir_id}：
+# 内容已存在时直接返回记录，无需再上传任何字节；未命中再走 /upload 或 /uploads
+# 命中回收站中的文件时，只有具备 media:delete（与 PUT /{fid}/restore 相同）才就地恢复并返回 restored=true，
+# 否则按未命中处理：仅凭 (sha256, size) 不能证明持有内容，需上传完整文件后再恢复
+
+@router.post("/instant", dependencies=[Depends(require_perm("media:upload"))])
+def instant_upload(
+    body: InstantUploadItem,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """
+    秒传握手
+    返回 {hit: true, id, sha256, restored} 或 {hit: false}
+    """
+    result = _instant_lookup(db, user, [body])[0]
+    if result.get("error"):
+        raise HTTPException(400, result["error"])
+    return result
+
+
+@router.post("/instant/batch", dependencies=[Depends(require_perm("media:upload"))])
+def instant_upload_batch(
+    body: InstantUploadBatch,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """批量秒传握手（多文件拖拽），items 与请求顺序一一对应；单项校验失败返回 error 而不影响其它项"""
+    if len(body.items) > INSTANT_BATCH_MAX:
+        raise HTTPException(400, f"单次最多 {INSTANT_BATCH_MAX} 个文件")
+    return {"items": _instant_lookup(db, user, body.items)}
+
+
+def _instant_lookup(db: Session, user: Any, items: List[InstantUploadItem]) -> List[dict]:
+    """一次查询匹配全部 (sha256, size)，软删除的命中项有恢复权限时就地恢复，最后统一提交"""
+    limits = _upload_limits(db)
+    actor_id = get_actor_id(user)
+    can_restore = has_perm(user, "media:delete")
+
+    results: List[dict] = [{} for _ in items]
+    wanted = set()
+    for i, it in enumerate(items):
+        try:
+            if not _is_sha256(it.sha256):
+                raise HTTPException(400, "sha256 格式错误")
+            if it.size <= 0:
+                raise HTTPException(400, "空文件")
+            if it.size > limits["max_bytes"]:
+                raise HTTPException(400, f"文件大小超过限制（最大{limits['max_mb']}MB）")
+            _check_ext(it.filename, limits)
+        except HTTPException as e:
+            results[i] = {"hit": False, "error": e.detail}
+            continue
+        wanted.add(it.sha256.lower())
+
+    found = {}
+    if wanted:
+        for f in db.query(MediaFile).filter(MediaFile.sha256.in_(wanted)).all():
+            found[(f.sha256, f.size)] = f
+
+    upload_root = get_upload_root(db)
+    restored_ids = set()
+    for i, it in enumerate(items):
+        if results[i]:
+            continue
+        f = found.get((it.sha256.lower(), it.size))
+        # 记录存在但文件已丢失时视为未命中，让客户端重新上传内容
+        if not f or not os.path.exists(os.path.join(upload_root, f.path)):
+            results[i] = {"hit": False}
+            continue
+        if f.deleted_at is not None:
+            if not can_restore:
+                results[i] = {"hit": False}
+                continue
+            _restore_media(f, user, it.remark, dir_id=it.dir_id, filename=it.filename)
+            db.add(MediaAudit(file_id=f.id, action="restore", actor_id=actor_id))
+            restored_ids.add(f.id)
+        results[i] = {"hit": True, "id": f.id, "sha256": f.sha256, "restored": f.id in restored_ids}
+
+    if restored_ids:
+        db.commit()
+    return results
+
+
+# ---------------- 分片上传（可断点续传） ----------------
+# 流程：POST /uploads 创建会话 → 并行 PUT /uploads/{upload_id}/chunks/{index}
+#      → GET /uploads/{upload_id} 查询已收到的分片 → POST /uploads/{upload_id}/complete 合并入库
+# 分片暂存在 {UPLOAD_SESSION_DIR}/{upload_id}/{index}.part（上传目录之外，不经静态文件访问暴露），过期会话由定时任务
+# app.tasks.media.cleanup_upload_sessions 清理
+
+@router.post("/uploads", dependencies=[Depends(require_perm("media:upload"))])
+def create_upload_session(
+    body: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """创建分片上传会话，返回 upload_id 与分片规格"""
+    limits = _upload_limits(db)
+    ext = _check_ext(body.filename, limits)
+    if body.size <= 0:
+        raise HTTPException(400, "空文件")
+    if body.size > limits["max_bytes"]:
+        raise HTTPException(400, f"文件大小超过限制（最大{limits['max_mb']}MB）")
+    if body.sha256 and not _is_sha256(body.sha256):
+        raise HTTPException(400, "sha256 格式错误")
+
+    chunk_size = min(max(body.chunk_size or UPLOAD_CHUNK_DEFAULT, UPLOAD_CHUNK_MIN), UPLOAD_CHUNK_MAX)
+    total_chunks = (body.size + chunk_size - 1) // chunk_size
+
+    s = MediaUploadSession(
+        upload_id=uuid.uuid4().hex,
+        filename=body.filename,
+        ext=ext,
+        mime=body.mime,
+        size=body.size,
+        sha256=body.sha256.lower() if body.sha256 else None,
+        chunk_size=chunk_size,
+        total_chunks=total_chunks,
+        dir_id=body.dir_id,
+        remark=body.remark,
+        tags=",".join(body.tags) if body.tags else None,
+        uploader_id=get_actor_id(user),
+        status="uploading",
+    )
+    db.add(s)
+    db.commit()
+    ensure_dir(_session_dir(s.upload_id))
+    return {
+        "upload_id": s.upload_id,
+        "chunk_size": chunk_size,
+        "total_chunks": total_chunks,
+    }
+
+
+@router.put("/uploads/{upload_id}/chunks/{index}", dependencies=[Depends(require_perm("media:upload"))])
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """
+    上传单个分片（请求体为分片原始字节）
+    - 可并行、可重复上传（幂等覆盖）
+    - 可选请求头 X-Chunk-Sha256 用于校验分片内容
+    """
+    # 查询会话、建目录、写文件都在线程池中执行，事件循环只负责接收请求体
+    holder = current_request_sessions()
+    try:
+        expected, session_dir = await run_in_threadpool(_chunk_target, db, upload_id, user, index)
+    finally:
+        # 接收请求体（最大 64MB，慢速链路上可能持续很久）之前归还连接，否则并行上传分片会占满连接池
+        await release_in_thread(holder.release if holder is not None else db.close)
+
+    chunk_sha = request.headers.get("x-chunk-sha256")
+
+    # 边收边写临时文件，完整且校验通过后再 rename 为 {index}.part（要么完整要么不存在）
+    out, tmp_path = await run_in_threadpool(_open_chunk_tmp, session_dir, index)
+    hasher = hashlib.sha256()
+    received = 0
+    try:
+        async for piece in request.stream():
+            received += len(piece)
+            if received > expected:
+                raise HTTPException(400, f"分片大小不符（应为 {expected} 字节）")
+            if chunk_sha:
+                hasher.update(piece)
+            await run_in_threadpool(out.write, piece)
+        await run_in_threadpool(out.close)
+        if received != expected:
+            raise HTTPException(400, f"分片大小不符（应为 {expected} 字节）")
+        if chunk_sha and hasher.hexdigest() != chunk_sha.lower():
+            raise HTTPException(400, "分片校验失败")
+        await run_in_threadpool(os.replace, tmp_path, os.path.join(session_dir, f"{index}.part"))
+        tmp_path = None
+    finally:
+        out.close()
+        if tmp_path:
+            _discard(tmp_path)
+    return {"index": index, "size": expected}
+
+
+def _chunk_target(db: Session, upload_id: str, user: Any, index: int) -> tuple[int, str]:
+    """校验分片请求，返回 (该分片应有的字节数, 会话目录)；只取出标量，之后不再使用会话对象"""
+    s = _get_session(db, upload_id, user)
+    if s.status != "uploading":
+        raise HTTPException(409, "上传会话已结束")
+    if index < 0 or index >= s.total_chunks:
+        raise HTTPException(400, "分片序号越界")
+    return min(s.chunk_size, s.size - index * s.chunk_size), _session_dir(s.upload_id)
+
+
+def _open_chunk_tmp(session_dir: str, index: int):
+    """在会话目录下创建分片临时文件，返回 (文件对象, 路径)"""
+    ensure_dir(session_dir)
+    fd, tmp_path = mkstemp_public(prefix=f".{index}-", suffix=".tmp", dir=session_dir)
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+@router.get("/uploads/{upload_id}", dependencies=[Depends(require_perm("media:upload"))])
+def get_upload_session(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """查询上传进度：已收到的分片序号与字节数，客户端据此只补传缺失分片"""
+    s = _get_session(db, upload_id, user)
+    received = _received_chunks(_session_dir(s.upload_id), s.total_chunks) \
+        if s.status == "uploading" else []
+    received_bytes = sum(min(s.chunk_size, s.size - i * s.chunk_size) for i in received)
+    return {
+        "upload_id": s.upload_id,
+        "filename": s.filename,
+        "size": s.size,
+        "chunk_size": s.chunk_size,
+        "total_chunks": s.total_chunks,
+        "status": s.status,
+        "received": received,
+        "received_bytes": received_bytes,
+        "file_id": s.file_id,
+    }
+
+
+@router.post("/uploads/{upload_id}/complete", dependencies=[Depends(require_perm("media:upload"))])
+def complete_upload_session(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """
+    合并分片：按序拼接并计算 sha256，校验通过后写入内容寻址目录并创建 MediaFile
+    合并读写整个文件并多次访问数据库，整个接口为同步函数（在线程池中执行）
+    """
+    s = _get_session(db, upload_id, user)
+    if s.status == "completed":
+        return {"id": s.file_id, "sha256": s.sha256}
+    if s.status != "uploading":
+        raise HTTPException(409, "上传会话已结束")
+
+    session_dir = _session_dir(s.upload_id)
+    received = _received_chunks(session_dir, s.total_chunks)
+    if len(received) != s.total_chunks:
+        missing = sorted(set(range(s.total_chunks)) - set(received))
+        raise HTTPException(409, f"分片未上传完整，缺少 {len(missing)} 个：{missing[:20]}")
+
+    # 抢占会话，避免并发 complete 重复合并
+    claimed = db.query(MediaUploadSession) \
+        .filter(MediaUploadSession.id == s.id, MediaUploadSession.status == "uploading") \
+        .update({"status": "completing"}, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        raise HTTPException(409, "上传会话正在合并")
+
+    tmp_path = None
+    try:
+        limits = _upload_limits(db)
+        rel_dir, abs_dir = _media_target_dir(db)
+        tmp_path, sha256, size = _assemble_chunks(session_dir, s.total_chunks, abs_dir)
+        if size != s.size:
+            raise HTTPException(400, f"文件大小不符（期望 {s.size}，实际 {size}）")
+        if s.sha256 and sha256 != s.sha256:
+            raise HTTPException(400, "文件 sha256 校验失败")
+
+        mime = s.mime or mimetypes.guess_type(s.filename)[0] or ""
+        result = _store_media(
+            db, user, tmp_path, sha256, size,
+            filename=s.filename, ext=s.ext, mime=mime, rel_dir=rel_dir, abs_dir=abs_dir,
+            storage=limits["storage"], dir_id=s.dir_id, remark=s.remark, tags=s.tags,
+        )
+        tmp_path = None
+    except Exception as e:
+        db.rollback()
+        db.query(MediaUploadSession).filter(MediaUploadSession.id == s.id) \
+            .update({"status": "uploading"}, synchronize_session=False)
+        db.commit()
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(500, f"保存失败：{e}")
+    finally:
+        if tmp_path:
+            _discard(tmp_path)
+
+    db.query(MediaUploadSession).filter(MediaUploadSession.id == s.id).update(
+        {"status": "completed", "sha256": result["sha256"], "file_id": result["id"]},
+        synchronize_session=False,
+    )
+    db.commit()
+    shutil.rmtree(session_dir, ignore_errors=True)
+    return result
+
+
+@router.delete("/uploads/{upload_id}", dependencies=[Depends(require_perm("media:upload"))])
+def abort_upload_session(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    user: Any = Depends(get_current_user),
+):
+    """取消上传会话并删除已上传的分片"""
+    s = _get_session(db, upload_id, user)
+    if s.status == "completing":
+        raise HTTPException(409, "上传会话正在合并")
+    if s.status == "uploading":
+        s.status = "aborted"
+        db.commit()
+    shutil.rmtree(_session_dir(s.upload_id), ignore_errors=True)
+    return {"ok": True}
+
+
+# ---------------- 上传内部工具 ----------------
+
+def _upload_limits(db: Session) -> dict:
+    """读取上传相关配置（后缀集合、字节数按配置版本预先算好）"""
+    cfg = typed_config(db)
+    return {
+        "max_mb": cfg.upload_max_size,
+        "max_bytes": cfg.upload_max_bytes,
+        "allowed_exts_str": cfg.upload_allowed_exts,
+        "allowed_exts": cfg.upload_allowed_ext_set,
+        "storage": cfg.upload_storage,
+    }
+
+
+def _check_ext(filename: Optional[str], limits: dict) -> str:
+    """取文件后缀并校验是否允许（读取内容之前）"""
+    ext = os.path.splitext(filename or "")[1].lower().strip(".")
+    if limits["allowed_exts"] and ext and ext not in limits["allowed_exts"]:
+        raise HTTPException(400, f"不支持的文件类型，允许的后缀：{limits['allowed_exts_str']}")
+    return ext
+
+
+def _media_target_dir(db: Session) -> tuple[str, str]:
+    """存储目录：media/YYYY/MM/DD，返回 (相对路径, 绝对路径)"""
+    # 使用配置的上传路径（动态获取，支持热更新）
+    upload_root = get_upload_root(db)
+    ymd = datetime.now().strftime("%Y/%m/%d")
+    rel_dir = os.path.join("media", ymd)
+    abs_dir = os.path.normpath(os.path.join(upload_root, rel_dir))
+    if not os.path.abspath(abs_dir).startswith(upload_root):
+        raise HTTPException(400, "非法路径")
+    ensure_dir(abs_dir)
+    return rel_dir, abs_dir
+
+
+def _store_media(
+    db: Session,
+    user: Any,
+    tmp_path: str,
+    sha256: str,
+    size: int,
+    *,
+    filename: str,
+    ext: Optional[str],
+    mime: str,
+    rel_dir: str,
+    abs_dir: str,
+    storage: str,
+    dir_id: Optional[int] = None,
+    remark: Optional[str] = None,
+    tags: Optional[str] = None,
+) -> dict:
+    """
+    把已算好 sha256 的临时文件登记为媒体文件（临时文件必须与 abs_dir 同一文件系统）
+
+    - (sha256, size) 已存在：丢弃临时文件；软删除的记录恢复，正常记录直接返回
+    - 否则原子 rename 到 abs_dir/{sha256前16位}.{ext} 并创建 MediaFile
+    """
+    existing_file = db.query(MediaFile).filter_by(sha256=sha256, size=size).first()
+    if existing_file:
+        existing_abs = os.path.join(get_upload_root(db), existing_file.path)
+        if os.path.exists(existing_abs):
+            # 内容已存在：不再落盘
+            _discard(tmp_path)
+        else:
+            # 记录在但文件丢失：用本次上传的内容补回原位置
+            ensure_dir(os.path.dirname(existing_abs))
+            os.replace(tmp_path, existing_abs)
+        if existing_file.deleted_at is None:
+            return {"id": existing_file.id, "sha256": existing_file.sha256}
+        # 如果存在软删除的相同文件，则恢复文件
+        _restore_media(existing_file, user, remark)
+        db.commit()
+        db.refresh(existing_file)
+        record_audit(db, existing_file.id, "restore", get_actor_id(user))  # 记录恢复操作
+        return {"id": existing_file.id, "sha256": existing_file.sha256}
+
+    safe_name = f"{sha256[:16]}{('.' + ext) if ext else ''}"
+    abs_path = os.path.join(abs_dir, safe_name)
+
+    # 原子替换到最终位置（同目录 rename，读者不会看到写了一半的文件）
+    os.replace(tmp_path, abs_path)
+    # 后台预生成列表页使用的最小档缩略图
+    if mime.startswith("image/"):
+        sizes = typed_config(db).media_thumb_size_list
+        media_derivative.schedule(abs_path, mime, sizes[:1])
+
+    # 图片宽高（可选）：Image.open 只解析文件头，不解码像素
+    width = height = duration = None
+    if mime.startswith("image/"):
+        try:
+            from PIL import Image  # pillow
+            with Image.open(abs_path) as im:
+                width, height = im.size
+        except Exception:
+            pass
+
+    mf = MediaFile(
+        dir_id=dir_id,
+        filename=filename,
+        ext=ext,
+        mime=mime,
+        size=size,
+        sha256=sha256,
+        width=width,
+        height=height,
+        duration=duration,
+        storage=storage,  # 使用配置的存储方式
+        path=os.path.join(rel_dir, safe_name),
+        url=None,
+        uploader_id=get_actor_id(user),
+        remark=remark,
+    )
+    db.add(mf)
+    db.commit()
+    db.refresh(mf)
+
+    # 标签（可选）
+    if tags:
+        tag_names = [t.strip() for t in tags.split(",") if t.strip()]
+        for tn in tag_names:
+            tag = db.query(MediaTag).filter_by(name=tn).first()
+            if not tag:
+                tag = MediaTag(name=tn)
+                db.add(tag)
+                db.commit()
+                db.refresh(tag)
+            db.add(RelMediaFileTag(file_id=mf.id, tag_id=tag.id))
+        db.commit()
+
+    record_audit(db, mf.id, "upload", get_actor_id(user))
+    # 返回 ID + SHA256，供前端使用
+    return {"id": mf.id, "sha256": mf.sha256}
+
+
+def _restore_media(
+    f: MediaFile,
+    user: Any,
+    remark: Optional[str],
+    *,
+    dir_id: Optional[int] = None,
+    filename: Optional[str] = None,
+) -> None:
+    """恢复软删除的媒体记录（由调用方提交）"""
+    f.deleted_at = None  # 恢复删除标记
+    f.uploader_id = get_actor_id(user)
+    f.remark = remark
+    if dir_id is not None:
+        f.dir_id = dir_id
+    if filename:
+        f.filename = filename
+
+
+def _spool_upload(src, abs_dir: str, max_bytes: int) -> tuple[str, str, int]:
+    """
+    把上传内容按块复制到 abs_dir 下的临时文件，同时增量计算 sha256
+
+    Returns:
+        (临时文件路径, sha256, 字节数)；超过 max_bytes 时立即停止读取，字节数返回 -1
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    fd, tmp_path = mkstemp_public(prefix=".upload-", suffix=".part", dir=abs_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    return tmp_path, "", -1
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+def _assemble_chunks(session_dir: str, total_chunks: int, abs_dir: str) -> tuple[str, str, int]:
+    """按序拼接分片到 abs_dir 下的临时文件，同时增量计算 sha256"""
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = mkstemp_public(prefix=".upload-", suffix=".part", dir=abs_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for i in range(total_chunks):
+                with open(os.path.join(session_dir, f"{i}.part"), "rb") as src:
+                    while True:
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        hasher.update(chunk)
+                        out.write(chunk)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+def _session_dir(upload_id: str) -> str:
+    """分片暂存目录：.env UPLOAD_SESSION_DIR/{upload_id}（位于上传目录之外）"""
+    return os.path.join(os.path.abspath(settings.UPLOAD_SESSION_DIR), upload_id)
+
+
+def _get_session(db: Session, upload_id: str, user: Any) -> MediaUploadSession:
+    s = db.query(MediaUploadSession).filter_by(upload_id=upload_id).first()
+    if not s or s.uploader_id != get_actor_id(user):
+        raise HTTPException(404, "上传会话不存在")
+    return s
+
+
+def _received_chunks(session_dir: str, total_chunks: int) -> List[int]:
+    try:
+        names = os.listdir(session_dir)
+    except FileNotFoundError:
+        return []
+    received = []
+    for name in names:
+        stem, dot, suffix = name.partition(".")
+        if suffix == "part" and stem.isdigit() and int(stem) < total_chunks:
+            received.append(int(stem))
+    return sorted(received)
+
+
+def _is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdefABCDEF" for c in value)
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 
 
 @router.get("/list", dependencies=[Depends(require_perm("media:view"))])
 def list_files(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     kw: Optional[str] = None,
     dir_id: Optional[int] = None,
     page: int = 1,
     size: int = 20,
+    cursor: Optional[str] = None,              # 游标分页：上一页返回的 next_cursor
+    count: str = Query("exact", pattern=COUNT_PATTERN),  # exact/capped/none
     with_deleted: int = 0,
     tag: Optional[str] = None,                 # 单个标签名
     tag_id: Optional[int] = None,              # 单个标签ID
@@ -363,43 +863,38 @@ def list_files(
     - ?tag_id=3           按标签ID
     - ?tags=logo,banner   多标签名，任意匹配（OR）
     """
-    q = db.query(MediaFile)
+    stmt = select(MediaFile)
     if kw:
-        q = q.filter(MediaFile.filename.like(f"%{kw}%"))
+        stmt = stmt.where(MediaFile.filename.like(f"%{kw}%"))
     if dir_id is not None:
-        q = q.filter(MediaFile.dir_id == dir_id)
+        stmt = stmt.where(MediaFile.dir_id == dir_id)
     if not with_deleted:
-        q = q.filter(MediaFile.deleted_at.is_(None))
+        stmt = stmt.where(MediaFile.deleted_at.is_(None))
 
     # 标签过滤
     if tag or tag_id or (tags and tags.strip()):
-        q = q.join(RelMediaFileTag, RelMediaFileTag.file_id == MediaFile.id)\
-             .join(MediaTag, MediaTag.id == RelMediaFileTag.tag_id)
+        stmt = stmt.join(RelMediaFileTag, RelMediaFileTag.file_id == MediaFile.id)\
+                   .join(MediaTag, MediaTag.id == RelMediaFileTag.tag_id)
         if tag:
-            q = q.filter(MediaTag.name == tag)
+            stmt = stmt.where(MediaTag.name == tag)
         if tag_id:
-            q = q.filter(MediaTag.id == tag_id)
+            stmt = stmt.where(MediaTag.id == tag_id)
         if tags and tags.strip():
             names = [x.strip() for x in tags.split(",") if x.strip()]
             if names:
-                q = q.filter(MediaTag.name.in_(names))
+                stmt = stmt.where(MediaTag.name.in_(names))
 
-    total = q.count()
-    rows = (
-        q.order_by(MediaFile.id.desc())
-         .offset((page - 1) * size).limit(size)
-         .all()
-    )
+    p = paginate(db, stmt, order_cols=(MediaFile.id,), page=page, size=size, cursor=cursor, count=count)
+    rows = p["rows"]
 
     # 批量查出每个文件的标签
     file_ids = [r.id for r in rows]
     tag_map = {}
     if file_ids:
-        pairs = (
-            db.query(RelMediaFileTag.file_id, MediaTag.name)
-              .join(MediaTag, MediaTag.id == RelMediaFileTag.tag_id)
-              .filter(RelMediaFileTag.file_id.in_(file_ids))
-              .all()
+        pairs = db.execute(
+            select(RelMediaFileTag.file_id, MediaTag.name)
+            .join(MediaTag, MediaTag.id == RelMediaFileTag.tag_id)
+            .where(RelMediaFileTag.file_id.in_(file_ids))
         )
         for fid2, name in pairs:
             tag_map.setdefault(fid2, []).append(name)
@@ -424,7 +919,8 @@ def list_files(
         }
         for r in rows
     ]
-    return {"items": items, "total": total}
+    return {"items": items, "total": p["total"],
+            "total_capped": p["total_capped"], "next_cursor": p["next_cursor"]}
 
 
 @router.delete("/{fid}", dependencies=[Depends(require_perm("media:delete"))])
@@ -469,12 +965,13 @@ def hard_delete(
         upload_root = get_upload_root(db)
         abs_path = os.path.join(upload_root, f.path)
         try:
+            media_derivative.remove_all(abs_path)
             if os.path.exists(abs_path):
                 os.remove(abs_path)
                 record_audit(db, fid, "delete_physical", get_actor_id(user))
         except Exception as e:
             # 物理文件删除失败记录日志，但继续删除数据库记录
-            print(f"删除物理文件失败 {abs_path}: {e}")
+            logger.warning("删除物理文件失败 %s: %s", abs_path, e)
     
     # 删除文件标签关联
     db.query(RelMediaFileTag).filter(RelMediaFileTag.file_id == fid).delete()
@@ -600,15 +1097,17 @@ def _decode_user_from_token(token: Optional[str]) -> Optional[int]:
 def preview(
     sha256: str,
     request: Request,
-    range_header: Optional[str] = Header(None, alias="Range"),
+    w: Optional[int] = Query(None, ge=1, le=4096, description="缩略图宽度；图片返回缩略图，视频返回首帧封面"),
     db: Session = Depends(get_db),
 ):
     """
     预览文件（inline）。特性：
     - 使用 SHA256 防止 ID 遍历攻击（SHA256 已足够安全，无需额外签名验证）
     - 支持视频/音频 Range 分段
-    - 强缓存/协商缓存：ETag / Last-Modified / If-None-Match / If-Modified-Since
+    - 强缓存/协商缓存：强 ETag（sha256）/ Last-Modified / If-None-Match / If-Modified-Since
     - 适合公开分享，简单易用
+    - 带 w 参数时返回缩略图（宽度向上取整到 media_thumb_sizes 档位，按 Accept 选择 WebP/JPEG），
+      首次访问在进程池中生成并落盘，之后直接命中
     """
     f = db.query(MediaFile).filter(
         MediaFile.sha256 == sha256,
@@ -622,23 +1121,6 @@ def preview(
     if not os.path.exists(abs_path):
         raise HTTPException(404, "物理文件不存在")
 
-    stat = os.stat(abs_path)
-    last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
-    etag = f'W/"{f.sha256[:16]}-{stat.st_size}"'
-    mime = f.mime or "application/octet-stream"
-
-    # 缓存命中
-    inm = request.headers.get("If-None-Match")
-    ims = request.headers.get("If-Modified-Since")
-    last_mod_str = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
-    if (inm and inm == etag) or (ims and ims == last_mod_str):
-        return Response(status_code=304, headers={
-            "ETag": etag,
-            "Last-Modified": last_mod_str,
-            "Cache-Control": "public, max-age=31536000, immutable",
-        })
-
-    file_size = stat.st_size
     # 对包含非ASCII字符的文件名进行编码
     ascii_filename = f.filename.encode('ascii', 'ignore').decode('ascii')
     if ascii_filename != f.filename:
@@ -648,46 +1130,27 @@ def preview(
     else:
         # 纯ASCII文件名
         content_disposition = f'inline; filename="{f.filename}"'
-    
-    headers = {
-        "Accept-Ranges": "bytes",
-        "ETag": etag,
-        "Last-Modified": last_mod_str,
-        "Cache-Control": "public, max-age=31536000, immutable",
-        "Content-Disposition": content_disposition,
-    }
-
-    # Range
-    if range_header and range_header.startswith("bytes="):
-        rng = range_header.replace("bytes=", "")
-        try:
-            start_s, end_s = rng.split("-", 1)
-            start = int(start_s) if start_s else 0
-            end = int(end_s) if end_s else file_size - 1
-            end = min(end, file_size - 1)
-            if start > end:
-                raise ValueError()
-        except Exception:
-            raise HTTPException(416, "Range 无效")
-
-        def _file_iter(s: int, e: int, chunk: int = 1024 * 256):
-            with open(abs_path, "rb") as fp:
-                fp.seek(s)
-                remain = e - s + 1
-                while remain > 0:
-                    data = fp.read(min(chunk, remain))
-                    if not data:
-                        break
-                    remain -= len(data)
-                    yield data
-
-        headers.update({
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Content-Length": str(end - start + 1),
-        })
-        return StreamingResponse(_file_iter(start, end), status_code=206, media_type=mime, headers=headers)
-
-    # 非 Range：整体文件
-    headers["Content-Length"] = str(file_size)
-    return FileResponse(abs_path, media_type=mime, filename=f.filename, headers=headers)
 
+    if w:
+        width = pick_size(w, typed_config(db).media_thumb_size_list)
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        thumb_path = media_derivative.ensure(abs_path, f.mime, width, fmt)
+        if thumb_path:
+            return conditional_file_response(
+                request.headers,
+                thumb_path,
+                media_type=FORMAT_MIME[fmt],
+                digest=f"{f.sha256}.w{width}.{fmt}",
+                headers={"Content-Disposition": content_disposition, "Vary": "Accept"},
+            )
+        # 不支持生成缩略图的类型、缺少 ffmpeg 或生成失败时退回原文件
+
+    # 内容按 sha256 寻址且不可变：强 ETag + immutable；304 不读文件；
+    # 全量按大块发送（服务器支持 pathsend 时交给服务器），Range（视频/音频拖动）由 FileResponse 处理 206
+    return conditional_file_response(
+        request.headers,
+        abs_path,
+        media_type=f.mime or "application/octet-stream",
+        digest=f.sha256,
+        headers={"Content-Disposition": content_disposition},
+    )
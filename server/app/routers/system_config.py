@@ -3,13 +3,14 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from typing import List, Optional, Any
 from pydantic import BaseModel
 import json
 
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db
 from app.core.deps import require_perm, get_current_user
 from app.core.config_loader import refresh_config_cache
 from app.models.config import SysConfig
@@ -100,9 +101,9 @@ def list_configs(
 
 
 @router.get("/public")
-def list_public_configs(db: Session = Depends(get_db)):
+async def list_public_configs(db: AsyncSession = Depends(get_async_db)):
     """获取公开配置（前端可用，无需权限）"""
-    rows = db.query(SysConfig).filter(SysConfig.is_public == 1).all()
+    rows = (await db.scalars(select(SysConfig).where(SysConfig.is_public == 1))).all()
     result = {}
     for r in rows:
         result[r.key] = r.value
@@ -110,13 +111,13 @@ def list_public_configs(db: Session = Depends(get_db)):
 
 
 @router.get("/{key}")
-def get_config_by_key(
+async def get_config_by_key(
     key: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: Any = Depends(get_current_user)
 ):
     """根据key获取单个配置值"""
-    cfg = db.query(SysConfig).filter(SysConfig.key == key).first()
+    cfg = await db.scalar(select(SysConfig).where(SysConfig.key == key).limit(1))
     if not cfg:
         raise HTTPException(404, "配置不存在")
     return {"key": cfg.key, "value": cfg.value}
@@ -148,6 +149,7 @@ def create_config(
     db.add(cfg)
     db.commit()
     db.refresh(cfg)
+    refresh_config_cache()
     return {"id": cfg.id}
 
 
@@ -202,6 +204,7 @@ def delete_config(
         raise HTTPException(404, "配置不存在")
     db.delete(cfg)
     db.commit()
+    refresh_config_cache()
     return {"ok": True}
 
 
@@ -3,12 +3,13 @@
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 from pydantic import BaseModel
 from typing import List, Optional
 
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db
 from app.core.deps import require_perm
 
 router = APIRouter(prefix="/api/admin/system/dict", tags=["dict"])
@@ -217,15 +218,15 @@ def list_dict_data(
 
 
 @router.get("/data/by-code/{type_code}")
-def get_dict_by_code(type_code: str, db: Session = Depends(get_db)):
+async def get_dict_by_code(type_code: str, db: AsyncSession = Depends(get_async_db)):
     """根据字典类型编码获取所有启用的字典数据（不分页，供前端下拉框使用）"""
     from app.models.dict import DictData
     
-    items = db.scalars(
+    items = (await db.scalars(
         select(DictData)
         .where(DictData.type_code == type_code, DictData.status == 1)
         .order_by(DictData.sort.asc(), DictData.id.asc())
-    ).all()
+    )).all()
     
     return [DictDataOut.model_validate(item, from_attributes=True) for item in items]
 
@@ -37,7 +37,7 @@ def get_version_info(user=Depends(get_current_user), db: Session = Depends(get_d
     }
 
 @router.get("/check-update")
-async def check_for_updates(user=Depends(get_current_user), db: Session = Depends(get_db)):
+async def check_for_updates(user=Depends(get_current_user)):
     """检查系统更新 - 请求远程接口检测是否有版本升级"""
     try:
         async with httpx.AsyncClient() as client:
@@ -66,4 +66,41 @@ async def check_for_updates(user=Depends(get_current_user), db: Session = Depend
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=f"网络请求错误: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"检查更新时发生错误: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"检查更新时发生错误: {str(e)}")
+
+@router.get("/metrics")
+def get_runtime_metrics(user=Depends(get_current_user)):
+    """获取运行时指标（连接池占用、审计日志队列深度、批量写入耗时、缩略图生成、文档转换等）"""
+    from app.core.audit_writer import audit_writer
+    from app.core.config_loader import config_stats
+    from app.core.config_registry import typed_config_stats
+    from app.core.db import pool_stats
+    from app.core.password_hasher import password_hasher
+    from app.core.perm_registry import perm_registry
+    from app.core.rate_limit import rate_limiter
+    from app.core.scheduler import scheduler_leader
+    from app.core.token_cache import token_cache
+    from app.services.user_acl import user_acl
+    from app.services.media_derivative import media_derivative
+    from app.services.convert_cache import convert_cache
+    from app.services.convert_engine import convert_engine
+    from app.services.soffice_pool import soffice_pool
+    return {
+        "code": 200,
+        "data": {
+            "db_pool": pool_stats(),
+            "config": config_stats(),
+            "typed_config": typed_config_stats(),
+            "scheduler": scheduler_leader.stats(),
+            "audit_writer": audit_writer.stats(),
+            "token_cache": token_cache.stats(),
+            "perm_registry": perm_registry.stats(),
+            "user_acl": user_acl.stats(),
+            "password_hasher": password_hasher.stats(),
+            "rate_limiter": rate_limiter.stats(),
+            "media_derivative": media_derivative.stats(),
+            "convert_engine": convert_engine.stats(),
+            "convert_cache": convert_cache.stats(),
+            "soffice_pool": soffice_pool.stats(),
+        }
+    }
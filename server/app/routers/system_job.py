@@ -9,15 +9,17 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
-from app.core.db import get_db
+from app.core.db import get_db, get_read_db
 from app.core.deps import require_perm
+from app.utils.pagination import paginate, COUNT_PATTERN
 from app.core.scheduler import (
     add_job_to_scheduler,
     remove_job_from_scheduler,
     pause_job,
     resume_job,
     run_job_now,
-    get_scheduler
+    get_running_scheduler,
+    EXECUTORS
 )
 
 router = APIRouter(prefix="/api/admin/system/job", tags=["job"])
@@ -35,6 +37,10 @@ class JobCreate(BaseModel):
     cron_expression: str | None = None
     interval_seconds: int | None = None
     run_date: datetime | None = None
+    executor: str = 'thread'  # thread/process/asyncio
+    max_instances: int = 1
+    coalesce: int = 1
+    misfire_grace_time: int | None = None
     status: int = 1
     description: str | None = None
     remark: str | None = None
@@ -48,6 +54,10 @@ class JobUpdate(BaseModel):
     cron_expression: str | None = None
     interval_seconds: int | None = None
     run_date: datetime | None = None
+    executor: str | None = None
+    max_instances: int | None = None
+    coalesce: int | None = None
+    misfire_grace_time: int | None = None
     status: int | None = None
     description: str | None = None
     remark: str | None = None
@@ -64,6 +74,10 @@ class JobOut(BaseModel):
     cron_expression: str | None = None
     interval_seconds: int | None = None
     run_date: datetime | None = None
+    executor: str
+    max_instances: int
+    coalesce: int
+    misfire_grace_time: int | None = None
     status: int
     description: str | None = None
     remark: str | None = None
@@ -91,6 +105,16 @@ class JobLogOut(BaseModel):
 
 # ====================== 任务管理接口 ======================
 
+def _check_exec_options(executor: str | None, max_instances: int | None, misfire_grace_time: int | None):
+    """校验执行器与并发配置（None 表示未修改）"""
+    if executor is not None and executor not in EXECUTORS:
+        raise HTTPException(400, f"执行器只能是 {'/'.join(EXECUTORS)}")
+    if max_instances is not None and max_instances < 1:
+        raise HTTPException(400, "最大并发实例数不能小于1")
+    if misfire_grace_time is not None and misfire_grace_time < 1:
+        raise HTTPException(400, "错过执行宽限时间不能小于1秒")
+
+
 @router.get("/list", dependencies=[Depends(require_perm("job:list"))])
 def list_jobs(
     page: int = Query(1, ge=1),
@@ -122,12 +146,13 @@ def list_jobs(
     # 分页
     items = db.scalars(query.offset((page - 1) * size).limit(size)).all()
     
-    # 更新调度器中的next_run_time
-    scheduler = get_scheduler()
-    for item in items:
-        ap_job = scheduler.get_job(item.job_id)
-        if ap_job and ap_job.next_run_time:
-            item.next_run_time = ap_job.next_run_time
+    # 主节点用调度器中的 next_run_time；其他进程直接使用任务表（主节点每次触发后回写）
+    scheduler = get_running_scheduler()
+    if scheduler is not None:
+        for item in items:
+            ap_job = scheduler.get_job(item.job_id)
+            if ap_job and ap_job.next_run_time:
+                item.next_run_time = ap_job.next_run_time
     
     return {
         "items": [JobOut.model_validate(item, from_attributes=True) for item in items],
@@ -154,6 +179,7 @@ def create_job(body: JobCreate, db: Session = Depends(get_db)):
         raise HTTPException(400, "interval类型任务必须提供间隔秒数")
     elif body.job_type == 'date' and not body.run_date:
         raise HTTPException(400, "date类型任务必须提供执行时间")
+    _check_exec_options(body.executor, body.max_instances, body.misfire_grace_time)
     
     job = Job(**body.model_dump())
     db.add(job)
@@ -179,6 +205,8 @@ def update_job(job_id: int, body: JobUpdate, db: Session = Depends(get_db)):
     if not job:
         raise HTTPException(404, "任务不存在")
     
+    _check_exec_options(body.executor, body.max_instances, body.misfire_grace_time)
+    
     # 更新字段
     for k, v in body.model_dump(exclude_unset=True).items():
         setattr(job, k, v)
@@ -280,7 +308,9 @@ def list_job_logs(
     size: int = Query(50, ge=1, le=200),
     job_id: str | None = None,
     status: int | None = None,
-    db: Session = Depends(get_db)
+    cursor: str | None = Query(None, description="游标分页：上一页返回的 next_cursor"),
+    count: str = Query("exact", pattern=COUNT_PATTERN, description="计数方式：exact/capped/none"),
+    db: Session = Depends(get_read_db)
 ):
     """获取任务执行日志（分页）"""
     from app.models.job import JobLog
@@ -293,18 +323,14 @@ def list_job_logs(
     if status is not None:
         query = query.where(JobLog.status == status)
     
-    # 排序
-    query = query.order_by(desc(JobLog.id))
-    
-    # 总数
-    total = db.scalar(select(func.count()).select_from(query.subquery()))
-    
-    # 分页
-    items = db.scalars(query.offset((page - 1) * size).limit(size)).all()
+    # 排序 + 分页（按 id 倒序，支持游标）
+    p = paginate(db, query, order_cols=(JobLog.id,), page=page, size=size, cursor=cursor, count=count)
     
     return {
-        "items": [JobLogOut.model_validate(item, from_attributes=True) for item in items],
-        "total": total,
+        "items": [JobLogOut.model_validate(item, from_attributes=True) for item in p["rows"]],
+        "total": p["total"],
+        "total_capped": p["total_capped"],
+        "next_cursor": p["next_cursor"],
         "page": page,
         "size": size
     }
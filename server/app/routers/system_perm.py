@@ -8,6 +8,8 @@ from typing import Optional
 from pydantic import BaseModel
 from app.core.db import get_db
 from app.core.deps import require_perm
+from app.core.perm_registry import perm_registry
+from app.services.user_acl import user_acl
 from app.models.rbac import Permission
 
 router = APIRouter(prefix="/api/admin/system/perms", tags=["admin-system-perms"])
@@ -52,10 +54,16 @@ def update_perm(pid: int, body: PermIn, db: Session = Depends(get_db)):
     p = db.get(Permission, pid)
     if not p: raise HTTPException(404, "权限不存在")
     for k, v in body.dict().items(): setattr(p, k, v)
-    db.commit(); return {"ok": True}
+    db.commit()
+    perm_registry.invalidate()
+    user_acl.invalidate()
+    return {"ok": True}
 
 @router.delete("/{pid}", dependencies=[Depends(require_perm("central-auth-org-catalog:view"))])
 def delete_perm(pid: int, db: Session = Depends(get_db)):
     p = db.get(Permission, pid)
     if not p: raise HTTPException(404, "权限不存在")
-    db.delete(p); db.commit(); return {"ok": True}
+    db.delete(p); db.commit()
+    perm_registry.invalidate()
+    user_acl.invalidate()
+    return {"ok": True}
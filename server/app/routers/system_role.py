@@ -8,6 +8,8 @@ from typing import List, Optional
 from pydantic import BaseModel
 from app.core.db import get_db
 from app.core.deps import require_perm
+from app.core.perm_registry import perm_registry
+from app.services.user_acl import user_acl
 from app.models.rbac import Role, Permission, RolePerm
 
 router = APIRouter(prefix="/api/admin/system/roles", tags=["admin-system-roles"])
@@ -34,14 +36,21 @@ def update_role(rid: int, body: RoleIn, db: Session = Depends(get_db)):
     r = db.get(Role, rid)
     if not r: raise HTTPException(404, "角色不存在")
     r.name = body.name; r.sort = body.sort
-    db.commit(); return {"ok": True}
+    db.commit()
+    # 角色信息进入用户 ACL / 权限注册表缓存，与角色授权一样整体失效
+    perm_registry.invalidate()
+    user_acl.invalidate()
+    return {"ok": True}
 
 @router.delete("/{rid}", dependencies=[Depends(require_perm("central-auth-org-role:view"))])
 def delete_role(rid: int, db: Session = Depends(get_db)):
     r = db.get(Role, rid)
     if not r: raise HTTPException(404, "角色不存在")
     db.query(RolePerm).filter(RolePerm.role_id==rid).delete()
-    db.delete(r); db.commit(); return {"ok": True}
+    db.delete(r); db.commit()
+    perm_registry.invalidate()
+    user_acl.invalidate()
+    return {"ok": True}
 
 @router.get("/{rid}/perms", dependencies=[Depends(require_perm("central-auth-org-role:view"))])
 def get_role_perms(rid: int, db: Session = Depends(get_db)):
@@ -63,5 +72,8 @@ def bind_role_perms(rid: int, body: BindPermsIn, db: Session = Depends(get_db)):
     db.query(RolePerm).filter(RolePerm.role_id==rid).delete()
     for pid in set(body.perm_ids or []):
         db.add(RolePerm(role_id=rid, perm_id=pid))
-    db.commit(); return {"ok": True}
+    db.commit()
+    perm_registry.invalidate()
+    user_acl.invalidate()
+    return {"ok": True}
 
@@ -2,7 +2,7 @@
 # 版权所有：厦门市知序技术服务工作室
 # 网站: www.sslphp.com, www.foadmin.com
 # BUG反馈邮箱: 1032904660@qq.com
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional, Tuple
@@ -14,6 +14,8 @@ from app.models.user import User
 from app.models.rbac import Role, UserRole
 from app.models.dept import SysDept
 from app.models.level import SysLevel
+from app.utils.pagination import paginate, COUNT_PATTERN
+from app.services.user_acl import user_acl
 
 router = APIRouter(prefix="/api/admin/system/users", tags=["admin-system-users"])
 
@@ -109,6 +111,8 @@ def list_users(
     kw: Optional[str] = None,
     page: int = 1,
     size: int = 10,
+    cursor: Optional[str] = None,
+    count: str = Query("exact", pattern=COUNT_PATTERN),
     dept_id: Optional[int] = None,
     include_child: int = 1,  # 1=包含子级, 0=仅本级
     level_id: Optional[int] = None,
@@ -140,12 +144,14 @@ def list_users(
         else:
             q = q.filter(User.dept_id == dept_id)
 
-    total = q.count()
-    rows: List[Tuple[User, Optional[SysDept], Optional[SysLevel]]] = (
-        q.order_by(User.id.desc()).offset((page - 1) * size).limit(size).all()
+    p = paginate(
+        db, q, order_cols=(User.id,), page=page, size=size, cursor=cursor, count=count,
+        row_key=lambda row: [row[0].id],
     )
+    rows: List[Tuple[User, Optional[SysDept], Optional[SysLevel]]] = p["rows"]
     items = [pack_user(u, d, l) for (u, d, l) in rows]
-    return {"items": items, "total": total}
+    return {"items": items, "total": p["total"],
+            "total_capped": p["total_capped"], "next_cursor": p["next_cursor"]}
 
 
 @router.post("", dependencies=[Depends(require_perm("central-auth-org-user:view"))])
@@ -226,6 +232,7 @@ def delete_user(uid: int, db: Session = Depends(get_db)):
     db.query(UserRole).filter(UserRole.user_id == uid).delete()
     db.delete(u)
     db.commit()
+    user_acl.invalidate(uid)
     return {"ok": True}
 
 
@@ -247,4 +254,5 @@ def bind_user_roles(uid: int, body: BindRolesIn, db: Session = Depends(get_db)):
     for rid in set(body.role_ids or []):
         db.add(UserRole(user_id=uid, role_id=rid))
     db.commit()
+    user_acl.invalidate(uid)
     return {"ok": True}
@@ -19,7 +19,9 @@ class LoginLogOut(BaseModel):
 
 class PageOut(BaseModel):
     items: List[LoginLogOut]
-    total: int
+    total: Optional[int] = None          # 游标翻页时为 None（不再计数）
+    total_capped: bool = False           # True 表示实际数量超过 total（显示为 “total+”）
+    next_cursor: Optional[str] = None
 
 class DetailOut(BaseModel):
     data: LoginLogOut
@@ -44,3 +44,25 @@ class MediaFileItem(BaseModel):
 class MediaListResp(BaseModel):
     items: List[MediaFileItem]
     total: int
+
+# ---------- 分片上传 ----------
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None        # 可选，合并后校验
+    mime: Optional[str] = None
+    chunk_size: Optional[int] = None    # 缺省 8MB，服务端会限制在 256KB ~ 64MB
+    dir_id: Optional[int] = None
+    remark: Optional[str] = None
+    tags: List[str] = []
+
+# ---------- 秒传 ----------
+class InstantUploadItem(BaseModel):
+    sha256: str
+    size: int
+    filename: str
+    dir_id: Optional[int] = None
+    remark: Optional[str] = None
+
+class InstantUploadBatch(BaseModel):
+    items: List[InstantUploadItem]
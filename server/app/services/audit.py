@@ -50,7 +50,7 @@ def audited(action: str, resource_type: str, level: str = "BUSINESS"):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             from fastapi import Request
-            from app.core.db import SessionLocal
+            from app.core.db import session_scope
             # 透传 request（FastAPI 约定：通常叫 request）
             request: Request = None
             for a in args:
@@ -94,17 +94,11 @@ def audited(action: str, resource_type: str, level: str = "BUSINESS"):
                 if (not actor_roles) and request:
                     actor_id = getattr(request.state, "user_id", None)
                     if actor_id:
-                        with SessionLocal() as _db:
+                        # 令牌不带角色时回退到用户角色缓存（见 app/services/user_acl.py）
+                        from app.services.user_acl import user_acl
+                        with session_scope() as _db:
                             try:
-                                rows = _db.execute(
-                                    text("""
-                                    SELECT r.code FROM foadmin_sys_role r
-                                    JOIN foadmin_rel_user_role ur ON r.id = ur.role_id
-                                    WHERE ur.user_id = :uid AND r.status = 1
-                                    """),
-                                    {"uid": int(actor_id)}
-                                ).mappings().all()
-                                actor_roles = [row["code"] for row in rows]
+                                actor_roles = user_acl.get(_db, int(actor_id)).active_roles
                             except Exception:
                                 actor_roles = None
 
@@ -119,8 +113,9 @@ def audited(action: str, resource_type: str, level: str = "BUSINESS"):
                         resource_id = str(path_params[k])
                         break   
                 # 持久化
-                db = SessionLocal()
-                try:
+                with session_scope() as db:
+                    # 共享会话里业务未提交的改动一律丢弃，与原来关闭会话的效果一致
+                    db.rollback()
                     write_audit(
                         db,
                         trace_id=trace_id, level=level, status=status,
@@ -130,7 +125,5 @@ def audited(action: str, resource_type: str, level: str = "BUSINESS"):
                         ip=ip, user_agent=ua, method=method, path=path,
                         http_status=http_status, latency_ms=latency_ms, message=message
                     )
-                finally:
-                    db.close()
         return wrapper
     return deco
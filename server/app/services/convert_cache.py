@@ -0,0 +1,183 @@
+# app/services/convert_cache.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+文档转换缓存（foadmin_media_convert_cache）
+
+- 唯一键 (kind, src_sha256, params, page)：
+  * params 为影响输出的渲染参数（pdf/pptx："dpi=144"；docx："inline=1"，soffice 回退时图片地址随 inline 变化）
+  * page=0 为整份文档（或懒转换清单）记录，page=N 为第 N 页的图片记录
+- 容量与 LRU：每条记录记下占用字节数（HTML + 衍生图片 + 懒转换保留的源 PDF）、命中次数、最后访问时间，
+  由定时任务 app.tasks.convert.evict_convert_cache 按总字节数 / 闲置时间淘汰
+- 防击穿：同一进程内同一键的并发转换只执行一次（single-flight），其余请求等待并共享结果；
+  多进程部署时依靠唯一键兜底（并发写入时后写者更新已有记录）
+
+用法:
+    rec = convert_cache.get(db, "pdf", sha, cache_params("pdf", dpi=144))          # 命中时自动记一次访问
+    convert_cache.save(db, "pdf", sha, params, file_ids=ids, pages=n, size=total_bytes)
+    result = await convert_cache.single_flight(("pdf", sha, params), lambda: do_convert())
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.media import MediaConvertCache
+
+DOCUMENT = 0  # page=0：整份文档记录
+
+
+def cache_params(kind: str, *, dpi: Optional[int] = None, inline: Optional[int] = None) -> str:
+    """生成缓存键中的参数部分（只包含会影响缓存内容的参数）"""
+    if kind == "docx":
+        return f"inline={1 if inline else 0}"
+    return f"dpi={int(dpi or 144)}"
+
+
+def parse_ids(file_ids: Optional[str]) -> List[int]:
+    return [int(x) for x in (file_ids or "").split(",") if x.strip()]
+
+
+class ConvertCache:
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    # ---------- 读取 ----------
+    def get(self, db: Session, kind: str, sha: str, params: str, page: int = DOCUMENT,
+            touch: bool = True) -> Optional[MediaConvertCache]:
+        rec = db.query(MediaConvertCache).filter(
+            MediaConvertCache.kind == kind, MediaConvertCache.src_sha256 == sha,
+            MediaConvertCache.params == params, MediaConvertCache.page == page,
+        ).first()
+        if touch:
+            self._count(hit=rec is not None)
+            if rec is not None:
+                self.touch(db, [rec.id])
+        return rec
+
+    def get_pages(self, db: Session, kind: str, sha: str, params: str) -> Dict[int, MediaConvertCache]:
+        """某文档全部按页记录（一次查询）：page -> 记录"""
+        return {
+            r.page: r for r in db.query(MediaConvertCache).filter(
+                MediaConvertCache.kind == kind, MediaConvertCache.src_sha256 == sha,
+                MediaConvertCache.params == params, MediaConvertCache.page > DOCUMENT,
+            )
+        }
+
+    @staticmethod
+    def touch(db: Session, ids: Iterable[int]) -> None:
+        """记一次访问：命中次数 +1、刷新最后访问时间（单条 UPDATE，不加载对象）"""
+        ids = list(ids)
+        if not ids:
+            return
+        db.execute(
+            update(MediaConvertCache)
+            .where(MediaConvertCache.id.in_(ids))
+            .values(hit_count=MediaConvertCache.hit_count + 1, last_access_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    # ---------- 写入 ----------
+    def save(self, db: Session, kind: str, sha: str, params: str, *, html: Optional[str] = None,
+             file_ids: Optional[List[int]] = None, pages: Optional[int] = None, size: int = 0,
+             page: int = DOCUMENT, created_by: Optional[int] = None) -> MediaConvertCache:
+        """按唯一键写入（存在则更新）；并发插入撞唯一键时回滚后改为更新"""
+        values = dict(
+            html=html,
+            file_ids=",".join(map(str, file_ids)) if file_ids else None,
+            pages=pages,
+            size=size,
+            last_access_at=datetime.utcnow(),
+        )
+        if created_by is not None:
+            values["created_by"] = created_by
+        for attempt in range(2):
+            rec = self.get(db, kind, sha, params, page, touch=False)
+            if rec is None:
+                rec = MediaConvertCache(kind=kind, src_sha256=sha, params=params, page=page, hit_count=0)
+                db.add(rec)
+            for k, v in values.items():
+                setattr(rec, k, v)
+            try:
+                db.commit()
+                return rec
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+        return rec
+
+    def save_pages(self, db: Session, kind: str, sha: str, params: str,
+                   pages: Dict[int, Tuple[int, int]]) -> None:
+        """批量写入按页记录：page -> (file_id, size)，一次提交"""
+        now = datetime.utcnow()
+        for attempt in range(2):
+            existing = self.get_pages(db, kind, sha, params)
+            for page, (fid, size) in pages.items():
+                rec = existing.get(page)
+                if rec is None:
+                    rec = MediaConvertCache(kind=kind, src_sha256=sha, params=params, page=page, pages=1, hit_count=0)
+                    db.add(rec)
+                rec.file_ids, rec.size, rec.last_access_at = str(fid), size, now
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+
+    # ---------- 防击穿 ----------
+    async def single_flight(self, key: Any, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """同一 key 的并发调用只执行一次 factory，其余调用等待并共享结果（或异常）"""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            with self._lock:
+                self._coalesced += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await factory()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e if isinstance(e, Exception) else RuntimeError("转换已取消"))
+            fut.exception()  # 没有等待者时避免 “exception was never retrieved” 警告
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # ---------- 指标 ----------
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else None,
+                "coalesced": self._coalesced,
+                "inflight": len(self._inflight),
+            }
+
+
+convert_cache = ConvertCache()
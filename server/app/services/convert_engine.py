@@ -0,0 +1,260 @@
+# app/services/convert_engine.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+PDF 栅格化引擎（PDF / PPTX 导入使用）
+
+- 按页段（默认每段 4 页）拆分，提交到独立的进程池并行渲染，不阻塞事件循环
+- 子进程直接把 PNG 写到内容寻址路径（{sha256前16位}.png），只回传元数据，避免大块图片跨进程拷贝
+- 结果按完成顺序以异步迭代器逐段返回
+- 限流：
+  * CONVERT_MAX_JOBS：同时进行的转换任务数，超出的排队，排队超过 CONVERT_QUEUE_TIMEOUT 秒返回 503（0 表示一直等待）
+  * 单个任务同时在途的页段数不超过进程数，按段逐步提交，多个任务在进程池队列中交替执行
+  * CONVERT_JOB_TIMEOUT：单个任务总超时，超时后取消未开始的页段并返回 504
+
+用法:
+    from app.services.convert_engine import convert_engine
+    async with convert_engine.job() as job:
+        async for pages in job.rasterize(pdf_path, dpi, abs_dir):
+            ...   # pages: List[PageResult]，同一段内按页码有序
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.utils.fs import mkstemp_public
+
+logger = logging.getLogger(__name__)
+
+
+class PageResult(NamedTuple):
+    index: int          # 页码（从 0 开始）
+    path: str           # 图片绝对路径
+    sha256: str
+    size: int
+    width: int
+    height: int
+    created: bool       # 本次新写入（False 表示同内容文件已存在）
+
+
+# ---------------- 进程池内执行的函数 ----------------
+
+def page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def _render_range(pdf_path: str, start: int, end: int, dpi: int, out_dir: str) -> List[PageResult]:
+    """渲染 [start, end) 页为 PNG，写入 out_dir/{sha256前16位}.png"""
+    import fitz  # PyMuPDF
+
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
+    results: List[PageResult] = []
+    with fitz.open(pdf_path) as doc:
+        for i in range(start, end):
+            pix = doc.load_page(i).get_pixmap(matrix=mat, alpha=False)
+            buf = pix.tobytes("png")
+            sha = hashlib.sha256(buf).hexdigest()
+            dst = os.path.join(out_dir, f"{sha[:16]}.png")
+            created = False
+            if not os.path.exists(dst):
+                fd, tmp = mkstemp_public(prefix=".page-", suffix=".png", dir=out_dir)
+                with os.fdopen(fd, "wb") as fp:
+                    fp.write(buf)
+                os.replace(tmp, dst)
+                created = True
+            results.append(PageResult(i, dst, sha, len(buf), pix.width, pix.height, created))
+    return results
+
+
+# ---------------- 调度 ----------------
+
+def _split_ranges(indexes: Iterable[int], step: int) -> List[Tuple[int, int]]:
+    """把有序页码拆成 [start, end) 段：连续页合并，每段最多 step 页"""
+    ranges: List[Tuple[int, int]] = []
+    for i in indexes:
+        if ranges and ranges[-1][1] == i and i - ranges[-1][0] < step:
+            ranges[-1] = (ranges[-1][0], i + 1)
+        else:
+            ranges.append((i, i + 1))
+    return ranges
+
+
+class ConvertJob:
+    """单个转换任务：限制在途页段数，并受总超时约束"""
+
+    def __init__(self, engine: "ConvertEngine", deadline: float):
+        self.engine = engine
+        self.deadline = deadline
+
+    def _remaining(self) -> float:
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        return remaining
+
+    async def page_count(self, pdf_path: str) -> int:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.engine.pool(), page_count, pdf_path), self._remaining()
+        )
+
+    async def rasterize(
+        self, pdf_path: str, dpi: int, out_dir: str, pages: Optional[int] = None,
+        only: Optional[Iterable[int]] = None,
+    ) -> AsyncIterator[List[PageResult]]:
+        """
+        按完成顺序逐段产出渲染结果
+
+        Args:
+            pages: 总页数（已知时传入，省去一次打开文件）
+            only: 只渲染这些页（从 0 开始），连续的页合并为同一段
+        """
+        loop = asyncio.get_running_loop()
+        total = pages if pages is not None else await self.page_count(pdf_path)
+        indexes = sorted({i for i in only if 0 <= i < total}) if only is not None else range(total)
+        ranges = _split_ranges(indexes, self.engine.range_pages)
+        pending = set()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < self.engine.job_parallelism:
+                    s, e = ranges.pop(0)
+                    pending.add(loop.run_in_executor(self.engine.pool(), _render_range, pdf_path, s, e, dpi, out_dir))
+                done, pending = await asyncio.wait(
+                    pending, timeout=self._remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for fut in done:
+                    result = fut.result()
+                    self.engine._count_pages(len(result))
+                    yield result
+        finally:
+            # 超时或调用方中止：取消尚未开始的页段（已在子进程中运行的会自然结束）
+            for fut in pending:
+                fut.cancel()
+
+
+class ConvertEngine:
+    def __init__(
+        self,
+        workers: int = 2,
+        max_jobs: int = 2,
+        job_timeout: int = 300,
+        queue_timeout: int = 30,
+        range_pages: int = 4,
+    ):
+        self.workers = max(1, int(workers))
+        self.max_jobs = max(1, int(max_jobs))
+        self.job_timeout = max(1, int(job_timeout))
+        self.queue_timeout = max(0, int(queue_timeout))
+        self.range_pages = max(1, int(range_pages))
+        self.job_parallelism = self.workers
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._pages = 0
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn：子进程不继承父进程的线程与数据库连接
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _count_pages(self, n: int) -> None:
+        with self._lock:
+            self._pages += n
+
+    @asynccontextmanager
+    async def job(self):
+        """
+        占用一个转换名额并返回 ConvertJob
+        - 排队超时：503
+        - 任务超时：504
+        """
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_jobs)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise HTTPException(503, "转换任务繁忙，请稍后重试")
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield ConvertJob(self, time.monotonic() + self.job_timeout)
+            self._completed += 1
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise HTTPException(504, f"转换超时（超过 {self.job_timeout} 秒）")
+        except BrokenProcessPool:
+            # 子进程崩溃（如内存不足被杀）：丢弃进程池，下次重建
+            self._failed += 1
+            with self._lock:
+                self._pool = None
+            raise HTTPException(500, "转换进程异常退出")
+        except BaseException:
+            self._failed += 1
+            raise
+        finally:
+            self._active -= 1
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_jobs": self.max_jobs,
+            "job_parallelism": self.job_parallelism,
+            "active_jobs": self._active,
+            "waiting_jobs": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+            "pages": self._pages,
+        }
+
+
+# 全局实例（进程池按需创建，main.on_shutdown 关闭）
+convert_engine = ConvertEngine(
+    workers=settings.CONVERT_WORKERS,
+    max_jobs=settings.CONVERT_MAX_JOBS,
+    job_timeout=settings.CONVERT_JOB_TIMEOUT,
+    queue_timeout=settings.CONVERT_QUEUE_TIMEOUT,
+    range_pages=settings.CONVERT_RANGE_PAGES,
+)
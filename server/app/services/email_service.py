@@ -26,14 +26,12 @@ import logging
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
-from app.core.config_loader import get_config
+from app.core.config_registry import typed_config
+from app.core.rate_limit import rate_limiter
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 邮件发送限流缓存 {email: (count, start_time)}
-# 用于防止邮件滥用
-EMAIL_RATE_LIMIT: Dict[str, tuple[int, float]] = {}
 
 
 class EmailServiceException(Exception):
@@ -57,14 +55,15 @@ class EmailService:
     def _load_config(self):
         """从系统配置加载SMTP设置"""
         try:
-            self.smtp_host = get_config('smtp_host', 'string', '', self.db)
-            self.smtp_port = int(get_config('smtp_port', 'number', 465, self.db) or 465)
-            self.smtp_user = get_config('smtp_user', 'string', '', self.db)
-            self.smtp_password = get_config('smtp_password', 'string', '', self.db)
-            self.smtp_from = get_config('smtp_from', 'string', '', self.db)
-            self.smtp_ssl = get_config('smtp_ssl', 'boolean', True, self.db)
+            cfg = typed_config(self.db)
+            self.smtp_host = cfg.smtp_host
+            self.smtp_port = cfg.smtp_port
+            self.smtp_user = cfg.smtp_user
+            self.smtp_password = cfg.smtp_password
+            self.smtp_from = cfg.smtp_from
+            self.smtp_ssl = cfg.smtp_ssl
             # 新增：SSL证书验证配置（默认不验证，避免 Windows 环境证书问题）
-            self.smtp_ssl_verify = get_config('smtp_ssl_verify', 'boolean', False, self.db)
+            self.smtp_ssl_verify = cfg.smtp_ssl_verify
             
             # 验证必要配置是否完整
             if not all([self.smtp_host, self.smtp_user, self.smtp_password]):
@@ -90,27 +89,11 @@ class EmailService:
             True: 允许发送
             False: 超过速率限制
         """
-        from time import time
-        now = time()
-        
-        if recipient in EMAIL_RATE_LIMIT:
-            count, start_time = EMAIL_RATE_LIMIT[recipient]
-            
-            # 如果时间窗口已过，重置计数
-            if now - start_time > window_seconds:
-                EMAIL_RATE_LIMIT[recipient] = (1, now)
-                return True
-            
-            # 检查是否超过限制
-            if count >= max_count:
-                logger.warning(f"邮件发送速率限制: {recipient} 在 {window_seconds}秒内已发送 {count} 封邮件")
-                return False
-            
-            # 增加计数
-            EMAIL_RATE_LIMIT[recipient] = (count + 1, start_time)
-        else:
-            EMAIL_RATE_LIMIT[recipient] = (1, now)
-        
+        # 滑动窗口限流（见 app/core/rate_limit.py），条目自动过期
+        ok, _ = rate_limiter.hit(f"email:{recipient}", max_count, window_seconds)
+        if not ok:
+            logger.warning(f"邮件发送速率限制: {recipient} 在 {window_seconds}秒内已发送 {max_count} 封邮件")
+            return False
         return True
     
     def validate_email(self, email: str) -> bool:
@@ -413,7 +396,7 @@ class EmailService:
         
         # 添加系统配置的网站名称
         if 'site_name' not in context:
-            context['site_name'] = get_config('site_name', 'string', 'Foadmin', self.db)
+            context['site_name'] = typed_config(self.db).site_name
         
         # 格式化主题和内容
         subject = template['subject'].format(**context)
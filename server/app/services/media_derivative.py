@@ -0,0 +1,267 @@
+# app/services/media_derivative.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+媒体衍生图（缩略图 / 视频封面）生成服务
+
+- 图片：按配置的宽度档位生成 WebP（客户端不支持时为 JPEG）缩略图
+- 视频：调用 ffmpeg 截取首帧作为封面，同样按宽度档位输出
+- 生成在独立的进程池中执行，不占用事件循环和请求线程的 CPU
+- 衍生图与原文件放在同一目录，文件名由原文件名派生：
+  media/2025/10/19/904b959f014b6ec4.jpg → media/2025/10/19/904b959f014b6ec4.w320.webp
+  生成一次后落盘复用（持久缓存），删除原文件时一并清理
+- 同一衍生图的并发请求只生成一次（single-flight）
+
+配置项：
+- 系统配置 media_thumb_sizes：宽度档位（逗号分隔，默认 160,320,640），请求的 w 会向上取整到档位
+- .env MEDIA_DERIVATIVE_WORKERS：进程池大小
+- .env FFMPEG_PATH：ffmpeg 可执行文件路径（找不到时视频不生成封面，预览时返回原文件）
+
+用法:
+    from app.services.media_derivative import media_derivative
+    path = media_derivative.ensure(abs_path, mime, width, fmt)         # None 表示无法生成
+    media_derivative.schedule(abs_path, mime, sizes)                    # 上传后后台预生成
+"""
+
+import glob
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Optional, Sequence
+
+from app.core.config import settings
+from app.utils.fs import mkstemp_public
+# parse_sizes 已移至 app.utils.thumb_sizes（config_registry 也要用），此处保留原导入路径
+from app.utils.thumb_sizes import parse_sizes
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTS = {"webp": "webp", "jpeg": "jpg"}
+FORMAT_MIME = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# 缩略图最大高宽比，防止超长图生成巨大的“缩略图”
+MAX_ASPECT = 4
+FFMPEG_TIMEOUT = 30
+
+
+def pick_size(width: int, sizes: Sequence[int]) -> int:
+    """把请求宽度向上取整到最近的档位（超过最大档位取最大档位），限制缓存文件数量"""
+    for s in sizes:
+        if s >= width:
+            return s
+    return sizes[-1]
+
+
+def derivative_path(abs_path: str, width: int, fmt: str) -> str:
+    """衍生图路径：与原文件同目录，{原文件名去后缀}.w{宽度}.{webp|jpg}"""
+    stem = os.path.splitext(abs_path)[0]
+    return f"{stem}.w{width}.{FORMAT_EXTS[fmt]}"
+
+
+def supports(mime: Optional[str]) -> bool:
+    mime = mime or ""
+    return (mime.startswith("image/") and mime != "image/svg+xml") or mime.startswith("video/")
+
+
+# ---------------- 进程池内执行的函数（必须是模块级，便于 pickle） ----------------
+
+def _render_image(src: str, dst: str, width: int, fmt: str) -> str:
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as im:
+        # JPEG 可以在解码阶段直接按比例缩小，大图提速明显
+        im.draft("RGB", (width, width * MAX_ASPECT))
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((width, width * MAX_ASPECT), Image.LANCZOS)
+        has_alpha = "A" in im.getbands() or (im.mode == "P" and "transparency" in im.info)
+        if has_alpha:
+            im = im.convert("RGBA")
+            if fmt == "jpeg":
+                # JPEG 不支持透明：铺白底
+                bg = Image.new("RGB", im.size, (255, 255, 255))
+                bg.paste(im, mask=im.getchannel("A"))
+                im = bg
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+
+        if fmt == "webp":
+            _atomic_save(dst, lambda fp: im.save(fp, format="WEBP", quality=80, method=4))
+        else:
+            _atomic_save(dst, lambda fp: im.save(fp, format="JPEG", quality=82, optimize=True, progressive=True))
+    return dst
+
+
+def _render_video_poster(src: str, dst: str, width: int, fmt: str, ffmpeg: str) -> str:
+    codec = "libwebp" if fmt == "webp" else "mjpeg"
+    fd, tmp = mkstemp_public(prefix=".derive-", suffix="." + FORMAT_EXTS[fmt], dir=os.path.dirname(dst))
+    os.close(fd)
+    try:
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-i", src, "-frames:v", "1",
+             "-vf", f"scale='min({width},iw)':-2", "-c:v", codec, "-f", "image2", tmp],
+            check=True, timeout=FFMPEG_TIMEOUT, stdin=subprocess.DEVNULL, capture_output=True,
+        )
+        if os.path.getsize(tmp) == 0:
+            raise RuntimeError("ffmpeg produced empty output")
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dst
+
+
+def _atomic_save(dst: str, writer) -> None:
+    fd, tmp = mkstemp_public(prefix=".derive-", suffix=os.path.splitext(dst)[1], dir=os.path.dirname(dst))
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            writer(fp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# ---------------- 调度 ----------------
+
+class MediaDerivativeService:
+    """进程池 + single-flight 的衍生图生成器"""
+
+    def __init__(self, workers: int = 2, ffmpeg: str = "ffmpeg"):
+        self.workers = max(1, int(workers))
+        self.ffmpeg = ffmpeg
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._generated = 0
+        self._failed = 0
+        self._hits = 0
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ffmpeg_bin(self) -> Optional[str]:
+        return shutil.which(self.ffmpeg)
+
+    def _submit(self, abs_path: str, mime: str, width: int, fmt: str) -> Optional[Future]:
+        """提交生成任务；同一目标已在生成中时复用同一个 Future"""
+        dst = derivative_path(abs_path, width, fmt)
+        with self._lock:
+            fut = self._inflight.get(dst)
+            if fut is not None:
+                return fut
+            if mime.startswith("video/"):
+                ffmpeg = self._ffmpeg_bin()
+                if not ffmpeg:
+                    return None
+                args = (_render_video_poster, abs_path, dst, width, fmt, ffmpeg)
+            else:
+                args = (_render_image, abs_path, dst, width, fmt)
+            try:
+                fut = self._get_pool_locked().submit(*args)
+            except BrokenProcessPool:
+                # 子进程异常退出（如被 OOM kill）后进程池不可再用：重建一次
+                self._pool = None
+                fut = self._get_pool_locked().submit(*args)
+            self._inflight[dst] = fut
+        fut.add_done_callback(lambda f, key=dst: self._done(key, f))
+        return fut
+
+    def _get_pool_locked(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn：子进程不继承父进程的线程（调度器、审计写入线程）和数据库连接
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _done(self, key: str, fut: Future) -> None:
+        exc = None if fut.cancelled() else fut.exception()
+        with self._lock:
+            self._inflight.pop(key, None)
+            if fut.cancelled() or exc is not None:
+                self._failed += 1
+            else:
+                self._generated += 1
+            if isinstance(exc, BrokenProcessPool):
+                # 下次提交时重建进程池
+                self._pool = None
+        if exc is not None:
+            logger.warning(f"衍生图生成失败 {key}: {exc}")
+
+    def ensure(self, abs_path: str, mime: Optional[str], width: int, fmt: str,
+               timeout: float = 60) -> Optional[str]:
+        """
+        返回衍生图路径（已存在直接返回，否则提交到进程池生成并等待）
+        在同步接口的线程池中调用；等待期间只占用一个线程，CPU 消耗在子进程中
+
+        Returns:
+            衍生图绝对路径；类型不支持、缺少 ffmpeg 或生成失败时返回 None
+        """
+        if not supports(mime):
+            return None
+        dst = derivative_path(abs_path, width, fmt)
+        if os.path.exists(dst):
+            with self._lock:
+                self._hits += 1
+            return dst
+        try:
+            fut = self._submit(abs_path, mime or "", width, fmt)
+            if fut is None:
+                return None
+            return fut.result(timeout)
+        except Exception:
+            return None
+
+    def schedule(self, abs_path: str, mime: Optional[str], sizes: Iterable[int], fmt: str = "webp") -> None:
+        """后台预生成（不等待结果），用于上传完成后提前准备列表缩略图"""
+        if not supports(mime):
+            return
+        for w in sizes:
+            if not os.path.exists(derivative_path(abs_path, w, fmt)):
+                try:
+                    self._submit(abs_path, mime or "", w, fmt)
+                except RuntimeError:
+                    # 进程池已关闭（应用退出中）
+                    return
+
+    @staticmethod
+    def remove_all(abs_path: str) -> int:
+        """删除某个原文件的全部衍生图"""
+        stem = glob.escape(os.path.splitext(abs_path)[0])
+        removed = 0
+        for ext in set(FORMAT_EXTS.values()):
+            for p in glob.glob(f"{stem}.w[0-9]*.{ext}"):
+                try:
+                    os.remove(p)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "inflight": len(self._inflight),
+                "generated": self._generated,
+                "failed": self._failed,
+                "hits": self._hits,
+                "ffmpeg": bool(self._ffmpeg_bin()),
+            }
+
+
+# 全局实例（进程池按需创建，main.on_shutdown 关闭）
+media_derivative = MediaDerivativeService(
+    workers=settings.MEDIA_DERIVATIVE_WORKERS,
+    ffmpeg=settings.FFMPEG_PATH,
+)
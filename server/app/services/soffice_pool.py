@@ -0,0 +1,382 @@
+# app/services/soffice_pool.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+LibreOffice（soffice）常驻工作进程池（DOCX / PPTX 转换使用）
+
+每次请求冷启动 soffice 要 2~5 秒，且多个 soffice 共用同一个用户配置目录会互相加锁冲突。本模块：
+- 维护 SOFFICE_WORKERS 个常驻的 headless soffice，每个使用独立的配置目录（SOFFICE_PROFILE_DIR/worker-N）
+- 通过 UNO（socket + urp）把转换任务派发给空闲进程，转换期间进程独占
+- 健康检查：派发前确认进程存活，空闲超过 HEALTH_INTERVAL 秒的进程先做一次 UNO 调用确认可用
+- 回收：每个进程处理 SOFFICE_MAX_JOBS_PER_WORKER 个任务后重启；崩溃、报错或超时（SOFFICE_JOB_TIMEOUT）立即重启
+- 排队：没有空闲进程时等待，超过 SOFFICE_QUEUE_TIMEOUT 秒返回 503；排队数通过 stats() 暴露到运行时指标
+
+运行环境没有 UNO 绑定（python3-uno，通常随 LibreOffice 安装）时退化为命令行模式：
+仍按工作槽位限流并使用各自独立的配置目录（配置目录复用，省去首次初始化），但每个任务启动一次 soffice。
+
+用法（阻塞调用，在线程池中执行）:
+    from app.services.soffice_pool import soffice_pool
+    pdf_path = await run_in_threadpool(soffice_pool.convert, src_path, out_dir, "pdf")
+"""
+
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+try:  # UNO 绑定为可选依赖
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:  # pragma: no cover - 取决于部署环境
+    uno = None
+    PropertyValue = None
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIMEOUT = 30
+HEALTH_INTERVAL = 30
+
+# 目标格式 -> {文档类型服务: 导出过滤器}
+EXPORT_FILTERS = {
+    "pdf": {
+        "com.sun.star.presentation.PresentationDocument": "impress_pdf_Export",
+        "com.sun.star.drawing.DrawingDocument": "draw_pdf_Export",
+        "com.sun.star.sheet.SpreadsheetDocument": "calc_pdf_Export",
+        "com.sun.star.text.TextDocument": "writer_pdf_Export",
+    },
+    "html": {
+        "com.sun.star.presentation.PresentationDocument": "impress_html_Export",
+        "com.sun.star.sheet.SpreadsheetDocument": "HTML (StarCalc)",
+        "com.sun.star.text.TextDocument": "HTML (StarWriter)",
+    },
+}
+
+
+def find_soffice() -> Optional[str]:
+    return shutil.which(settings.SOFFICE_PATH) if settings.SOFFICE_PATH else (
+        shutil.which("soffice") or shutil.which("libreoffice")
+    )
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _props(**kwargs):
+    items = []
+    for k, v in kwargs.items():
+        p = PropertyValue()
+        p.Name, p.Value = k, v
+        items.append(p)
+    return tuple(items)
+
+
+class SofficeWorker:
+    """一个常驻 soffice 进程（UNO 模式）或一个命令行工作槽位（CLI 模式）"""
+
+    def __init__(self, slot: int, binary: str, profile_root: str, use_uno: bool):
+        self.slot = slot
+        self.binary = binary
+        self.profile_dir = os.path.abspath(os.path.join(profile_root, f"worker-{slot}"))
+        self.use_uno = use_uno
+        self.proc: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.jobs = 0
+        self.checked_at = 0.0
+
+    @property
+    def profile_url(self) -> str:
+        return "file://" + self.profile_dir.replace(os.sep, "/")
+
+    # ---------- 生命周期 ----------
+    def start(self) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not self.use_uno:
+            return
+        port = _free_port()
+        self.proc = subprocess.Popen(
+            [self.binary, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+             "--nolockcheck", f"-env:UserInstallation={self.profile_url}",
+             f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+                break
+            except Exception:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"soffice worker-{self.slot} 启动失败")
+                time.sleep(0.2)
+        self.checked_at = time.monotonic()
+        logger.info(f"soffice worker-{self.slot} 已启动（pid={self.proc.pid}, port={port}）")
+
+    def stop(self) -> None:
+        self.jobs = 0
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.proc is not None:
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+
+    def kill(self) -> None:
+        """超时看门狗调用：强制结束进程，正在进行的 UNO 调用随之报错返回"""
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def healthy(self) -> bool:
+        if not self.use_uno:
+            return True
+        if self.proc is None or self.proc.poll() is not None or self.desktop is None:
+            return False
+        if time.monotonic() - self.checked_at < HEALTH_INTERVAL:
+            return True
+        try:
+            self.desktop.getComponents()
+            self.checked_at = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    # ---------- 转换 ----------
+    def convert(self, src: str, out_dir: str, fmt: str, timeout: int) -> str:
+        out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(src))[0] + "." + fmt)
+        if self.use_uno:
+            self._convert_uno(src, out_path, fmt, timeout)
+        else:
+            self._convert_cli(src, out_dir, fmt, timeout)
+        self.jobs += 1
+        if not os.path.exists(out_path):
+            raise RuntimeError("soffice 未生成输出文件")
+        return out_path
+
+    def _convert_uno(self, src: str, out_path: str, fmt: str, timeout: int) -> None:
+        fired = threading.Event()
+
+        def _on_timeout():
+            fired.set()
+            self.kill()
+
+        watchdog = threading.Timer(timeout, _on_timeout)
+        watchdog.start()
+        doc = None
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(src)), "_blank", 0,
+                _props(Hidden=True, ReadOnly=True),
+            )
+            if doc is None:
+                raise RuntimeError("soffice 无法打开文件")
+            filters = EXPORT_FILTERS[fmt]
+            name = next((f for svc, f in filters.items() if doc.supportsService(svc)), None)
+            if name is None:
+                raise RuntimeError(f"该文档类型不支持导出为 {fmt}")
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(out_path)), _props(FilterName=name))
+        except Exception as e:
+            if fired.is_set():
+                raise TimeoutError() from e
+            raise
+        finally:
+            watchdog.cancel()
+            if doc is not None and not fired.is_set():
+                try:
+                    doc.close(True)
+                except Exception:
+                    pass
+        self.checked_at = time.monotonic()
+
+    def _convert_cli(self, src: str, out_dir: str, fmt: str, timeout: int) -> None:
+        try:
+            r = subprocess.run(
+                [self.binary, "--headless", "--norestore", f"-env:UserInstallation={self.profile_url}",
+                 "--convert-to", fmt, "--outdir", out_dir, src],
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise TimeoutError()
+        if r.returncode != 0:
+            raise RuntimeError(r.stderr.decode(errors="ignore")[:200])
+
+
+class SofficePool:
+    def __init__(self, workers: int = 2, max_jobs_per_worker: int = 50, job_timeout: int = 120,
+                 queue_timeout: int = 30, profile_root: str = "./runtime/soffice"):
+        self.size = max(1, int(workers))
+        self.max_jobs_per_worker = max(1, int(max_jobs_per_worker))
+        self.job_timeout = max(1, int(job_timeout))
+        self.queue_timeout = max(0, int(queue_timeout))
+        self.profile_root = profile_root
+
+        self._lock = threading.Lock()
+        self._idle: "queue.Queue[SofficeWorker]" = queue.Queue()
+        self._workers: List[SofficeWorker] = []
+        self._binary: Optional[str] = None
+        self._started = False
+        self._waiting = 0
+        self._busy = 0
+        self._jobs = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._restarts = 0
+        self._rejected = 0
+
+    @property
+    def mode(self) -> str:
+        if not self._binary and not find_soffice():
+            return "unavailable"
+        return "uno" if uno is not None else "cli"
+
+    def available(self) -> bool:
+        return self.mode != "unavailable"
+
+    def start(self) -> None:
+        """创建工作槽位；UNO 模式下进程在首次使用时启动（也可在应用启动时预热）"""
+        with self._lock:
+            if self._started:
+                return
+            self._binary = find_soffice()
+            if not self._binary:
+                raise HTTPException(500, "后端未安装 LibreOffice（soffice），无法转换 PPTX/PDF/HTML")
+            for slot in range(self.size):
+                w = SofficeWorker(slot, self._binary, self.profile_root, uno is not None)
+                if not w.use_uno:
+                    w.start()
+                self._workers.append(w)
+                self._idle.put(w)
+            self._started = True
+        if uno is None:
+            logger.warning("未找到 UNO 绑定（python3-uno），soffice 以命令行模式运行")
+
+    def prewarm(self) -> None:
+        """启动全部常驻进程（应用启动时在后台线程调用）"""
+        if not self.available():
+            return
+        self.start()
+        for w in list(self._workers):
+            if w.use_uno and w.proc is None:
+                try:
+                    w.start()
+                except Exception as e:
+                    logger.warning(f"soffice 预热失败: {e}")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+            self._started = False
+        for w in workers:
+            w.stop()
+
+    def _acquire(self) -> SofficeWorker:
+        with self._lock:
+            self._waiting += 1
+        try:
+            return self._idle.get(timeout=self.queue_timeout or None)
+        except queue.Empty:
+            with self._lock:
+                self._rejected += 1
+            raise HTTPException(503, "文档转换繁忙，请稍后重试")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _recycle(self, w: SofficeWorker) -> None:
+        w.stop()
+        with self._lock:
+            self._restarts += 1
+
+    def convert(self, src: str, out_dir: str, fmt: str) -> str:
+        """
+        把 src 转换为 fmt（pdf / html），输出到 out_dir/{原文件名}.{fmt}
+        阻塞调用，请在线程池中执行
+
+        Raises:
+            HTTPException: 503 排队超时 / 504 转换超时 / 500 未安装或转换失败
+        """
+        self.start()
+        w = self._acquire()
+        with self._lock:
+            self._busy += 1
+        try:
+            if w.proc is not None and not w.healthy():
+                self._recycle(w)
+            try:
+                if w.use_uno and w.proc is None:
+                    w.start()
+                out = w.convert(src, out_dir, fmt, self.job_timeout)
+            except TimeoutError:
+                # 看门狗已杀掉进程（或命令行超时），重启后再放回池中
+                self._recycle(w)
+                with self._lock:
+                    self._failed += 1
+                    self._timeouts += 1
+                raise HTTPException(504, f"文档转换超时（超过 {self.job_timeout} 秒）")
+            except Exception as e:
+                # 出错的进程状态不可信（可能已崩溃），直接重启
+                self._recycle(w)
+                with self._lock:
+                    self._failed += 1
+                raise HTTPException(500, f"文档转换失败：{e}")
+            with self._lock:
+                self._jobs += 1
+            if w.jobs >= self.max_jobs_per_worker:
+                self._recycle(w)
+            return out
+        finally:
+            with self._lock:
+                self._busy -= 1
+                started = self._started
+            if started:
+                self._idle.put(w)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.size,
+                "running": sum(1 for w in self._workers if w.proc is not None and w.proc.poll() is None),
+                "busy": self._busy,
+                "queue_depth": self._waiting,
+                "jobs": self._jobs,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "restarts": self._restarts,
+                "rejected": self._rejected,
+            }
+
+
+# 全局实例（main.on_startup 按配置预热，on_shutdown 关闭）
+soffice_pool = SofficePool(
+    workers=settings.SOFFICE_WORKERS,
+    max_jobs_per_worker=settings.SOFFICE_MAX_JOBS_PER_WORKER,
+    job_timeout=settings.SOFFICE_JOB_TIMEOUT,
+    queue_timeout=settings.SOFFICE_QUEUE_TIMEOUT,
+    profile_root=settings.SOFFICE_PROFILE_DIR,
+)
@@ -0,0 +1,132 @@
+# app/services/user_acl.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+用户角色 / 权限加载与缓存
+
+- 一条联表查询（用户角色 -> 角色 -> 角色权限 -> 权限）同时取出角色与权限码，代替原来的 4 次顺序查询
+- 进程内按用户 ID 缓存，有效期 USER_ACL_CACHE_TTL 秒，容量 USER_ACL_CACHE_SIZE（LRU）
+- 角色 / 权限变更后显式失效：
+    user_acl.invalidate(uid)    # 用户角色绑定变更、删除用户
+    user_acl.invalidate()       # 角色授权、角色删除、权限修改 / 删除（影响所有用户）
+  多进程部署时其他进程最长 TTL 秒后生效
+
+用法:
+    acl = user_acl.get(db, user_id)
+    acl.role_ids, acl.roles, acl.perms, acl.active_roles
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.rbac import Permission, Role, RolePerm, UserRole
+
+
+class UserAcl(NamedTuple):
+    role_ids: List[int]
+    roles: List[str]          # 全部角色编码（签发令牌使用）
+    active_roles: List[str]   # 启用状态的角色编码（审计日志使用）
+    perms: List[str]          # 权限码 + API 的 "METHOD:/path"
+
+
+def load_user_acl(db: Session, user_id: int) -> UserAcl:
+    """一次联表查询加载用户的角色与权限（不经缓存）"""
+    rows = (
+        db.query(Role.id, Role.code, Role.status, Permission.id, Permission.code,
+                 Permission.type, Permission.method, Permission.path)
+        .select_from(UserRole)
+        .join(Role, Role.id == UserRole.role_id)
+        .outerjoin(RolePerm, RolePerm.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == RolePerm.perm_id)
+        .filter(UserRole.user_id == user_id)
+        .order_by(Role.id, Permission.id)
+        .all()
+    )
+    role_ids: List[int] = []
+    roles: List[str] = []
+    active_roles: List[str] = []
+    perm_rows = {}
+    for rid, rcode, rstatus, pid, pcode, ptype, method, path in rows:
+        if not role_ids or role_ids[-1] != rid:
+            role_ids.append(rid)
+            roles.append(rcode)
+            if rstatus == 1:
+                active_roles.append(rcode)
+        if pid is not None:
+            perm_rows[pid] = (pcode, ptype, method, path)
+    perms: List[str] = []
+    for pid in sorted(perm_rows):
+        pcode, ptype, method, path = perm_rows[pid]
+        if pcode:  # 加载所有 code
+            perms.append(pcode)
+        if ptype == "api" and method and path:  # 加载 API 路径
+            perms.append(f"{method}:{path}")
+    return UserAcl(role_ids, roles, active_roles, perms)
+
+
+class UserAclCache:
+    def __init__(self, ttl: int = 60, max_size: int = 10000):
+        self.ttl = max(0, int(ttl))
+        self.max_size = max(1, int(max_size))
+        self._items: "OrderedDict[int, Tuple[float, UserAcl]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 失效序号：加载期间发生失效时不写入缓存，避免把旧数据缓存下来
+        self._seq = 0
+        self._all_seq = 0
+        self._user_seq: Dict[int, int] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, db: Session, user_id: int) -> UserAcl:
+        user_id = int(user_id)
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(user_id)
+                self._hits += 1
+                return item[1]
+            self._misses += 1
+            start = self._seq
+        acl = load_user_acl(db, user_id)
+        if self.ttl:
+            with self._lock:
+                if self._all_seq <= start and self._user_seq.get(user_id, 0) <= start:
+                    self._items[user_id] = (time.monotonic() + self.ttl, acl)
+                    self._items.move_to_end(user_id)
+                    while len(self._items) > self.max_size:
+                        self._items.popitem(last=False)
+        return acl
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """不传 user_id 时全部失效"""
+        with self._lock:
+            self._seq += 1
+            if user_id is None:
+                self._items.clear()
+                self._user_seq.clear()
+                self._all_seq = self._seq
+            else:
+                self._items.pop(int(user_id), None)
+                self._user_seq[int(user_id)] = self._seq
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._items),
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else None,
+            }
+
+
+# 全局实例
+user_acl = UserAclCache(ttl=settings.USER_ACL_CACHE_TTL, max_size=settings.USER_ACL_CACHE_SIZE)
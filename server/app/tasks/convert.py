@@ -0,0 +1,182 @@
+# app/tasks/convert.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+文档转换缓存定时任务
+"""
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# 转换文件写入后到登记入库之间的宽限期，避免误删正在进行的转换
+ORPHAN_GRACE_SECONDS = 3600
+EVICT_BATCH = 500
+_SRC_NAME = re.compile(r"^(pdf|pptx)-([0-9a-f]{64})\.pdf$")
+
+
+def evict_convert_cache(max_mb: int = 2048, max_age_days: int = 30, purge_media: bool = False):
+    """
+    淘汰文档转换缓存并清理孤立的转换文件
+
+    1. 超过 max_age_days 未访问的缓存记录删除
+    2. 剩余记录总占用超过 max_mb 时，按最后访问时间从旧到新（LRU）删除，直到低于上限
+    3. 清理孤立数据：
+       - 整份文档记录已删除的按页记录
+       - 没有任何缓存记录引用的源 PDF（convert/src）
+       - 文件已不存在的转换图片记录
+       - convert 目录下没有媒体记录的图片（含其缩略图）及残留临时文件
+    4. purge_media=True 时，把超过 max_age_days 且不再被任何缓存记录引用的转换图片移入回收站
+       （转换图片可能已被插入文章正文，默认不处理；回收站中可恢复）
+    """
+    from sqlalchemy import func
+    from app.core.db import SessionLocal
+    from app.core.config_registry import typed_config
+    from app.models.media import MediaConvertCache, MediaFile
+    from app.services.convert_cache import parse_ids
+
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    budget = max_mb * 1024 * 1024
+    last_access = func.coalesce(MediaConvertCache.last_access_at, MediaConvertCache.created_at)
+
+    db = SessionLocal()
+    try:
+        upload_root = typed_config(db).upload_root
+        convert_root = os.path.join(upload_root, "convert")
+
+        # 1) 按闲置时间
+        expired = db.query(MediaConvertCache).filter(last_access < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+        # 2) 按总容量（LRU）
+        evicted = 0
+        total = db.query(func.coalesce(func.sum(MediaConvertCache.size), 0)).scalar() or 0
+        while total > budget:
+            rows = (
+                db.query(MediaConvertCache.id, MediaConvertCache.size)
+                .order_by(last_access.asc(), MediaConvertCache.id.asc())
+                .limit(EVICT_BATCH).all()
+            )
+            if not rows:
+                break
+            ids = []
+            for rid, size in rows:
+                ids.append(rid)
+                total -= size or 0
+                if total <= budget:
+                    break
+            db.query(MediaConvertCache).filter(MediaConvertCache.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            evicted += len(ids)
+
+        # 3) 孤立数据
+        docs = {
+            (k, sha, params) for k, sha, params in db.query(
+                MediaConvertCache.kind, MediaConvertCache.src_sha256, MediaConvertCache.params
+            ).filter(MediaConvertCache.page == 0)
+        }
+        orphan_pages = [
+            rid for rid, k, sha, params in db.query(
+                MediaConvertCache.id, MediaConvertCache.kind, MediaConvertCache.src_sha256, MediaConvertCache.params
+            ).filter(MediaConvertCache.page > 0)
+            if (k, sha, params) not in docs
+        ]
+        for i in range(0, len(orphan_pages), EVICT_BATCH):
+            db.query(MediaConvertCache).filter(
+                MediaConvertCache.id.in_(orphan_pages[i:i + EVICT_BATCH])
+            ).delete(synchronize_session=False)
+        db.commit()
+
+        src_removed = 0
+        src_dir = os.path.join(convert_root, "src")
+        if os.path.isdir(src_dir):
+            sources = {(k, sha) for k, sha, _ in docs}
+            for name in os.listdir(src_dir):
+                path = os.path.join(src_dir, name)
+                m = _SRC_NAME.match(name)
+                if m and (m.group(1), m.group(2)) in sources:
+                    continue
+                if _mtime(path) < time.time() - ORPHAN_GRACE_SECONDS:
+                    _remove(path)
+                    src_removed += 1
+
+        # 路径分隔符随系统不同（convert/ 或 convert\），用单字符通配
+        convert_files = db.query(MediaFile).filter(MediaFile.storage == "local", MediaFile.path.like("convert_%"))
+        known_stems = set()
+        dangling = []
+        for mf in convert_files:
+            if os.path.exists(os.path.join(upload_root, mf.path)):
+                known_stems.add(_stem(mf.path))
+            else:
+                dangling.append(mf.id)
+        for i in range(0, len(dangling), EVICT_BATCH):
+            db.query(MediaFile).filter(MediaFile.id.in_(dangling[i:i + EVICT_BATCH])).delete(synchronize_session=False)
+        db.commit()
+
+        files_removed = 0
+        grace = time.time() - ORPHAN_GRACE_SECONDS
+        if os.path.isdir(convert_root):
+            for dirpath, dirnames, filenames in os.walk(convert_root):
+                if os.path.abspath(dirpath) == os.path.abspath(src_dir):
+                    dirnames[:] = []
+                    continue
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    # 缩略图 {stem}.w320.webp 跟随原图：原图有记录就保留
+                    if _stem(name) in known_stems or _mtime(path) >= grace:
+                        continue
+                    _remove(path)
+                    files_removed += 1
+
+        # 4) 可选：不再被缓存引用的转换图片移入回收站
+        trashed = 0
+        if purge_media:
+            referenced = set()
+            for (file_ids,) in db.query(MediaConvertCache.file_ids).filter(MediaConvertCache.file_ids.isnot(None)):
+                referenced.update(parse_ids(file_ids))
+            candidates = [
+                fid for (fid,) in db.query(MediaFile.id).filter(
+                    MediaFile.remark == "convert", MediaFile.deleted_at.is_(None), MediaFile.created_at < cutoff,
+                )
+                if fid not in referenced
+            ]
+            now = datetime.utcnow()
+            for i in range(0, len(candidates), EVICT_BATCH):
+                db.query(MediaFile).filter(MediaFile.id.in_(candidates[i:i + EVICT_BATCH])).update(
+                    {MediaFile.deleted_at: now}, synchronize_session=False
+                )
+            db.commit()
+            trashed = len(candidates)
+
+        msg = (
+            f"Convert cache: expired {expired}, evicted {evicted} (now {total // 1024 // 1024} MB), "
+            f"orphan pages {len(orphan_pages)}, sources {src_removed}, dangling media {len(dangling)}, "
+            f"files {files_removed}, trashed media {trashed}"
+        )
+        logger.info(msg)
+        return msg
+    finally:
+        db.close()
+
+
+def _stem(path: str) -> str:
+    """内容寻址文件名的前缀部分：convert/2025/01/01/904b959f014b6ec4.w320.webp -> 904b959f014b6ec4"""
+    return os.path.basename(path).split(".", 1)[0]
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,77 @@
+# app/tasks/media.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+媒体库定时任务
+"""
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def cleanup_upload_sessions(ttl_hours: int = 24):
+    """
+    清理过期的分片上传会话
+
+    - 超过 ttl_hours 未完成（且期间没有新分片写入）的会话：删除分片目录和会话记录
+    - 已完成 / 已取消超过 ttl_hours 的会话记录一并删除
+    - 暂存目录（.env UPLOAD_SESSION_DIR）下没有对应会话记录的残留目录同样按 ttl_hours 清理；
+      旧版本暂存在上传目录 .sessions 下的残留目录一并清理
+    """
+    from app.core.db import SessionLocal
+    from app.core.config import settings
+    from app.core.config_registry import typed_config
+    from app.models.media import MediaUploadSession
+
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    cutoff_ts = time.time() - ttl_hours * 3600
+
+    db = SessionLocal()
+    try:
+        sessions_root = os.path.abspath(settings.UPLOAD_SESSION_DIR)
+        legacy_root = os.path.join(typed_config(db).upload_root, ".sessions")
+
+        removed = 0
+        rows = db.query(MediaUploadSession).filter(MediaUploadSession.updated_at < cutoff).all()
+        for s in rows:
+            session_dir = os.path.join(sessions_root, s.upload_id)
+            # 仍在上传：以目录最后修改时间（每写入一个分片都会更新）判断是否真的被放弃
+            if s.status == "uploading" and _mtime(session_dir) > cutoff_ts:
+                continue
+            shutil.rmtree(session_dir, ignore_errors=True)
+            db.delete(s)
+            removed += 1
+        db.commit()
+
+        # 没有会话记录的残留目录
+        orphans = 0
+        known = {
+            uid for (uid,) in db.query(MediaUploadSession.upload_id)
+            .filter(MediaUploadSession.status.in_(("uploading", "completing")))
+        }
+        for root in (sessions_root, legacy_root):
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if (root == legacy_root or name not in known) and _mtime(path) < cutoff_ts:
+                    shutil.rmtree(path, ignore_errors=True)
+                    orphans += 1
+
+        msg = f"Cleaned up {removed} upload sessions, {orphans} orphan session dirs"
+        logger.info(msg)
+        return msg
+    finally:
+        db.close()
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
@@ -0,0 +1,30 @@
+# app/utils/fs.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+文件写入辅助
+
+tempfile.mkstemp 创建的文件权限固定为 0600，写完后 os.replace 到正式位置会保留该权限，
+Nginx 等以其他用户运行的进程无法直接读取上传目录。mkstemp_public 在创建后按进程 umask
+改为普通文件的默认权限（通常 0644），与 open(path, "wb") 创建的文件一致。
+"""
+import os
+import tempfile
+
+# 读取 umask 需要先设置再恢复（进程级），只在导入时做一次
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def mkstemp_public(suffix: str = "", prefix: str = "tmp", dir: str | None = None) -> tuple[int, str]:
+    """同 tempfile.mkstemp，但文件权限按 umask 设置（用于之后 os.replace 为正式文件的临时文件）"""
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix=prefix, dir=dir)
+    try:
+        os.fchmod(fd, FILE_MODE)
+    except BaseException:
+        os.close(fd)
+        os.remove(path)
+        raise
+    return fd, path
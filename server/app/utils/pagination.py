@@ -0,0 +1,177 @@
+# app/utils/pagination.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+
+"""
+通用分页：游标（keyset）分页 + 廉价计数
+
+OFFSET 分页越往后越慢（数据库要先扫过前面所有行），COUNT(*) 在大表上同样是全量扫描。
+本模块提供：
+- 游标分页：按 (created_at, id) 或 id 排序，下一页条件为 “排序键 < 上一页最后一行”，任意深度都走索引
+- 计数模式：exact 精确计数 / capped 最多数到 N（超过返回 N 并标记 total_capped，前端显示 “N+”）/ none 不计数
+- 带游标请求时不再计数（总数在首页已经拿到）
+
+用法:
+    page = paginate(db, q, order_cols=(AuditLog.id,), page=page, size=size, cursor=cursor, count=count)
+    return {"items": page["rows"], "total": page["total"],
+            "total_capped": page["total_capped"], "next_cursor": page["next_cursor"]}
+
+兼容旧接口：不传 cursor 时仍按 page/size 的 OFFSET 分页，同时返回 next_cursor 供后续翻页切换为游标模式。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import Select
+
+DEFAULT_COUNT_CAP = 10000
+COUNT_MODES = ("exact", "capped", "none")
+# 供路由声明查询参数：count: str = Query("exact", pattern=COUNT_PATTERN)
+COUNT_PATTERN = "^(exact|capped|none)$"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键编码为不透明的游标字符串（base64url JSON）"""
+    payload = [{"$dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, n: int) -> List[Any]:
+    """解析游标；格式不对或字段数不符时返回 400"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != n:
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) else v for v in payload]
+    except Exception:
+        raise HTTPException(400, "无效的分页游标")
+
+
+def keyset_condition(cols: Sequence[Any], values: Sequence[Any], descending: bool = True):
+    """
+    (c1, c2, ...) 在排序方向上位于 (v1, v2, ...) 之后的条件
+
+    展开为 c1 < v1 OR (c1 = v1 AND c2 < v2) ...，并额外加上 c1 <= v1，
+    让 MySQL 能直接在首列索引上做范围扫描
+    """
+    def after(c, v):
+        return c < v if descending else c > v
+
+    branches = []
+    for i, (col, val) in enumerate(zip(cols, values)):
+        eqs = [cols[j] == values[j] for j in range(i)]
+        branches.append(and_(*eqs, after(col, val)))
+    if len(cols) == 1:
+        return branches[0]
+    head = cols[0] <= values[0] if descending else cols[0] >= values[0]
+    return and_(head, or_(*branches))
+
+
+def _count_stmt(query: Select, count: str, key_col, cap: int) -> Select:
+    base = query.order_by(None).with_only_columns(key_col)
+    if count != "exact":
+        # 只取主键列再 LIMIT cap+1：最多扫描 cap+1 行索引
+        base = base.limit(cap + 1)
+    return select(func.count()).select_from(base.subquery())
+
+
+def _page_stmt(query: Select, order_cols, page: int, size: int, cursor: Optional[str], descending: bool) -> Select:
+    ordering = [c.desc() if descending else c.asc() for c in order_cols]
+    stmt = query.order_by(None).order_by(*ordering)
+    if cursor is not None:
+        stmt = stmt.where(keyset_condition(order_cols, decode_cursor(cursor, len(order_cols)), descending))
+    else:
+        stmt = stmt.offset((max(1, page) - 1) * size)
+    # 多取一行判断是否还有下一页
+    return stmt.limit(size + 1)
+
+
+def _page_result(rows: list, size: int, order_cols, row_key, total, total_capped) -> dict:
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        key = row_key(last) if row_key else [getattr(last, c.key) for c in order_cols]
+        next_cursor = encode_cursor(key)
+    return {"rows": rows, "total": total, "total_capped": total_capped, "next_cursor": next_cursor}
+
+
+def count_rows(db: Session, query, count: str, key_col, cap: int = DEFAULT_COUNT_CAP):
+    """
+    计数
+
+    Returns:
+        (total, total_capped)；count="none" 时 total 为 None
+    """
+    if count == "none":
+        return None, False
+    if isinstance(query, Select):
+        n = db.scalar(_count_stmt(query, count, key_col, cap)) or 0
+        if count == "exact":
+            return n, False
+    else:
+        base = query.order_by(None)
+        if count == "exact":
+            return base.count(), False
+        # 只取主键列再 LIMIT cap+1：最多扫描 cap+1 行索引
+        sub = base.with_entities(key_col).limit(cap + 1).subquery()
+        n = db.query(func.count()).select_from(sub).scalar() or 0
+    return (cap, True) if n > cap else (n, False)
+
+
+def paginate(
+    db: Session,
+    query,
+    *,
+    order_cols: Sequence[Any],
+    page: int = 1,
+    size: int = 20,
+    cursor: Optional[str] = None,
+    count: str = "exact",
+    count_cap: int = DEFAULT_COUNT_CAP,
+    descending: bool = True,
+    row_key: Optional[Callable[[Any], Sequence[Any]]] = None,
+) -> dict:
+    """
+    对 ORM Query（db.query）或 2.0 风格 select 分页
+
+    Args:
+        query: 已加好过滤条件的查询，原有排序会被替换为 order_cols
+        order_cols: 排序键，必须唯一（最后一列通常是主键 id）
+        cursor: 上一页返回的 next_cursor；传入时忽略 page 且不再计数
+        count: exact / capped / none
+        row_key: 从结果行取排序键的方法，默认按 order_cols 的列名取属性（多实体查询需要自定义）
+
+    Returns:
+        {"rows", "total", "total_capped", "next_cursor"}
+    """
+    if count not in COUNT_MODES:
+        raise HTTPException(400, f"count 仅支持 {'/'.join(COUNT_MODES)}")
+    size = max(1, int(size))
+    is_select = isinstance(query, Select)
+
+    total, total_capped = None, False
+    if cursor is None:
+        total, total_capped = count_rows(db, query, count, order_cols[-1], count_cap)
+
+    if is_select:
+        rows = list(db.scalars(_page_stmt(query, order_cols, page, size, cursor, descending)).all())
+    else:
+        ordering = [c.desc() if descending else c.asc() for c in order_cols]
+        q = query.order_by(None).order_by(*ordering)
+        if cursor is not None:
+            q = q.filter(keyset_condition(order_cols, decode_cursor(cursor, len(order_cols)), descending))
+        else:
+            q = q.offset((max(1, page) - 1) * size)
+        # 多取一行判断是否还有下一页
+        rows = q.limit(size + 1).all()
+
+    return _page_result(rows, size, order_cols, row_key, total, total_capped)
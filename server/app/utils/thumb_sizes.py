@@ -0,0 +1,18 @@
+# app/utils/thumb_sizes.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""缩略图宽度档位（系统配置 media_thumb_sizes）的解析，config_registry 与 media_derivative 共用"""
+from typing import List, Optional
+
+DEFAULT_THUMB_SIZES = (160, 320, 640)
+
+
+def parse_sizes(value: Optional[str]) -> List[int]:
+    """解析宽度档位配置，非法值忽略"""
+    sizes = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if part.isdigit() and 16 <= int(part) <= 4096:
+            sizes.add(int(part))
+    return sorted(sizes) or list(DEFAULT_THUMB_SIZES)
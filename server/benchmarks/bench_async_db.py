@@ -0,0 +1,158 @@
+# benchmarks/bench_async_db.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+同步 / 异步数据库会话吞吐对比
+
+同一进程、同样的线程池上限（--workers，模拟 uvicorn 单 worker 的 AnyIO 线程池）下，
+以 --concurrency 个并发请求压测 dict by-code：
+原同步实现（def + get_db） vs  GET /api/admin/system/dict/data/by-code/{code}（async + get_async_db）
+
+媒体列表（分页 + 计数 + 标签，多条 SQL）在 SQLite 上异步版本吞吐更低（0.74x～0.97x，只在每条 SQL 注入 10ms 时
+才反超），又没有 MySQL 数据支撑，仍为同步接口（def + get_read_db + paginate），不在此对比。
+
+--latency 为每条 SQL 注入的服务端耗时（毫秒，在执行 SQL 的线程里 sleep），用于在本机 SQLite 上
+模拟 MySQL 的网络往返；设为 0 时只比较纯 CPU 开销。设置 MYSQL_DSN 时直接压测 MySQL（忽略 --latency）。
+
+用法（在 server 目录下）:
+    python -m benchmarks.bench_async_db                          # 临时 SQLite，默认注入 2ms
+    python -m benchmarks.bench_async_db --workers 4 --concurrency 64 --latency 5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import prepare_db
+
+import httpx
+
+DICT_CODE = "bench_dict"
+
+
+def _seed() -> None:
+    from app.core.db import SessionLocal
+    from app.models.dict import DictData, DictType
+
+    db = SessionLocal()
+    try:
+        if db.query(DictType).filter(DictType.code == DICT_CODE).first():
+            return
+        db.add(DictType(name="bench", code=DICT_CODE))
+        for i in range(20):
+            db.add(DictData(type_code=DICT_CODE, label=f"label {i}", value=str(i), sort=i))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _inject_latency(ms: float) -> None:
+    """每条 SQL 在执行它的线程里额外 sleep ms 毫秒（同步：请求所在的线程池线程；aiosqlite：连接自己的线程）"""
+    from sqlalchemy import event
+    from app.core.db import async_engine, engine
+
+    def trace(_sql):
+        time.sleep(ms / 1000)
+
+    @event.listens_for(engine, "connect")
+    def _sync_connect(dbapi_conn, _record):
+        dbapi_conn.set_trace_callback(trace)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_connect(dbapi_conn, _record):
+        # aiosqlite 的底层连接只能在它自己的线程里设置
+        dbapi_conn.await_(dbapi_conn.driver_connection.set_trace_callback(trace))
+
+
+def _add_sync_routes(app) -> None:
+    """原同步实现，挂到 /bench/sync 下作对照"""
+    from fastapi import APIRouter, Depends
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+    from app.core.db import get_db
+    from app.models.dict import DictData
+    from app.routers.system_dict import DictDataOut
+
+    router = APIRouter(prefix="/bench/sync")
+
+    @router.get("/dict/{type_code}")
+    def sync_dict(type_code: str, db: Session = Depends(get_db)):
+        items = db.scalars(
+            select(DictData)
+            .where(DictData.type_code == type_code, DictData.status == 1)
+            .order_by(DictData.sort.asc(), DictData.id.asc())
+        ).all()
+        return [DictDataOut.model_validate(item, from_attributes=True) for item in items]
+
+    app.include_router(router)
+
+
+def _token() -> str:
+    from datetime import datetime, timedelta, timezone
+    from jose import jwt
+    from app.core.config import settings
+    exp = datetime.now(timezone.utc) + timedelta(hours=1)
+    return jwt.encode({"sub": "1", "username": "bench", "roles": [], "perms": ["media:view"], "exp": exp},
+                      settings.JWT_SECRET, algorithm=settings.JWT_ALGO)
+
+
+async def _rps(app, url: str, n: int, concurrency: int, workers: int, headers: dict) -> float:
+    import anyio.to_thread
+    anyio.to_thread.current_default_thread_limiter().total_tokens = workers
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        r = await client.get(url)
+        r.raise_for_status()
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                (await client.get(url)).raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n)))
+        return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=2000, help="每个接口的请求次数")
+    parser.add_argument("--workers", type=int, default=8, help="线程池上限")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发请求数")
+    parser.add_argument("--latency", type=float, default=2.0, help="每条 SQL 注入的耗时（毫秒，仅 SQLite）")
+    args = parser.parse_args()
+
+    prepare_db()
+    _seed()
+
+    from app.core.db import engine
+    if engine.dialect.name == "sqlite" and args.latency > 0:
+        _inject_latency(args.latency)
+    latency = args.latency if engine.dialect.name == "sqlite" else "n/a"
+
+    from app.main import app
+    from app.core.audit_writer import audit_writer
+    _add_sync_routes(app)
+    headers = {"Authorization": f"Bearer {_token()}"}
+
+    cases = [
+        ("dict by-code", f"/bench/sync/dict/{DICT_CODE}", f"/api/admin/system/dict/data/by-code/{DICT_CODE}"),
+    ]
+    print(f"db={engine.dialect.name} workers={args.workers} concurrency={args.concurrency} latency_ms={latency}")
+    print(f"{'endpoint':<16}{'sync req/s':>14}{'async req/s':>14}{'speedup':>10}")
+
+    async def run_all():
+        # 异步连接池绑定事件循环，所有用例在同一个循环里跑
+        from app.core.db import async_engine
+        for name, sync_url, async_url in cases:
+            sync_rps = await _rps(app, sync_url, args.n, args.concurrency, args.workers, headers)
+            async_rps = await _rps(app, async_url, args.n, args.concurrency, args.workers, headers)
+            print(f"{name:<16}{sync_rps:>14.1f}{async_rps:>14.1f}{async_rps / sync_rps:>9.2f}x")
+        await async_engine.dispose()
+
+    asyncio.run(run_all())
+    audit_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_config.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+热路径读取配置的单请求开销：逐项 get_config + 现场解析  vs  typed_config（按配置版本预先算好）
+
+每个场景模拟一次请求内对配置的读取：
+1. login   : 登录预检读取的 4 个限流 / 锁定参数
+2. upload  : 上传大小、后缀列表（拆分为集合）、存储方式、缩略图档位，并校验一次后缀
+3. password: 密码复杂度 6 个参数
+
+最后一行测量配置变更后 typed_config 重建一次的耗时（每个配置版本只发生一次）。
+
+用法（在 server 目录下）:
+    python -m benchmarks.bench_config
+    python -m benchmarks.bench_config -n 200000
+"""
+import argparse
+import time
+
+from benchmarks.common import prepare_db, set_configs
+
+
+def _old_login(get_config):
+    return (int(get_config('login_rate_limit_requests', 'number', 20) or 20),
+            int(get_config('login_rate_limit_window', 'number', 60) or 60),
+            int(get_config('login_max_fails', 'number', 5) or 5),
+            int(get_config('login_lock_seconds', 'number', 600) or 600))
+
+
+def _old_upload(get_config, parse_sizes):
+    max_size_mb = get_config('upload_max_size', 'number', 10)
+    allowed_exts_str = get_config('upload_allowed_exts', 'string', 'jpg,jpeg,png,gif,pdf,doc,docx,xls,xlsx,zip')
+    allowed = [ext.strip().lower() for ext in allowed_exts_str.split(',') if ext.strip()]
+    storage = get_config('upload_storage', 'string', 'local')
+    sizes = parse_sizes(get_config('media_thumb_sizes', 'string', '160,320,640'))
+    return int(max_size_mb) * 1024 * 1024, "png" in allowed, storage, tuple(sizes[:1])
+
+
+def _old_password(get_config):
+    return (get_config('password_complexity_enabled', 'boolean', False),
+            int(get_config('password_min_length', 'number', 8) or 8),
+            get_config('password_require_uppercase', 'boolean', True),
+            get_config('password_require_lowercase', 'boolean', True),
+            get_config('password_require_digit', 'boolean', True),
+            get_config('password_require_special', 'boolean', True))
+
+
+def _new_login(typed_config):
+    cfg = typed_config()
+    return cfg.login_rate_limit_requests, cfg.login_rate_limit_window, cfg.login_max_fails, cfg.login_lock_seconds
+
+
+def _new_upload(typed_config):
+    cfg = typed_config()
+    return cfg.upload_max_bytes, "png" in cfg.upload_allowed_ext_set, cfg.upload_storage, cfg.media_thumb_size_list[:1]
+
+
+def _new_password(typed_config):
+    cfg = typed_config()
+    return (cfg.password_complexity_enabled, cfg.password_min_length, cfg.password_require_uppercase,
+            cfg.password_require_lowercase, cfg.password_require_digit, cfg.password_require_special)
+
+
+def _per_call_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100000, help="每个场景的调用次数")
+    args = parser.parse_args()
+
+    prepare_db()
+    # 与 mysql/foadmin.sql 中的登记类型一致
+    set_configs({
+        "login_rate_limit_requests": ("20", "number"), "login_rate_limit_window": ("60", "number"),
+        "login_max_fails": ("5", "number"), "login_lock_seconds": ("600", "number"),
+        "upload_max_size": ("50", "number"),
+        "upload_allowed_exts": ("jpg,jpeg,png,gif,webp,bmp,pdf,doc,docx,xls,xlsx,ppt,pptx,txt,zip,rar,7z,mp4,mp3", "string"),
+        "upload_storage": ("local", "string"), "media_thumb_sizes": ("160,320,640,1280", "string"),
+        "password_complexity_enabled": ("true", "boolean"), "password_min_length": ("8", "number"),
+        "password_require_uppercase": ("true", "boolean"), "password_require_lowercase": ("true", "boolean"),
+        "password_require_digit": ("true", "boolean"), "password_require_special": ("false", "boolean"),
+    })
+
+    from app.core.config_loader import get_config, refresh_config_cache
+    from app.core.config_registry import typed_config
+    from app.utils.thumb_sizes import parse_sizes
+
+    cases = [
+        ("login", lambda: _old_login(get_config), lambda: _new_login(typed_config)),
+        ("upload", lambda: _old_upload(get_config, parse_sizes), lambda: _new_upload(typed_config)),
+        ("password", lambda: _old_password(get_config), lambda: _new_password(typed_config)),
+    ]
+    typed_config()
+    print(f"n={args.n}")
+    print(f"{'scenario':<12}{'get_config us':>15}{'typed us':>11}{'saved us':>11}{'speedup':>10}")
+    for name, old, new in cases:
+        assert old() == new(), name
+        old_us = _per_call_us(old, args.n)
+        new_us = _per_call_us(new, args.n)
+        print(f"{name:<12}{old_us:>15.3f}{new_us:>11.3f}{old_us - new_us:>11.3f}{old_us / new_us:>9.1f}x")
+
+    # 配置变更后的一次重建（不含数据库重新加载快照）
+    rebuild = []
+    for _ in range(20):
+        refresh_config_cache()
+        start = time.perf_counter()
+        typed_config()
+        rebuild.append((time.perf_counter() - start) * 1e6)
+    print(f"rebuild once per config version: {sorted(rebuild)[len(rebuild) // 2]:.1f} us (median of 20)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_login.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+登录权限加载基准
+
+准备 1 个用户、1 个角色、--perms 个权限（API 权限同时展开 "METHOD:/path"），分别测量：
+1. legacy 4 queries : 原 load_user_perms（UserRole -> Role -> RolePerm -> Permission 顺序查询）
+2. joined query     : app.services.user_acl.load_user_acl（一条联表查询）
+3. cached           : user_acl.get（进程内缓存命中）
+4. POST /api/common/login 吞吐（关闭 / 开启缓存），其中包含密码哈希校验的固定开销
+
+用法（在 server 目录下）:
+    python -m benchmarks.bench_login                  # 未设置 MYSQL_DSN 时使用临时 SQLite
+    python -m benchmarks.bench_login -n 2000 --perms 500
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import prepare_db, set_configs
+
+import httpx
+
+USERNAME = "bench_admin"
+PASSWORD = "Bench#123456"
+
+
+def _legacy_load_user_perms(db, user_id: int):
+    from app.models.rbac import Permission, Role, RolePerm, UserRole
+    role_ids = [r.role_id for r in db.query(UserRole).filter(UserRole.user_id == user_id).all()]
+    roles = [r.code for r in db.query(Role).filter(Role.id.in_(role_ids)).all()] if role_ids else []
+    perm_ids = [rp.perm_id for rp in db.query(RolePerm).filter(RolePerm.role_id.in_(role_ids)).all()] if role_ids else []
+    perms: list[str] = []
+    if perm_ids:
+        for p in db.query(Permission).filter(Permission.id.in_(perm_ids)).all():
+            if p.code:
+                perms.append(p.code)
+            if p.type == "api" and p.method and p.path:
+                perms.append(f"{p.method}:{p.path}")
+    return roles, perms
+
+
+def _seed(n_perms: int) -> int:
+    from app.core.db import SessionLocal
+    from app.core.security import hash_password
+    from app.models.rbac import Permission, Role, RolePerm, UserRole
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        u = db.query(User).filter(User.username == USERNAME).first()
+        if u:
+            return u.id
+        u = User(username=USERNAME, password_hash=hash_password(PASSWORD), nick_name="bench")
+        role = Role(code="bench_admin", name="bench")
+        db.add_all([u, role])
+        db.flush()
+        for i in range(n_perms):
+            p = Permission(type="api", platform="admin", name=f"bench {i}", code=f"bench-{i}:view",
+                           method="GET", path=f"/api/admin/bench/{i}")
+            db.add(p)
+            db.flush()
+            db.add(RolePerm(role_id=role.id, perm_id=p.id))
+        db.add(UserRole(user_id=u.id, role_id=role.id))
+        db.commit()
+        return u.id
+    finally:
+        db.close()
+
+
+def _time_loader(fn, n: int) -> float:
+    from app.core.db import SessionLocal
+    db = SessionLocal()
+    try:
+        for _ in range(20):  # 预热
+            fn(db)
+        start = time.perf_counter()
+        for _ in range(n):
+            fn(db)
+        return (time.perf_counter() - start) / n * 1e6
+    finally:
+        db.close()
+
+
+async def _login_rps(app, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    body = {"username": USERNAME, "password": PASSWORD}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(5):  # 预热
+            r = await client.post("/api/common/login", json=body)
+            r.raise_for_status()
+        start = time.perf_counter()
+        for _ in range(n):
+            await client.post("/api/common/login", json=body)
+        return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1000, help="权限加载的调用次数")
+    parser.add_argument("--logins", type=int, default=200, help="登录接口的请求次数")
+    parser.add_argument("--perms", type=int, default=300, help="角色拥有的权限数")
+    args = parser.parse_args()
+
+    prepare_db()
+    set_configs({"login_rate_limit_requests": (str(10 ** 9), "number")})
+    uid = _seed(args.perms)
+
+    from app.services.user_acl import load_user_acl, user_acl
+    from app.core.db import SessionLocal
+    with SessionLocal() as db:
+        old_roles, old_perms = _legacy_load_user_perms(db, uid)
+        acl = load_user_acl(db, uid)
+        assert (old_roles, sorted(old_perms)) == (acl.roles, sorted(acl.perms)), "新旧加载结果不一致"
+
+    print(f"perms per user: {len(acl.perms)}")
+    print(f"{'loader':<20}{'us/call':>12}")
+    print(f"{'legacy 4 queries':<20}{_time_loader(lambda db: _legacy_load_user_perms(db, uid), args.n):>12.1f}")
+    print(f"{'joined query':<20}{_time_loader(lambda db: load_user_acl(db, uid), args.n):>12.1f}")
+    print(f"{'cached':<20}{_time_loader(lambda db: user_acl.get(db, uid), args.n):>12.1f}")
+
+    from app.main import app
+    from app.core.audit_writer import audit_writer
+    ttl = user_acl.ttl
+    print(f"{'login':<20}{'req/s':>12}")
+    user_acl.ttl = 0
+    user_acl.invalidate()
+    print(f"{'no cache':<20}{asyncio.run(_login_rps(app, args.logins)):>12.1f}")
+    user_acl.ttl = ttl
+    print(f"{'cache':<20}{asyncio.run(_login_rps(app, args.logins)):>12.1f}")
+    audit_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
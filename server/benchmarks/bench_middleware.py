@@ -0,0 +1,99 @@
+# benchmarks/bench_middleware.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+中间件栈单请求开销基准
+
+对同一个空接口（GET / POST /ping）分别测量：
+1. bare            : 不挂任何中间件
+2. base_http x3    : 3 个直通的 BaseHTTPMiddleware（改造前三个中间件的结构性开销）
+3. pure_asgi x3    : 3 个直通的纯 ASGI 中间件
+4. foadmin stack   : app.core 中实际使用的 StaticFileMiddleware + LoginLogMiddleware + RequestAuditMiddleware
+
+用法（在 server 目录下）:
+    python -m benchmarks.bench_middleware             # 未设置 MYSQL_DSN 时使用临时 SQLite
+    python -m benchmarks.bench_middleware -n 5000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import prepare_db
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+
+class _PassBaseHTTP(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+class _PassASGI:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+def _make_app(middlewares) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping_get():
+        return {"ok": True}
+
+    @app.post("/ping")
+    def ping_post():
+        return {"ok": True}
+
+    for mw in middlewares:
+        app.add_middleware(mw)
+    return app
+
+
+async def _run(app, method: str, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):  # 预热
+            await client.request(method, "/ping")
+        start = time.perf_counter()
+        for _ in range(n):
+            await client.request(method, "/ping")
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=2000, help="每个场景的请求数")
+    args = parser.parse_args()
+
+    prepare_db()
+    from app.core.middlewares import LoginLogMiddleware, RequestAuditMiddleware
+    from app.core.static_file_middleware import StaticFileMiddleware
+    from app.core.audit_writer import audit_writer
+
+    cases = [
+        ("bare", []),
+        ("base_http x3", [_PassBaseHTTP, _PassBaseHTTP, _PassBaseHTTP]),
+        ("pure_asgi x3", [_PassASGI, _PassASGI, _PassASGI]),
+        ("foadmin stack", [StaticFileMiddleware, LoginLogMiddleware, RequestAuditMiddleware]),
+    ]
+    print(f"{'case':<16}{'GET us/req':>14}{'POST us/req':>14}")
+    baseline = None
+    for name, mws in cases:
+        app = _make_app(mws)
+        get_us = asyncio.run(_run(app, "GET", args.n))
+        post_us = asyncio.run(_run(app, "POST", args.n))
+        if baseline is None:
+            baseline = (get_us, post_us)
+        print(f"{name:<16}{get_us:>14.1f}{post_us:>14.1f}"
+              f"   (+{get_us - baseline[0]:.1f} / +{post_us - baseline[1]:.1f})")
+    audit_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_static.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+静态上传文件吞吐基准：冷请求（全量下载） vs 协商缓存（If-None-Match → 304）
+
+经 StaticFileMiddleware 访问 upload_path 下的内容寻址文件（文件名为 sha256 前 16 位）。
+
+用法（在 server 目录下）:
+    python -m benchmarks.bench_static
+    python -m benchmarks.bench_static -n 2000 --size-kb 1024
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+
+from benchmarks.common import prepare_db, set_configs
+
+import httpx
+from fastapi import FastAPI
+
+
+async def _run(app, url: str, n: int, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = await client.get(url)
+        assert first.status_code == 200, first.status_code
+        etag = first.headers.get("etag")
+        req_headers = {"If-None-Match": etag} if headers == "revalidate" else {}
+        total_bytes = 0
+        status = None
+        start = time.perf_counter()
+        for _ in range(n):
+            r = await client.get(url, headers=req_headers)
+            status = r.status_code
+            total_bytes += len(r.content)
+        elapsed = time.perf_counter() - start
+        return n / elapsed, total_bytes / elapsed / 1024 / 1024, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--size-kb", type=int, default=256, help="测试文件大小（KB）")
+    args = parser.parse_args()
+
+    prepare_db()
+    upload_root = tempfile.mkdtemp()
+    data = os.urandom(args.size_kb * 1024)
+    sha = hashlib.sha256(data).hexdigest()
+    rel = os.path.join("media", "2025", "01", "01", f"{sha[:16]}.jpg")
+    os.makedirs(os.path.join(upload_root, os.path.dirname(rel)), exist_ok=True)
+    with open(os.path.join(upload_root, rel), "wb") as fp:
+        fp.write(data)
+
+    set_configs({
+        "enable_static_access": ("true", "boolean"),
+        "static_url_prefix": ("/runtime/uploads", "string"),
+        "upload_path": (upload_root, "string"),
+        "static_allowed_types": ("jpg,png", "string"),
+    })
+
+    from app.core.static_file_middleware import StaticFileMiddleware
+    app = FastAPI()
+    app.add_middleware(StaticFileMiddleware)
+    url = "/runtime/uploads/" + rel.replace(os.sep, "/")
+
+    print(f"file: {args.size_kb} KB, requests: {args.n}")
+    print(f"{'case':<14}{'req/s':>10}{'MB/s':>10}{'status':>8}")
+    for name, mode in (("cold", None), ("revalidated", "revalidate")):
+        rps, mbps, status = asyncio.run(_run(app, url, args.n, mode))
+        print(f"{name:<14}{rps:>10.0f}{mbps:>10.1f}{status:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/common.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""
+基准脚本公共部分：未设置 MYSQL_DSN 时使用临时 SQLite 并建表
+
+必须在导入 app.* 之前导入本模块。
+"""
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+if not os.environ.get("MYSQL_DSN"):
+    os.environ["MYSQL_DSN"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+
+def prepare_db():
+    """临时 SQLite 下建表；MySQL 请使用 mysql/foadmin.sql 初始化"""
+    from app.core.db import Base, engine
+    import app.models.config, app.models.audit, app.models.login_log, app.models.user  # noqa: F401
+    import app.models.rbac, app.models.media, app.models.job, app.models.dict  # noqa: F401
+    if engine.dialect.name != "sqlite":
+        return
+    from sqlalchemy import BigInteger
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(BigInteger, "sqlite")
+    def _bigint_sqlite(type_, compiler, **kw):
+        return "INTEGER"
+    Base.metadata.create_all(bind=engine)
+
+
+def set_configs(values: dict):
+    """写入/覆盖系统配置并刷新配置缓存"""
+    from app.core.db import SessionLocal
+    from app.core.config_loader import refresh_config_cache
+    from app.models.config import SysConfig
+    db = SessionLocal()
+    try:
+        for key, (value, value_type) in values.items():
+            cfg = db.query(SysConfig).filter(SysConfig.key == key).first()
+            if cfg is None:
+                cfg = SysConfig(category="bench", key=key, name=key)
+                db.add(cfg)
+            cfg.value = value
+            cfg.value_type = value_type
+        db.commit()
+    finally:
+        db.close()
+    refresh_config_cache()
@@ -0,0 +1,33 @@
+# tests/conftest.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""未设置 MYSQL_DSN 时使用临时 SQLite（必须在导入 app.* 之前设置）"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+if not os.environ.get("MYSQL_DSN"):
+    os.environ["MYSQL_DSN"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+
+
+@pytest.fixture()
+def rbac_db():
+    """在测试库中建 RBAC 相关表，用完删除；返回会话"""
+    from app.core.db import Base, SessionLocal, engine
+    from app.models import user  # noqa: F401  UserRole 外键引用用户表
+    from app.models.rbac import Permission, Role, RolePerm, UserRole
+
+    tables = [Role.__table__, Permission.__table__, RolePerm.__table__, UserRole.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine, tables=tables)
@@ -0,0 +1,63 @@
+# tests/test_audit_writer.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""AuditWriter：回放失败的落盘行隔离、stop() 之后的投递、回放所在线程"""
+import json
+import threading
+
+from app.core.audit_writer import REPLAY_KEY, AuditWriter
+
+
+def _lines(path):
+    return [json.loads(x) for x in path.read_text(encoding="utf-8").splitlines() if x.strip()] \
+        if path.exists() else []
+
+
+def test_poison_rows_are_quarantined_after_max_replays(tmp_path):
+    # 测试库未建审计表：每次写入都会失败
+    spill = tmp_path / "spill.jsonl"
+    spill.write_text(json.dumps({"path": "/x", "created_at": "2025-01-01T00:00:00"}) + "\n", encoding="utf-8")
+    w = AuditWriter(spill_path=str(spill), max_replays=2)
+
+    w._replay_spill()
+    assert [r[REPLAY_KEY] for r in _lines(spill)] == [1]
+
+    w._replay_spill()
+    assert _lines(spill) == []
+    poison = _lines(tmp_path / "spill.jsonl.poison")
+    assert [(r["path"], r[REPLAY_KEY]) for r in poison] == [("/x", 2)]
+    assert w.stats()["quarantined"] == 1
+
+    # 已隔离的行不再回放
+    w._replay_spill()
+    assert _lines(spill) == [] and len(_lines(tmp_path / "spill.jsonl.poison")) == 1
+
+
+def test_submit_after_stop_does_not_restart_thread(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    w = AuditWriter(spill_path=str(spill))
+    w.start()
+    w.stop()
+
+    assert w.submit({"path": "/late"}) is True
+    assert w.put({"path": "/later"}) is True
+    assert w._thread is None
+    assert [r["path"] for r in _lines(spill)] == ["/late", "/later"]
+
+    # 再次显式 start() 后恢复正常投递
+    w.start()
+    assert w._thread is not None and w._thread.is_alive()
+    w.stop()
+
+
+def test_spill_replay_runs_on_writer_thread(tmp_path, monkeypatch):
+    # submit() 在事件循环中重启刷写线程时，回放的文件与数据库 I/O 不能落在调用方线程上
+    threads = []
+    w = AuditWriter(spill_path=str(tmp_path / "spill.jsonl"))
+    monkeypatch.setattr(w, "_replay_spill", lambda: threads.append(threading.current_thread().name))
+
+    assert w.submit({"path": "/a"}) is True
+    w.stop()
+
+    assert threads == ["audit-writer"]
@@ -0,0 +1,24 @@
+# tests/test_config_loader.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""config_loader：缺少版本表时轮询只警告一次"""
+import logging
+
+from app.core import config_loader
+from app.core.db import SessionLocal
+
+
+def test_missing_version_table_warns_once(caplog):
+    # 测试库未建表：每次读取版本号都会失败
+    db = SessionLocal()
+    try:
+        with caplog.at_level(logging.DEBUG, logger=config_loader.logger.name):
+            assert [config_loader._read_version(db) for _ in range(5)] == [0] * 5
+    finally:
+        db.close()
+        config_loader._version_failing = False
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    debugs = [r for r in caplog.records if r.levelno == logging.DEBUG and "配置版本号" in r.getMessage()]
+    assert len(warnings) == 1
+    assert len(debugs) == 4
@@ -0,0 +1,57 @@
+# tests/test_db_session_middleware.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""DBSessionMiddleware：流式响应体发送期间不占用连接池"""
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.db import engine, get_db
+from app.core.middlewares import DBSessionMiddleware
+
+
+def _app(observed: dict) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(DBSessionMiddleware)
+
+    @app.get("/stream")
+    def stream(db: Session = Depends(get_db)):
+        db.execute(text("SELECT 1"))
+        observed["in_endpoint"] = engine.pool.checkedout()
+
+        def body():
+            for i in range(3):
+                observed.setdefault("in_flight", []).append(engine.pool.checkedout())
+                yield f"chunk {i}\n".encode()
+
+        return StreamingResponse(body(), media_type="text/plain")
+
+    @app.get("/stream-uses-db")
+    def stream_uses_db(db: Session = Depends(get_db)):
+        def body():
+            # 响应开始后再用会话：重新取连接，请求结束时归还
+            yield str(db.execute(text("SELECT 1")).scalar()).encode()
+        return StreamingResponse(body(), media_type="text/plain")
+
+    return app
+
+
+def test_connection_released_while_streaming():
+    observed = {}
+    with TestClient(_app(observed)) as client:
+        with client.stream("GET", "/stream") as r:
+            assert r.status_code == 200
+            assert b"".join(r.iter_bytes()) == b"chunk 0\nchunk 1\nchunk 2\n"
+    assert observed["in_endpoint"] == 1
+    assert observed["in_flight"] == [0, 0, 0]
+    assert engine.pool.checkedout() == 0
+
+
+def test_session_reused_in_stream_is_closed():
+    with TestClient(_app({})) as client:
+        r = client.get("/stream-uses-db")
+        assert r.status_code == 200 and r.text == "1"
+    assert engine.pool.checkedout() == 0
@@ -0,0 +1,25 @@
+# tests/test_file_response.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""conditional_file_response：304 保留表示相关的响应头"""
+from starlette.datastructures import Headers
+
+from app.core.file_response import ChunkedFileResponse, conditional_file_response, strong_etag
+
+
+def test_not_modified_keeps_vary_but_not_disposition(tmp_path):
+    path = tmp_path / "a.w160.webp"
+    path.write_bytes(b"x" * 10)
+    extra = {"Content-Disposition": 'inline; filename="a.png"', "Vary": "Accept"}
+
+    full = conditional_file_response(Headers(), str(path), media_type="image/webp", digest="abc", headers=extra)
+    assert isinstance(full, ChunkedFileResponse)
+    assert full.headers["vary"] == "Accept"
+
+    req = Headers({"if-none-match": strong_etag("abc", 10)})
+    resp = conditional_file_response(req, str(path), media_type="image/webp", digest="abc", headers=extra)
+    assert resp.status_code == 304
+    assert resp.headers["vary"] == "Accept"
+    assert resp.headers["etag"] == strong_etag("abc", 10)
+    assert "content-disposition" not in resp.headers
@@ -0,0 +1,95 @@
+# tests/test_media_upload.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""分片上传：断点续传（查询已收分片后补传）、分片序号越界、大小 / 校验不符"""
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.db import Base, SessionLocal, engine
+from app.core.deps import get_current_user
+from app.core.middlewares import DBSessionMiddleware
+from app.core.token_cache import Claims
+from app.models.media import MediaUploadSession
+from app.routers import media
+
+CHUNK = 4
+DATA = b"0123456789"  # 3 个分片：4 + 4 + 2
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_SESSION_DIR", str(tmp_path / "sessions"))
+    table = MediaUploadSession.__table__
+    Base.metadata.create_all(engine, tables=[table])
+    db = SessionLocal()
+    db.add_all([
+        MediaUploadSession(id=1, upload_id="u1", filename="a.bin", ext="bin", size=len(DATA),
+                           chunk_size=CHUNK, total_chunks=3, uploader_id=1, status="uploading"),
+        MediaUploadSession(id=2, upload_id="u2", filename="b.bin", ext="bin", size=len(DATA),
+                           chunk_size=CHUNK, total_chunks=3, uploader_id=1, status="aborted"),
+    ])
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.add_middleware(DBSessionMiddleware)
+    app.include_router(media.router)
+    app.dependency_overrides[get_current_user] = lambda: Claims({"sub": "1", "perms": ["media:upload"]})
+    try:
+        with TestClient(app) as c:
+            yield c
+    finally:
+        Base.metadata.drop_all(engine, tables=[table])
+
+
+def _put(client, index, body=None, upload_id="u1", sha=None):
+    body = DATA[index * CHUNK:(index + 1) * CHUNK] if body is None else body
+    headers = {"X-Chunk-Sha256": sha} if sha else {}
+    return client.put(f"/api/admin/media/uploads/{upload_id}/chunks/{index}", content=body, headers=headers)
+
+
+def _status(client, upload_id="u1"):
+    return client.get(f"/api/admin/media/uploads/{upload_id}").json()
+
+
+def test_resume_reports_received_chunks(client):
+    assert _put(client, 0).json() == {"index": 0, "size": CHUNK}
+    assert _put(client, 2).json() == {"index": 2, "size": 2}
+    st = _status(client)
+    assert st["received"] == [0, 2] and st["received_bytes"] == CHUNK + 2
+
+    # 续传：只补缺失的分片；重复上传同一分片幂等覆盖
+    assert _put(client, 1, sha=hashlib.sha256(DATA[4:8]).hexdigest()).status_code == 200
+    assert _put(client, 1).status_code == 200
+    st = _status(client)
+    assert st["received"] == [0, 1, 2] and st["received_bytes"] == len(DATA)
+    session_dir = os.path.join(settings.UPLOAD_SESSION_DIR, "u1")
+    assert sorted(os.listdir(session_dir)) == ["0.part", "1.part", "2.part"]
+
+
+@pytest.mark.parametrize("index", [-1, 3, 100])
+def test_out_of_range_index(client, index):
+    r = _put(client, index, body=b"xx")
+    assert r.status_code == 400 and r.json()["detail"] == "分片序号越界"
+    assert _status(client)["received"] == []
+
+
+def test_rejected_chunk_leaves_nothing(client):
+    # 过长、过短、校验不符：都不留下 .part 或临时文件
+    assert _put(client, 0, body=b"01234").status_code == 400
+    assert _put(client, 2, body=b"8").status_code == 400
+    assert _put(client, 0, sha="0" * 64).json()["detail"] == "分片校验失败"
+    assert _status(client)["received"] == []
+    session_dir = os.path.join(settings.UPLOAD_SESSION_DIR, "u1")
+    assert not os.path.isdir(session_dir) or os.listdir(session_dir) == []
+
+
+def test_closed_or_unknown_session(client):
+    assert _put(client, 0, upload_id="u2").status_code == 409
+    assert _put(client, 0, upload_id="nope").status_code == 404
@@ -0,0 +1,86 @@
+# tests/test_pagination.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""游标分页：游标编解码、keyset 条件边界、capped 计数"""
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, create_engine, select
+from sqlalchemy.orm import Session, declarative_base
+
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_condition, paginate
+
+Base = declarative_base()
+
+
+class Row(Base):
+    __tablename__ = "t_row"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+T1 = datetime(2024, 5, 1, 8, 0, 0)
+T2 = datetime(2024, 5, 2, 8, 0, 0)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as s:
+        # 同一 created_at 下有多行：游标必须靠 id 区分，不能跳过或重复
+        s.add_all([Row(id=i, created_at=T1 if i <= 3 else T2) for i in range(1, 7)])
+        s.commit()
+        yield s
+    engine.dispose()
+
+
+def test_cursor_round_trip_keeps_datetime():
+    cur = encode_cursor([T1, 42])
+    assert "=" not in cur
+    assert decode_cursor(cur, 2) == [T1, 42]
+
+
+@pytest.mark.parametrize("bad", ["not-base64!!", encode_cursor([1]), encode_cursor({"a": 1})])
+def test_decode_cursor_rejects_malformed(bad):
+    with pytest.raises(HTTPException) as ei:
+        decode_cursor(bad, 2)
+    assert ei.value.status_code == 400
+
+
+def test_keyset_condition_boundary(db):
+    cols = (Row.created_at, Row.id)
+
+    def ids(values, descending=True):
+        stmt = select(Row.id).where(keyset_condition(cols, values, descending)).order_by(Row.id)
+        return list(db.scalars(stmt))
+
+    # 降序：(T2, 5) 之后是同一时间里 id 更小的 4，以及所有 T1 行；不含边界行本身
+    assert ids([T2, 5]) == [1, 2, 3, 4]
+    assert ids([T1, 1]) == []
+    # 升序：(T1, 2) 之后是 3 和所有 T2 行
+    assert ids([T1, 2], descending=False) == [3, 4, 5, 6]
+
+
+def test_paginate_walks_all_rows_with_cursor(db):
+    stmt = select(Row)
+    order = (Row.created_at, Row.id)
+    first = paginate(db, stmt, order_cols=order, size=4, count="exact")
+    assert [r.id for r in first["rows"]] == [6, 5, 4, 3]
+    assert first["total"] == 6 and first["next_cursor"]
+
+    second = paginate(db, stmt, order_cols=order, size=4, cursor=first["next_cursor"])
+    assert [r.id for r in second["rows"]] == [2, 1]
+    # 带游标不计数；最后一页没有 next_cursor
+    assert second["total"] is None and second["next_cursor"] is None
+
+
+def test_capped_count(db):
+    p = paginate(db, select(Row), order_cols=(Row.id,), size=2, count="capped", count_cap=4)
+    assert (p["total"], p["total_capped"]) == (4, True)
+    p = paginate(db, db.query(Row), order_cols=(Row.id,), size=2, count="capped", count_cap=10)
+    assert (p["total"], p["total_capped"]) == (6, False)
+    p = paginate(db, db.query(Row), order_cols=(Row.id,), size=2, count="none")
+    assert p["total"] is None
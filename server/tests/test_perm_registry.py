@@ -0,0 +1,103 @@
+# tests/test_perm_registry.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""权限注册表：位图解析、失效后重建、TTL 重建，以及角色变更接口触发失效"""
+import threading
+import time
+
+import pytest
+
+from app.core.perm_registry import PermRegistry, perm_registry
+from app.core.token_cache import Claims
+from app.models.rbac import Permission, Role, RolePerm
+from app.routers import system_role
+
+
+@pytest.fixture()
+def seeded(rbac_db):
+    db = rbac_db
+    db.add_all([
+        Role(id=1, code="admin", name="管理员"),
+        Role(id=2, code="editor", name="编辑"),
+        Permission(id=1, type="menu", name="用户", code="user:list"),
+        Permission(id=2, type="api", name="接口", code="user:api", method="GET", path="/api/x"),
+        Permission(id=3, type="button", name="删除", code="media:delete"),
+    ])
+    db.flush()
+    db.add_all([RolePerm(role_id=1, perm_id=1), RolePerm(role_id=1, perm_id=2), RolePerm(role_id=2, perm_id=3)])
+    db.commit()
+    perm_registry.invalidate()
+    yield db
+    perm_registry.invalidate()
+
+
+def test_resolve_bitmaps(seeded):
+    reg = PermRegistry(ttl=60)
+    assert reg.set_id([2, 1, 2]) == "1.2"
+    admin = reg.resolve("1")
+    assert set(admin) == {"user:list", "user:api", "GET:/api/x"}
+    assert "media:delete" not in admin and "unknown" not in admin
+    assert len(reg.resolve("1.2")) == 4
+    assert len(reg.resolve("9")) == 0
+    # 同一版本内的解析结果复用
+    assert reg.resolve("1") is admin
+    assert reg.stats()["builds"] == 1
+
+
+def test_invalidate_rebuilds(seeded):
+    reg = PermRegistry(ttl=60)
+    assert "media:delete" not in reg.resolve("1")
+    seeded.add(RolePerm(role_id=1, perm_id=3))
+    seeded.commit()
+    # 未失效前沿用旧快照
+    assert "media:delete" not in reg.resolve("1")
+    reg.invalidate()
+    assert "media:delete" in reg.resolve("1")
+    assert reg.stats()["builds"] == 2
+
+
+def test_ttl_rebuilds(seeded, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    reg = PermRegistry(ttl=5)
+    reg.resolve("1")
+    now[0] = 104.9
+    reg.resolve("1")
+    assert reg.stats()["builds"] == 1
+    now[0] = 105.0
+    reg.resolve("1")
+    assert reg.stats()["builds"] == 2
+
+
+def test_invalidate_during_build_is_not_kept(seeded):
+    reg = PermRegistry(ttl=60)
+    build = reg._build
+    racer = threading.Thread(target=reg.invalidate)
+
+    def racing_build():
+        # 构建期间另一线程修改了角色授权并调用 invalidate（等待构建结束后生效）
+        racer.start()
+        return build()
+
+    reg._build = racing_build
+    reg.resolve("1")
+    racer.join()
+    assert reg._snap is None
+    reg._build = build
+    reg.resolve("1")
+    assert reg._snap is not None and reg.stats()["builds"] == 2
+
+
+def test_role_routes_invalidate_compact_tokens(seeded):
+    claims = Claims({"sub": "5", "ps": "2"})
+    assert "user:list" not in claims.perm_set
+
+    # 角色授权变更：已签发的精简令牌无需重新登录即按新权限生效
+    system_role.bind_role_perms(2, system_role.BindPermsIn(perm_ids=[1, 3]), seeded)
+    assert "user:list" in claims.perm_set and "media:delete" in claims.perm_set
+
+    version = perm_registry.stats()["version"]
+    system_role.update_role(2, system_role.RoleIn(code="editor", name="编辑组"), seeded)
+    assert perm_registry.stats()["version"] == version + 1
+    assert perm_registry._snap is None
@@ -0,0 +1,94 @@
+# tests/test_rate_limit.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""限流：滑动窗口估算、重试等待时间，内存与 SQLite 两种后端行为一致"""
+import threading
+
+import pytest
+
+from app.core.rate_limit import MemoryBackend, SQLiteBackend, _retry_after, _slide
+
+WINDOW = 10.0
+
+
+def test_slide_rolls_windows():
+    state, est = _slide(None, 103.0, WINDOW)
+    assert state == (100.0, 0.0, 0.0) and est == 0.0
+
+    # 紧邻的下一个窗口：当前计数变为上一窗口，按剩余比例折算
+    state, est = _slide((100.0, 4.0, 0.0), 112.5, WINDOW)
+    assert state == (110.0, 0.0, 4.0)
+    assert est == pytest.approx(4.0 * 0.75)
+
+    # 隔了一个以上窗口：上一窗口计数清零
+    state, est = _slide((100.0, 4.0, 2.0), 125.0, WINDOW)
+    assert state == (120.0, 0.0, 0.0) and est == 0.0
+
+
+def test_retry_after():
+    # 当前窗口已满：等到窗口结束
+    assert _retry_after((100.0, 3.0, 0.0), 104.0, WINDOW, 3) == pytest.approx(6.0)
+    # 只有上一窗口的折算部分超限：等到衰减到 limit - 1 以下
+    assert _retry_after((110.0, 0.0, 3.0), 110.0, WINDOW, 3) == pytest.approx(10.0 / 3)
+    assert _retry_after((110.0, 0.0, 3.0), 115.0, WINDOW, 3) == 0.0
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / "rate_limit.db"))
+
+
+def test_hit_denies_and_recovers(backend):
+    assert [backend.hit("k", 3, WINDOW, 100.0 + i)[0] for i in range(3)] == [True] * 3
+    ok, retry = backend.hit("k", 3, WINDOW, 103.0)
+    assert not ok and retry == pytest.approx(7.0)
+    # 其它 key 不受影响
+    assert backend.hit("other", 3, WINDOW, 103.0) == (True, 0.0)
+
+    # 下一窗口开始时上一窗口的 3 次仍全额计入
+    ok, retry = backend.hit("k", 3, WINDOW, 110.0)
+    assert not ok and retry == pytest.approx(10.0 / 3)
+    assert backend.hit("k", 3, WINDOW, 110.0 + retry + 0.01)[0]
+
+
+def test_incr_get_set_expire(backend):
+    assert backend.incr("n", 5.0, 100.0) == 1
+    assert backend.incr("n", 5.0, 101.0) == 2
+    assert backend.get("n", 105.9) == 2
+    # 过期后重新从 1 开始
+    assert backend.get("n", 106.0) is None
+    assert backend.incr("n", 5.0, 106.0) == 1
+
+    backend.set("s", 7, 5.0, 100.0)
+    assert backend.get("s", 100.0) == 7
+    backend.delete("s")
+    assert backend.get("s", 100.0) is None
+
+
+def test_sqlite_cleanup_counts_per_thread(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "rate_limit.db"))
+    backend.CLEANUP_EVERY = 4
+    backend.set("old", 1, 1.0, 0.0)
+
+    def work():
+        for i in range(3):
+            backend.incr(f"t{threading.get_ident()}-{i}", 60.0, 100.0)
+
+    threads = [threading.Thread(target=work) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 两个线程各 3 次操作，都没到各自的清理周期
+    assert backend.size() == 7
+
+    backend.incr("main-0", 60.0, 100.0)
+    backend.incr("main-1", 60.0, 100.0)
+    backend.incr("main-2", 60.0, 100.0)
+    backend.incr("main-3", 60.0, 100.0)
+    # 当前线程第 4 次操作触发清理，过期的 old 被删除
+    assert backend.get("old", 0.5) is None
+    assert backend.size() == 10
@@ -0,0 +1,65 @@
+# tests/test_scheduler_lease.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""调度器选主租约：首次抢占、续期、过期后被其他进程接管、主动释放"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.scheduler import LEASE_NAME, _release_lease, _try_lease
+from app.models.job import JobLease
+
+TTL = 10.0
+
+
+@pytest.fixture()
+def sessions(tmp_path):
+    # 两个会话模拟两个 worker 进程
+    engine = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+    JobLease.__table__.create(engine)
+    a, b = Session(engine), Session(engine)
+    yield a, b
+    a.close()
+    b.close()
+    engine.dispose()
+
+
+def _lease(db: Session) -> JobLease:
+    db.expire_all()
+    return db.get(JobLease, LEASE_NAME)
+
+
+def test_acquire_and_renew(sessions):
+    a, b = sessions
+    assert _try_lease(a, "A", 100.0, TTL)
+    assert (_lease(b).owner, _lease(b).expires_at) == ("A", 110_000)
+    # 租约有效期内其他进程抢不到
+    assert not _try_lease(b, "B", 105.0, TTL)
+    # 持有者续期
+    assert _try_lease(a, "A", 108.0, TTL)
+    assert _lease(b).expires_at == 118_000
+    assert not _try_lease(b, "B", 117.9, TTL)
+
+
+def test_takeover_after_expiry(sessions):
+    a, b = sessions
+    assert _try_lease(a, "A", 100.0, TTL)
+    # 到期那一刻仍归原持有者（expires_at < now 才算过期）
+    assert not _try_lease(b, "B", 110.0, TTL)
+    assert _try_lease(b, "B", 110.5, TTL)
+    assert _lease(a).owner == "B"
+    # 原持有者之后续期失败，应退位
+    assert not _try_lease(a, "A", 111.0, TTL)
+    assert _lease(a).owner == "B"
+
+
+def test_release_lets_others_take_over_immediately(sessions):
+    a, b = sessions
+    assert _try_lease(a, "A", 100.0, TTL)
+    # 只有持有者能释放
+    _release_lease(b, "B")
+    assert not _try_lease(b, "B", 101.0, TTL)
+    _release_lease(a, "A")
+    assert _try_lease(b, "B", 101.0, TTL)
+    assert _lease(a).owner == "B"
@@ -0,0 +1,82 @@
+# tests/test_token_cache.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""JWT 解码结果缓存：按 TTL / token exp 失效、LRU 淘汰、clear 后重新验签"""
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from starlette.requests import Request
+
+from app.core import deps
+from app.core.config import settings
+from app.core.token_cache import Claims, TokenCache
+
+
+def _request(token: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+def test_expires_at_token_exp(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = TokenCache(ttl=60)
+    cache.put("a", Claims({"sub": "1", "exp": 1010}))
+    cache.put("b", Claims({"sub": "2"}))
+
+    now[0] = 1009.9
+    assert cache.get("a")["sub"] == "1"
+    # token 的 exp 早于 TTL：到 exp 即失效，不会放行已过期的 token
+    now[0] = 1010.0
+    assert cache.get("a") is None
+    assert cache.get("b")["sub"] == "2"
+    now[0] = 1060.0
+    assert cache.get("b") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction_and_disabled():
+    cache = TokenCache(ttl=60, max_size=2)
+    for t in ("a", "b"):
+        cache.put(t, Claims({"sub": t}))
+    assert cache.get("a") is not None  # a 变为最近使用
+    cache.put("c", Claims({"sub": "c"}))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+    off = TokenCache(ttl=0)
+    off.put("a", Claims({"sub": "a"}))
+    assert off.get("a") is None
+
+
+def test_full_token_perm_set_is_precomputed():
+    claims = Claims({"sub": "1", "perms": ["user:list", "GET:/api/x"]})
+    assert claims.perm_set == frozenset({"user:list", "GET:/api/x"})
+    assert deps.has_perm(claims, "user:list") and not deps.has_perm(claims, "user:delete")
+
+
+def test_get_current_user_uses_cache_until_cleared(monkeypatch):
+    cache = TokenCache(ttl=60)
+    monkeypatch.setattr(deps, "token_cache", cache)
+    decoded = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: decoded.append(1) or real_decode(*a, **kw))
+    token = jwt.encode({"sub": "7", "perms": ["user:list"], "exp": int(time.time()) + 300},
+                       settings.JWT_SECRET, algorithm=settings.JWT_ALGO)
+
+    first = deps.get_current_user(_request(token))
+    assert deps.get_current_user(_request(token)) is first
+    assert len(decoded) == 1
+
+    cache.clear()
+    again = deps.get_current_user(_request(token))
+    assert again is not first and again["sub"] == "7"
+    assert len(decoded) == 2
+
+    # 验签失败的 token 不进入缓存
+    with pytest.raises(HTTPException) as ei:
+        deps.get_current_user(_request(token[:-2] + "xx"))
+    assert ei.value.status_code == 401
+    assert cache.stats()["size"] == 1
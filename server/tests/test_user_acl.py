@@ -0,0 +1,93 @@
+# tests/test_user_acl.py
+# 版权所有：厦门市知序技术服务工作室
+# 网站: www.sslphp.com, www.foadmin.com
+# BUG反馈邮箱: 1032904660@qq.com
+"""用户 ACL 缓存：联表加载、按用户 / 全部失效，加载期间失效时不写入缓存"""
+import pytest
+
+from app.models.rbac import Permission, Role, RolePerm, UserRole
+from app.routers import system_role
+from app.services import user_acl as user_acl_mod
+from app.services.user_acl import UserAclCache, load_user_acl
+
+
+@pytest.fixture()
+def seeded(rbac_db):
+    db = rbac_db
+    db.add_all([
+        Role(id=1, code="admin", name="管理员", status=1),
+        Role(id=2, code="guest", name="访客", status=0),
+        Permission(id=1, type="menu", name="用户", code="user:list"),
+        Permission(id=2, type="api", name="接口", code=None, method="GET", path="/api/x"),
+    ])
+    db.flush()
+    db.add_all([
+        RolePerm(role_id=1, perm_id=1), RolePerm(role_id=1, perm_id=2), RolePerm(role_id=2, perm_id=1),
+        UserRole(user_id=10, role_id=1), UserRole(user_id=10, role_id=2), UserRole(user_id=11, role_id=2),
+    ])
+    db.commit()
+    return db
+
+
+def test_load_user_acl(seeded):
+    acl = load_user_acl(seeded, 10)
+    assert acl.role_ids == [1, 2]
+    assert acl.roles == ["admin", "guest"]
+    assert acl.active_roles == ["admin"]
+    assert acl.perms == ["user:list", "GET:/api/x"]
+    assert load_user_acl(seeded, 99).roles == []
+
+
+def test_invalidate_user_and_all(seeded):
+    cache = UserAclCache(ttl=60)
+    first = cache.get(seeded, 10)
+    assert cache.get(seeded, 10) is first
+    cache.get(seeded, 11)
+
+    cache.invalidate(10)
+    assert cache.get(seeded, 10) is not first
+    assert cache.stats()["size"] == 2
+
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+@pytest.mark.parametrize("target", [10, None])
+def test_invalidate_during_load_is_not_cached(seeded, monkeypatch, target):
+    cache = UserAclCache(ttl=60)
+    real_load = user_acl_mod.load_user_acl
+
+    def racing_load(db, user_id):
+        acl = real_load(db, user_id)
+        cache.invalidate(target)  # 加载返回前角色绑定被修改
+        return acl
+
+    monkeypatch.setattr(user_acl_mod, "load_user_acl", racing_load)
+    cache.get(seeded, 10)
+    assert cache.stats()["size"] == 0
+
+    monkeypatch.setattr(user_acl_mod, "load_user_acl", real_load)
+    cache.get(seeded, 10)
+    assert cache.stats()["size"] == 1
+
+
+def test_other_user_invalidation_does_not_block_caching(seeded, monkeypatch):
+    cache = UserAclCache(ttl=60)
+    real_load = user_acl_mod.load_user_acl
+
+    def racing_load(db, user_id):
+        acl = real_load(db, user_id)
+        cache.invalidate(11)
+        return acl
+
+    monkeypatch.setattr(user_acl_mod, "load_user_acl", racing_load)
+    cache.get(seeded, 10)
+    assert cache.stats()["size"] == 1
+
+
+def test_role_update_invalidates_global_cache(seeded):
+    user_acl_mod.user_acl.get(seeded, 10)
+    assert user_acl_mod.user_acl.stats()["size"] >= 1
+    system_role.update_role(1, system_role.RoleIn(code="admin", name="超级管理员"), seeded)
+    assert user_acl_mod.user_acl.stats()["size"] == 0